@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Bill, Payment
+from .models import Bill, FlatBalance, LedgerEntry, Payment, Tariff
 
 
 class PaymentInline(admin.TabularInline):
@@ -24,3 +24,29 @@ class PaymentAdmin(admin.ModelAdmin):
     search_fields = ('receipt_number', 'transaction_id')
     date_hierarchy = 'created_at'
 
+
+
+@admin.register(Tariff)
+class TariffAdmin(admin.ModelAdmin):
+    list_display = ('society', 'maintenance_per_sqft', 'parking_per_slot', 'water_charge', 'due_in_days', 'updated_at')
+    search_fields = ('society__name',)
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('flat', 'entry_type', 'amount', 'description', 'created_at')
+    list_filter = ('society', 'entry_type')
+    search_fields = ('flat__flat_number', 'description')
+    date_hierarchy = 'created_at'
+    
+    # The ledger is append-only; corrections are posted as adjustments
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(FlatBalance)
+class FlatBalanceAdmin(admin.ModelAdmin):
+    list_display = ('flat', 'society', 'balance', 'updated_at')
+    list_filter = ('society',)
+    search_fields = ('flat__flat_number',)
+    readonly_fields = ('flat', 'society', 'balance', 'updated_at')
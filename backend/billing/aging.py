@@ -0,0 +1,106 @@
+"""
+Dues aging report.
+
+Outstanding amounts (total_amount - paid_amount) of a society's bills are
+split into buckets by how many days past their due date they are, per
+flat, with one grouped query using conditional sums. Block and society
+totals are added up from the flat rows. Reports are cached with the
+versioned billing keys, so they stay valid until the next Bill/Payment write
+in any worker process (the version lives in the shared default cache).
+"""
+import csv
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import F, Min, Q, Sum
+from django.utils import timezone
+
+from society.dashboard import NO_BLOCK
+from .models import Bill
+from . import cache as billing_cache
+
+
+# (key, label, min days past due, max days past due); None is open-ended
+AGING_BUCKETS = [
+    ('current', 'Not yet due', None, -1),
+    ('days_0_30', '0-30 days', 0, 30),
+    ('days_31_60', '31-60 days', 31, 60),
+    ('days_61_90', '61-90 days', 61, 90),
+    ('days_90_plus', '90+ days', 91, None),
+]
+
+BUCKET_KEYS = [key for key, _, _, _ in AGING_BUCKETS]
+
+CSV_FIELDS = ['flat_number', 'block'] + BUCKET_KEYS + ['total', 'oldest_due_date']
+
+
+def _bucket_condition(today, min_days, max_days):
+    """Q for bills between min_days and max_days (inclusive) past their due date"""
+    condition = Q()
+    if min_days is not None:
+        condition &= Q(due_date__lte=today - timedelta(days=min_days))
+    if max_days is not None:
+        condition &= Q(due_date__gte=today - timedelta(days=max_days))
+    return condition
+
+
+def build_aging_report(society_id, today=None):
+    """Compute the aging report for a society with a single grouped query"""
+    today = today or timezone.now().date()
+    outstanding = F('total_amount') - F('paid_amount')
+
+    aggregates = {
+        key: Sum(outstanding, filter=_bucket_condition(today, min_days, max_days))
+        for key, _, min_days, max_days in AGING_BUCKETS
+    }
+    rows = (
+        Bill.objects.filter(society_id=society_id, paid_amount__lt=F('total_amount'))
+        .values('flat_id', 'flat__flat_number', 'flat__block__name')
+        .annotate(total=Sum(outstanding), oldest_due_date=Min('due_date'), **aggregates)
+        .order_by('flat__block__name', 'flat__flat_number')
+    )
+
+    flats = []
+    blocks = {}
+    totals = dict.fromkeys(BUCKET_KEYS + ['total'], 0.0)
+    for row in rows:
+        block_name = row['flat__block__name'] or NO_BLOCK
+        amounts = {key: float(row[key] or 0) for key in BUCKET_KEYS + ['total']}
+        flats.append({
+            'flat': row['flat_id'],
+            'flat_number': row['flat__flat_number'],
+            'block': block_name,
+            **amounts,
+            'oldest_due_date': row['oldest_due_date'].isoformat(),
+        })
+
+        block_totals = blocks.setdefault(block_name, dict.fromkeys(BUCKET_KEYS + ['total'], 0.0))
+        for key, amount in amounts.items():
+            block_totals[key] += amount
+            totals[key] += amount
+
+    return {
+        'as_of': today.isoformat(),
+        'buckets': [{'key': key, 'label': label} for key, label, _, _ in AGING_BUCKETS],
+        'totals': totals,
+        'blocks': [{'block': name, **amounts} for name, amounts in blocks.items()],
+        'flats': flats,
+    }
+
+
+def get_aging_report(society_id):
+    """Return today's aging report for a society, cached until the next billing write"""
+    today = timezone.now().date()
+    key = billing_cache.cache_key('aging', society_id, today.isoformat())
+    report = cache.get(key)
+    if report is None:
+        report = build_aging_report(society_id, today)
+        cache.set(key, report, billing_cache.BILLING_CACHE_TIMEOUT)
+    return report
+
+
+def write_csv(report, output):
+    """Write the per-flat rows of an aging report as CSV to a text file"""
+    writer = csv.DictWriter(output, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(report['flats'])
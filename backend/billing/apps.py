@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class BillingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'billing'
-
+    
+    def ready(self):
+        import billing.checks  # noqa
+        import billing.signals  # noqa
@@ -0,0 +1,163 @@
+"""
+Monthly bill run.
+
+Bills for a society's flats are computed from its Tariff a chunk of flats at
+a time. Each chunk reads the flat columns it needs with ``values_list``,
+computes every charge column for the chunk in one pass, then writes with
+``bulk_create``/``bulk_update`` in its own transaction, posting the new and
+changed totals to the flats' ledgers as it goes. A run that stops
+part way can simply be started again: chunks that were written already
+produce no changes.
+"""
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from society.models import Flat
+from society import dashboard
+from .models import Bill, LedgerEntry
+from .ledger import bill_change_entry, bill_entry, post_entries
+from . import cache as billing_cache
+
+
+BILL_RUN_CHUNK_SIZE = 1000
+
+CHARGE_FIELDS = ['maintenance_charge', 'parking_charge', 'water_charge']
+
+CENTS = Decimal('0.01')
+
+
+def compute_charges(tariff, rows):
+    """
+    Compute tariff charges for (flat_id, area_sqft, bhk, parking_slots) rows.
+
+    Returns {flat_id: {charge_field: amount}}.
+    """
+    per_sqft = Decimal(str(tariff.maintenance_per_sqft))
+    by_bhk = {bhk: Decimal(str(amount)) for bhk, amount in (tariff.maintenance_by_bhk or {}).items()}
+    per_slot = Decimal(str(tariff.parking_per_slot))
+    water = Decimal(str(tariff.water_charge)).quantize(CENTS, ROUND_HALF_UP)
+    zero = Decimal('0')
+
+    return {
+        flat_id: {
+            'maintenance_charge': ((area_sqft or zero) * per_sqft + by_bhk.get(bhk, zero)).quantize(CENTS, ROUND_HALF_UP),
+            'parking_charge': ((parking_slots or 0) * per_slot).quantize(CENTS, ROUND_HALF_UP),
+            'water_charge': water,
+        }
+        for flat_id, area_sqft, bhk, parking_slots in rows
+    }
+
+
+def generate_bills(tariff, billing_month, chunk_size=BILL_RUN_CHUNK_SIZE):
+    """
+    Create or refresh the bills of every flat in the tariff's society for a month.
+
+    Flats without a bill for the month get one. Existing bills that have
+    not been paid against are updated if their charges differ from the
+    tariff; bills with payments are left alone.
+    """
+    society_id = tariff.society_id
+    billing_month = billing_month.replace(day=1)
+    due_date = billing_month + timedelta(days=tariff.due_in_days)
+    summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+
+    flats = Flat.objects.filter(society_id=society_id).order_by('id')
+    last_id = 0
+    while True:
+        rows = list(
+            flats.filter(id__gt=last_id).values_list('id', 'area_sqft', 'bhk', 'parking_slots')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        charges = compute_charges(tariff, rows)
+        chunk_summary = _write_chunk(society_id, billing_month, due_date, charges)
+        for key, count in chunk_summary.items():
+            summary[key] += count
+
+    if summary['created'] or summary['updated']:
+        # Bulk writes bypass the Bill signals
+        transaction.on_commit(lambda: dashboard.invalidate(society_id))
+        billing_cache.bump_version_on_commit(society_id)
+
+    return summary
+
+
+@transaction.atomic
+def _write_chunk(society_id, billing_month, due_date, charges):
+    """Insert and update the bills of one chunk of flats"""
+    summary = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+
+    raised = Exists(LedgerEntry.objects.filter(bill=OuterRef('pk'), entry_type=LedgerEntry.EntryType.BILL))
+    existing = {
+        bill.flat_id: bill
+        for bill in Bill.objects.select_for_update().filter(
+            flat_id__in=list(charges),
+            billing_month=billing_month
+        ).annotate(raised=raised)
+    }
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    entries = []
+    for flat_id, flat_charges in charges.items():
+        bill = existing.get(flat_id)
+        if bill is None:
+            bill = Bill(
+                society_id=society_id,
+                flat_id=flat_id,
+                billing_month=billing_month,
+                due_date=due_date,
+                notes='Generated by monthly bill run',
+                **flat_charges
+            )
+            bill.calculate_total()
+            bill.update_status()
+            to_create.append(bill)
+        elif bill.paid_amount > 0:
+            summary['skipped'] += 1
+        elif all(getattr(bill, field) == amount for field, amount in flat_charges.items()):
+            summary['unchanged'] += 1
+        else:
+            previous_total = bill.total_amount
+            for field, amount in flat_charges.items():
+                setattr(bill, field, amount)
+            bill.calculate_total()
+            bill.update_status()
+            bill.updated_at = now
+            to_update.append(bill)
+            entries.append(bill_change_entry(bill, previous_total, bill.raised))
+
+    # ignore_conflicts lets a concurrent run for the same month lose gracefully
+    Bill.objects.bulk_create(to_create, batch_size=BILL_RUN_CHUNK_SIZE, ignore_conflicts=True)
+    Bill.objects.bulk_update(
+        to_update,
+        CHARGE_FIELDS + ['total_amount', 'status', 'updated_at'],
+        batch_size=BILL_RUN_CHUNK_SIZE
+    )
+
+    # Bills from bulk_create(ignore_conflicts=True) come back without primary
+    # keys, so read the new ones back to raise them on the ledger. Bills that
+    # already have a BILL entry were inserted by a concurrent run, and count
+    # as skipped rather than created.
+    created = []
+    if to_create:
+        created = list(
+            Bill.objects.filter(
+                flat_id__in=[bill.flat_id for bill in to_create],
+                billing_month=billing_month
+            ).exclude(raised).only('id', 'society', 'flat', 'billing_month', 'total_amount')
+        )
+        entries.extend(bill_entry(bill) for bill in created)
+    post_entries(entries)
+
+    summary['created'] = len(created)
+    summary['skipped'] += len(to_create) - len(created)
+    summary['updated'] = len(to_update)
+    return summary
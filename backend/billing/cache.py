@@ -0,0 +1,53 @@
+"""
+Versioned cache keys for billing read models.
+
+Every cached billing result for a society includes the society's current
+billing version in its key. Bill and Payment writes bump the version (see
+``billing.signals``), which makes all older entries unreachable at once
+without having to know which keys exist.
+
+The version counter lives in the default cache, so it must be shared by all
+worker processes (see CACHES in settings and the billing.W001 check); the
+bump is a cache.incr, which is atomic on Redis and Memcached.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+BILLING_CACHE_TIMEOUT = 60 * 60
+
+
+def _version_key(society_id):
+    return f'billing:version:{society_id}'
+
+
+def get_version(society_id):
+    """Return the current billing version for a society"""
+    version = cache.get(_version_key(society_id))
+    if version is None:
+        # Start from the clock so a lost version key can't resurrect old entries
+        version = time.time_ns()
+        cache.add(_version_key(society_id), version, None)
+        version = cache.get(_version_key(society_id), version)
+    return version
+
+
+def bump_version(society_id):
+    """Invalidate every cached billing result for a society"""
+    try:
+        cache.incr(_version_key(society_id))
+    except ValueError:
+        cache.set(_version_key(society_id), time.time_ns(), None)
+
+
+def bump_version_on_commit(society_id):
+    """Bump the billing version once the current transaction commits"""
+    transaction.on_commit(lambda: bump_version(society_id))
+
+
+def cache_key(name, society_id, *parts):
+    """Build a versioned cache key for a society's billing result"""
+    suffix = ':'.join(str(part) for part in parts)
+    return f'billing:{name}:{society_id}:v{get_version(society_id)}:{suffix}'
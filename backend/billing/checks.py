@@ -0,0 +1,30 @@
+"""
+Deployment checks for the billing caches.
+
+Versioned billing keys only invalidate across workers when every worker
+process sees the same version counter, so the default cache must be shared
+(Redis, Memcached or the database cache, see CACHES in settings).
+"""
+from django.conf import settings
+from django.core.checks import Warning, register, Tags
+
+
+PER_PROCESS_CACHES = [
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+]
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    return [
+        Warning(
+            f'The default cache ({backend}) is not shared between worker processes, '
+            'so billing cache versions bumped by one worker are not seen by the others.',
+            hint='Set REDIS_URL, or run with ENVIRONMENT=production to use the database cache.',
+            id='billing.W001',
+        )
+    ]
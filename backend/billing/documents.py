@@ -0,0 +1,225 @@
+"""
+Receipt and statement documents.
+
+Documents are built from the database as plain dicts (see ``billing.pdf``)
+and stored content-addressed: the file name is the SHA-256 of the document
+data, under ``MEDIA_ROOT/documents/<kind>/``. A document whose Bill/Payment
+rows haven't changed hashes to a file that already exists and is served
+as-is; any change produces a new hash and therefore a fresh render.
+
+Rendering is CPU-bound, so it runs in a process pool. Requests only queue a
+render (``render_in_background``) and never wait for one; the month-end
+``render_statements`` command renders whole societies with
+``render_documents``. DOCUMENT_RENDER_WORKERS = 0 renders inline instead.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from society.models import Flat, Society
+from .models import Bill, LedgerEntry
+from .pdf import render_pdf
+
+logger = logging.getLogger(__name__)
+
+
+DOCUMENTS_DIR = 'documents'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _money(amount):
+    return f'Rs. {Decimal(amount or 0):,.2f}'
+
+
+def fingerprint(document):
+    """SHA-256 of a document's data, used as its file name"""
+    data = json.dumps(document, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def document_path(document):
+    """Where the rendered PDF of a document is stored"""
+    digest = fingerprint(document)
+    return Path(settings.MEDIA_ROOT) / DOCUMENTS_DIR / document['kind'] / digest[:2] / f'{digest}.pdf'
+
+
+def store(path, pdf):
+    """Write a rendered PDF atomically, so readers never see a partial file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(pdf)
+    os.replace(tmp_path, path)
+
+
+# ==================== DOCUMENT DATA ====================
+
+def receipt_document(payment):
+    """Build the receipt document for a payment"""
+    bill = payment.bill
+    return {
+        'kind': 'receipt',
+        'title': f'Payment Receipt {payment.receipt_number}',
+        'details': [
+            ('Society', bill.society.name),
+            ('Flat', bill.flat.flat_number),
+            ('Bill', bill.billing_month.strftime('%B %Y')),
+            ('Date', timezone.localtime(payment.created_at).strftime('%d %b %Y')),
+            ('Paid by', payment.paid_by.get_full_name() or payment.paid_by.username),
+            ('Method', payment.get_payment_method_display()),
+            ('Transaction ID', payment.transaction_id or '-'),
+            ('Status', payment.get_payment_status_display()),
+        ],
+        'columns': [],
+        'rows': [],
+        'footer': [('Amount', _money(payment.amount))],
+    }
+
+
+def statement_documents(society_id, month, flat_ids=None):
+    """
+    Build the monthly statements of a society's flats (or only flat_ids).
+
+    Uses five queries however many flats there are: the society name, flats,
+    opening balances, the month's ledger entries and the month's bills.
+    """
+    month = month.replace(day=1)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    end = timezone.make_aware(datetime.combine(next_month, time.min))
+
+    society_name = Society.objects.filter(pk=society_id).values_list('name', flat=True).first()
+    flats = Flat.objects.filter(society_id=society_id).order_by('flat_number')
+    entries = LedgerEntry.objects.filter(society_id=society_id)
+    bills = Bill.objects.filter(society_id=society_id, billing_month=month)
+    if flat_ids is not None:
+        flats = flats.filter(pk__in=flat_ids)
+        entries = entries.filter(flat_id__in=flat_ids)
+        bills = bills.filter(flat_id__in=flat_ids)
+
+    opening = dict(
+        entries.filter(created_at__lt=start).values('flat_id').annotate(total=Sum('amount')).values_list('flat_id', 'total')
+    )
+    month_entries = {}
+    for flat_id, created_at, description, amount in entries.filter(
+        created_at__gte=start, created_at__lt=end
+    ).order_by('created_at', 'id').values_list('flat_id', 'created_at', 'description', 'amount'):
+        month_entries.setdefault(flat_id, []).append((created_at, description, amount))
+    month_bills = {
+        bill['flat_id']: bill
+        for bill in bills.values('flat_id', 'total_amount', 'paid_amount', 'due_date', 'status')
+    }
+
+    documents = []
+    for flat_id, flat_number in flats.values_list('id', 'flat_number'):
+        balance = opening.get(flat_id) or Decimal('0')
+        details = [('Society', society_name), ('Flat', flat_number), ('Opening balance', _money(balance))]
+        bill = month_bills.get(flat_id)
+        if bill:
+            details.append(('Bill due', f"{_money(bill['total_amount'])} on {bill['due_date'].strftime('%d %b %Y')}"))
+
+        rows = []
+        for created_at, description, amount in month_entries.get(flat_id, []):
+            balance += amount
+            rows.append([
+                timezone.localtime(created_at).strftime('%d %b %Y'),
+                description,
+                _money(amount),
+                _money(balance),
+            ])
+
+        documents.append({
+            'kind': 'statement',
+            'title': f"Statement for {month.strftime('%B %Y')}",
+            'flat': flat_id,
+            'details': details,
+            'columns': ['Date', 'Description', 'Amount', 'Balance'],
+            'rows': rows,
+            'footer': [('Closing balance', _money(balance))],
+        })
+    return documents
+
+
+# ==================== RENDERING ====================
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # "spawn" so workers don't inherit the parent's DB connections or locks
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.DOCUMENT_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _executor
+
+
+def _finish_render(path, future):
+    try:
+        store(path, future.result())
+    except Exception:
+        logger.exception('Rendering %s failed', path)
+    finally:
+        with _lock:
+            _pending.discard(path)
+
+
+def render_in_background(document):
+    """
+    Return the path of a document's PDF if it is already rendered; otherwise
+    queue it on the background process pool and return None.
+    """
+    path = document_path(document)
+    if path.exists():
+        return path
+
+    if not settings.DOCUMENT_RENDER_WORKERS:
+        store(path, render_pdf(document))
+        return path
+
+    with _lock:
+        if path in _pending:
+            return None
+        _pending.add(path)
+    future = _get_executor().submit(render_pdf, document)
+    future.add_done_callback(lambda future: _finish_render(path, future))
+    return None
+
+
+def render_documents(documents, workers=None):
+    """
+    Render every document that isn't cached yet, in a process pool of
+    `workers` processes. Returns {'rendered': n, 'cached': n}.
+    """
+    workers = settings.DOCUMENT_RENDER_WORKERS if workers is None else workers
+    missing = {}
+    for document in documents:
+        path = document_path(document)
+        if not path.exists():
+            missing[path] = document
+    summary = {'rendered': len(missing), 'cached': len(documents) - len(missing)}
+
+    if not workers:
+        for path, document in missing.items():
+            store(path, render_pdf(document))
+        return summary
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for path, pdf in zip(missing, pool.map(render_pdf, missing.values(), chunksize=16)):
+            store(path, pdf)
+    return summary
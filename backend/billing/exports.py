@@ -0,0 +1,82 @@
+"""
+Streaming CSV exports of bills and payments.
+
+Rows are fetched with ``values_list`` in primary key order, one keyset
+chunk at a time, and written to the response as they arrive, so memory
+use stays flat no matter how many rows are exported. Keyset chunks are
+used rather than ``QuerySet.iterator()`` because MySQL drivers buffer the
+whole result set of a single query on the client.
+"""
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (CSV header, values_list lookup)
+BILL_EXPORT_FIELDS = [
+    ('bill_id', 'id'),
+    ('flat_number', 'flat__flat_number'),
+    ('billing_month', 'billing_month'),
+    ('due_date', 'due_date'),
+    ('maintenance_charge', 'maintenance_charge'),
+    ('water_charge', 'water_charge'),
+    ('parking_charge', 'parking_charge'),
+    ('electricity_charge', 'electricity_charge'),
+    ('other_charges', 'other_charges'),
+    ('late_fee', 'late_fee'),
+    ('total_amount', 'total_amount'),
+    ('paid_amount', 'paid_amount'),
+    ('status', 'status'),
+    ('created_at', 'created_at'),
+]
+
+PAYMENT_EXPORT_FIELDS = [
+    ('payment_id', 'id'),
+    ('receipt_number', 'receipt_number'),
+    ('bill_id', 'bill_id'),
+    ('flat_number', 'bill__flat__flat_number'),
+    ('billing_month', 'bill__billing_month'),
+    ('amount', 'amount'),
+    ('payment_method', 'payment_method'),
+    ('payment_status', 'payment_status'),
+    ('transaction_id', 'transaction_id'),
+    ('paid_by', 'paid_by__username'),
+    ('created_at', 'created_at'),
+]
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def iter_chunks(queryset, lookups, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of values_list rows of a queryset in primary key order"""
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list('pk', *lookups)[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [row[1:] for row in rows]
+
+
+def stream_csv(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield CSV text one chunk of rows at a time (with a UTF-8 BOM for Excel)"""
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow([header for header, _ in fields])
+    for rows in iter_chunks(queryset, [lookup for _, lookup in fields], chunk_size):
+        yield ''.join(writer.writerow(row) for row in rows)
+
+
+def csv_response(queryset, fields, filename):
+    """Stream a queryset as a CSV attachment"""
+    response = StreamingHttpResponse(stream_csv(queryset, fields), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,226 @@
+"""
+Streaming payment import for bank/UPI statements.
+
+Rows are read from a CSV file one chunk at a time, matched to bills by flat
+number and billing month, inserted with ``bulk_create``, applied to the
+bills with one UPDATE per chunk and posted to the flats' ledgers. Only the
+current chunk and the bill index of the months seen so far are held in
+memory, so memory use does not grow with the size of the file.
+
+Expected columns (header row required):
+    flat_number, month (YYYY-MM), amount, transaction_id,
+    payment_method (optional), notes (optional)
+
+Every row needs a transaction_id (the bank/UPI reference): it is how rows
+that were imported before are recognized, so re-importing a statement
+doesn't post its payments twice.
+"""
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from society import dashboard
+from .models import Bill, Payment, bill_status_expression
+from .ledger import payment_entry, post_entries
+from .receipts import receipt_allocator
+from . import cache as billing_cache
+
+
+IMPORT_CHUNK_SIZE = 1000
+
+REPORT_FIELDS = ['line', 'flat_number', 'month', 'amount', 'transaction_id', 'reason']
+
+CENTS = Decimal('0.01')
+
+# Payment.amount is max_digits=10, decimal_places=2
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def _parse_month(value):
+    value = (value or '').strip()
+    for fmt in ('%Y-%m', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date().replace(day=1)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_amount(value):
+    """Positive amount rounded to paise, or None if it isn't a valid payment amount"""
+    try:
+        amount = Decimal((value or '').replace(',', ''))
+        if not amount.is_finite():
+            return None
+        amount = amount.quantize(CENTS, ROUND_HALF_UP)
+    except InvalidOperation:
+        return None
+    if amount <= 0 or amount > MAX_AMOUNT:
+        return None
+    return amount
+
+
+class BillIndex:
+    """(flat_number, billing_month) -> bill_id, loaded one month at a time"""
+
+    def __init__(self, society_id):
+        self.society_id = society_id
+        self._months = {}
+
+    def get(self, flat_number, billing_month):
+        if billing_month not in self._months:
+            self._months[billing_month] = {
+                number.upper(): bill_id
+                for bill_id, number in Bill.objects.filter(
+                    society_id=self.society_id,
+                    billing_month=billing_month
+                ).values_list('id', 'flat__flat_number')
+            }
+        return self._months[billing_month].get(flat_number.upper())
+
+
+def import_payments(society_id, csv_file, paid_by, report=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Import payments from an open text-mode CSV file.
+
+    Unmatched or invalid rows are passed to `report` (a callable taking a
+    dict with REPORT_FIELDS) instead of being imported. Returns a summary
+    of matched/unmatched row counts and the total amount imported.
+    """
+    index = BillIndex(society_id)
+    summary = {'rows': 0, 'imported': 0, 'unmatched': 0, 'amount': Decimal('0')}
+
+    def reject(line, row, reason):
+        summary['unmatched'] += 1
+        if report:
+            report({
+                'line': line,
+                'flat_number': row.get('flat_number', ''),
+                'month': row.get('month', ''),
+                'amount': row.get('amount', ''),
+                'transaction_id': row.get('transaction_id', ''),
+                'reason': reason,
+            })
+
+    chunk = []
+    reader = csv.DictReader(csv_file)
+    for line, row in enumerate(reader, start=2):
+        summary['rows'] += 1
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+
+        billing_month = _parse_month(row.get('month'))
+        if billing_month is None:
+            reject(line, row, 'invalid month')
+            continue
+
+        amount = _parse_amount(row.get('amount'))
+        if amount is None:
+            reject(line, row, 'invalid amount')
+            continue
+
+        if not row.get('transaction_id'):
+            reject(line, row, 'missing transaction_id')
+            continue
+
+        bill_id = index.get(row.get('flat_number', ''), billing_month)
+        if bill_id is None:
+            reject(line, row, 'no matching bill')
+            continue
+
+        chunk.append((line, row, bill_id, amount))
+        if len(chunk) >= chunk_size:
+            _import_chunk(society_id, chunk, paid_by, summary, reject)
+            chunk = []
+
+    if chunk:
+        _import_chunk(society_id, chunk, paid_by, summary, reject)
+
+    if summary['imported']:
+        # Bulk writes bypass the Payment signals
+        transaction.on_commit(lambda: dashboard.invalidate(society_id))
+        billing_cache.bump_version_on_commit(society_id)
+
+    return summary
+
+
+@transaction.atomic
+def _import_chunk(society_id, chunk, paid_by, summary, reject):
+    """Insert one chunk of matched rows and apply them to their bills"""
+    # Skip transaction ids that were already imported, in this file or before
+    transaction_ids = {row['transaction_id'] for _, row, _, _ in chunk}
+    seen = set(
+        Payment.objects.filter(
+            bill__society_id=society_id,
+            transaction_id__in=transaction_ids
+        ).values_list('transaction_id', flat=True)
+    )
+
+    payments = []
+    bill_amounts = {}
+    for line, row, bill_id, amount in chunk:
+        transaction_id = row['transaction_id']
+        if transaction_id in seen:
+            reject(line, row, 'duplicate transaction_id')
+            continue
+        seen.add(transaction_id)
+
+        payment_method = row.get('payment_method', '').upper()
+        if payment_method not in Payment.PaymentMethod.values:
+            payment_method = Payment.PaymentMethod.ONLINE
+
+        payments.append(Payment(
+            bill_id=bill_id,
+            amount=amount,
+            payment_method=payment_method,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            transaction_id=transaction_id,
+            paid_by=paid_by,
+            notes=row.get('notes', '') or 'Imported from statement',
+        ))
+        bill_amounts[bill_id] = bill_amounts.get(bill_id, Decimal('0')) + amount
+
+    if not payments:
+        return
+
+    for payment, receipt_number in zip(payments, receipt_allocator.allocate(society_id, count=len(payments))):
+        payment.receipt_number = receipt_number
+    Payment.objects.bulk_create(payments, batch_size=IMPORT_CHUNK_SIZE)
+
+    # Not every backend returns primary keys from bulk inserts (MySQL doesn't),
+    # so read them back by receipt number for the ledger entries.
+    if payments[0].pk is None:
+        ids = dict(
+            Payment.objects.filter(
+                receipt_number__in=[payment.receipt_number for payment in payments]
+            ).values_list('receipt_number', 'id')
+        )
+        for payment in payments:
+            payment.pk = ids[payment.receipt_number]
+
+    # One UPDATE for the whole chunk; status is assigned before paid_amount
+    # so MySQL's left-to-right SET evaluation still reads the old value.
+    increment = Case(
+        *[When(pk=bill_id, then=Value(amount)) for bill_id, amount in bill_amounts.items()],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    paid_amount = F('paid_amount') + increment
+    Bill.objects.filter(pk__in=list(bill_amounts)).update(
+        status=bill_status_expression(paid_amount=paid_amount),
+        paid_amount=paid_amount,
+        updated_at=timezone.now(),
+    )
+
+    bill_flats = {
+        bill_id: (society_id, flat_id)
+        for bill_id, society_id, flat_id in Bill.objects.filter(
+            pk__in=list(bill_amounts)
+        ).values_list('id', 'society_id', 'flat_id')
+    }
+    post_entries([payment_entry(payment, *bill_flats[payment.bill_id]) for payment in payments])
+
+    summary['imported'] += len(payments)
+    summary['amount'] += sum(bill_amounts.values())
@@ -0,0 +1,138 @@
+"""
+Per-flat ledger.
+
+Every change to what a flat owes is appended to LedgerEntry and added to
+the flat's FlatBalance row in the same transaction as the Bill/Payment
+write, so "who owes what" is an indexed read of FlatBalance and a statement
+is a range scan of LedgerEntry.
+
+``post_entries`` is the only writer. It inserts entries in bulk and applies
+the per-flat totals with one UPDATE, so bulk paths (bill run, sweeper,
+statement import) cost a fixed number of queries per chunk. Zero-amount
+entries are dropped, which means the empty default utility bills created
+with new flats don't appear on statements until they are charged; the first
+charge then raises them with a BILL entry rather than an adjustment.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from .models import FlatBalance, LedgerEntry
+
+
+LEDGER_BATCH_SIZE = 1000
+
+
+def bill_entry(bill, amount=None, entry_type=LedgerEntry.EntryType.BILL, description=None):
+    """Build (without saving) a ledger entry for a bill, by default for raising it"""
+    if description is None:
+        month = bill.billing_month.strftime('%B %Y')
+        if entry_type == LedgerEntry.EntryType.BILL:
+            description = f"Bill for {month}"
+        elif entry_type == LedgerEntry.EntryType.LATE_FEE:
+            description = f"Late fee for {month}"
+        else:
+            description = f"Adjustment to bill for {month}"
+
+    return LedgerEntry(
+        society_id=bill.society_id,
+        flat_id=bill.flat_id,
+        bill_id=bill.pk,
+        entry_type=entry_type,
+        amount=bill.total_amount if amount is None else amount,
+        description=description,
+    )
+
+
+def payment_entry(payment, society_id, flat_id):
+    """Build (without saving) the ledger entry for a successful payment"""
+    return LedgerEntry(
+        society_id=society_id,
+        flat_id=flat_id,
+        bill_id=payment.bill_id,
+        payment_id=payment.pk,
+        entry_type=LedgerEntry.EntryType.PAYMENT,
+        amount=-payment.amount,
+        description=f"Payment {payment.receipt_number}",
+    )
+
+
+def post_entries(entries):
+    """
+    Insert ledger entries and add them to their flats' balances.
+
+    Must be called inside the transaction that made the change the entries
+    describe. Returns the number of entries posted.
+    """
+    entries = [entry for entry in entries if entry.amount]
+    if not entries:
+        return 0
+
+    LedgerEntry.objects.bulk_create(entries, batch_size=LEDGER_BATCH_SIZE)
+
+    deltas = {}
+    societies = {}
+    for entry in entries:
+        deltas[entry.flat_id] = deltas.get(entry.flat_id, Decimal('0')) + entry.amount
+        societies[entry.flat_id] = entry.society_id
+
+    # Make sure every flat has a balance row, then apply all deltas in one UPDATE.
+    # Incrementing with F() keeps concurrent postings for the same flat correct.
+    FlatBalance.objects.bulk_create(
+        [FlatBalance(flat_id=flat_id, society_id=society_id) for flat_id, society_id in societies.items()],
+        batch_size=LEDGER_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    increment = Case(
+        *[When(flat_id=flat_id, then=Value(delta)) for flat_id, delta in deltas.items()],
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    FlatBalance.objects.filter(flat_id__in=list(deltas)).update(
+        balance=F('balance') + increment,
+        updated_at=timezone.now(),
+    )
+
+    return len(entries)
+
+
+def bill_change_entry(bill, previous_total, raised, description=None):
+    """
+    Build (without saving) the ledger entry for a change to a bill's total.
+    
+    ``raised`` tells whether the bill already has a BILL entry; a bill that
+    was empty until now is raised by this change instead of adjusted.
+    ``description`` replaces the default one of an adjustment.
+    """
+    if not previous_total and not raised:
+        return bill_entry(bill)
+    return bill_entry(
+        bill,
+        amount=bill.total_amount - previous_total,
+        entry_type=LedgerEntry.EntryType.ADJUSTMENT,
+        description=description,
+    )
+
+
+def record_bill_saved(bill, previous_total):
+    """Post the ledger entry for a Bill.save(); previous_total is None for new bills"""
+    if previous_total is None:
+        return post_entries([bill_entry(bill)])
+
+    raised = bool(previous_total) or LedgerEntry.objects.filter(
+        bill_id=bill.pk, entry_type=LedgerEntry.EntryType.BILL
+    ).exists()
+    return post_entries([bill_change_entry(bill, previous_total, raised)])
+
+
+def record_bill_deleted(bill):
+    """Write off what was still owed on a deleted bill"""
+    entry = bill_entry(
+        bill,
+        amount=bill.paid_amount - bill.total_amount,
+        entry_type=LedgerEntry.EntryType.ADJUSTMENT,
+        description=f"Bill for {bill.billing_month.strftime('%B %Y')} deleted",
+    )
+    # The bill row is already gone, so the entry can't reference it
+    entry.bill_id = None
+    return post_entries([entry])
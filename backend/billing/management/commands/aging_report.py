@@ -0,0 +1,50 @@
+"""
+Django management command to print or export the dues aging report.
+
+Examples:
+    python manage.py aging_report
+    python manage.py aging_report --society 1 --csv aging.csv
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from society.models import Society
+from billing.aging import AGING_BUCKETS, build_aging_report, write_csv
+
+
+class Command(BaseCommand):
+    help = 'Print dues aging buckets per society, or export one society as CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--society',
+            type=int,
+            help='Only report this society ID (default: every society)',
+        )
+        parser.add_argument(
+            '--csv',
+            help='Write the per-flat rows to this CSV file (requires --society)',
+        )
+
+    def handle(self, *args, **options):
+        if options['csv']:
+            if not options['society']:
+                raise CommandError('--csv requires --society')
+            report = build_aging_report(options['society'])
+            with open(options['csv'], 'w', newline='') as output:
+                write_csv(report, output)
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] Wrote {len(report["flats"])} flats to {options["csv"]}'
+            ))
+            return
+
+        societies = Society.objects.all()
+        if options['society']:
+            societies = societies.filter(id=options['society'])
+
+        for society in societies.only('id', 'name'):
+            totals = build_aging_report(society.id)['totals']
+            buckets = ', '.join(f'{label}: {totals[key]:.2f}' for key, label, _, _ in AGING_BUCKETS)
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {society.name}: {totals["total"]:.2f} outstanding ({buckets})'
+            ))
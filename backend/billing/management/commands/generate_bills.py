@@ -0,0 +1,60 @@
+"""
+Django management command to run the monthly bill run from society tariffs.
+"""
+
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from billing.models import Tariff
+from billing.billrun import generate_bills, BILL_RUN_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Generate bills for a month from each society\'s tariff (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            type=str,
+            help='Billing month as YYYY-MM (default: current month)',
+        )
+        parser.add_argument(
+            '--society',
+            type=int,
+            help='Only bill this society ID (default: every society with a tariff)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=BILL_RUN_CHUNK_SIZE,
+            help=f'Flats written per transaction (default: {BILL_RUN_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                billing_month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must be in YYYY-MM format')
+        else:
+            billing_month = timezone.now().date().replace(day=1)
+
+        tariffs = Tariff.objects.select_related('society')
+        if options['society']:
+            tariffs = tariffs.filter(society_id=options['society'])
+            if not tariffs.exists():
+                raise CommandError(f'Society {options["society"]} has no tariff')
+
+        for tariff in tariffs:
+            start = time.perf_counter()
+            summary = generate_bills(tariff, billing_month, chunk_size=options['chunk_size'])
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {tariff.society.name} {billing_month:%Y-%m}: '
+                f'{summary["created"]} created, {summary["updated"]} updated, '
+                f'{summary["unchanged"]} unchanged, {summary["skipped"]} skipped (paid) '
+                f'in {elapsed:.2f}s'
+            ))
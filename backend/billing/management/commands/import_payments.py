@@ -0,0 +1,78 @@
+"""
+Django management command to import payments from a bank/UPI statement CSV.
+"""
+
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from society.models import Society
+from billing.imports import import_payments, REPORT_FIELDS, IMPORT_CHUNK_SIZE
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import payments from a statement CSV (flat_number, month, amount, transaction_id, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', type=str, help='Path to the statement CSV file')
+        parser.add_argument(
+            '--society',
+            type=int,
+            required=True,
+            help='Society ID the statement belongs to',
+        )
+        parser.add_argument(
+            '--user',
+            type=str,
+            required=True,
+            help='Username recorded as paid_by on imported payments',
+        )
+        parser.add_argument(
+            '--report',
+            type=str,
+            help='Write unmatched rows to this CSV file',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help=f'Rows written per transaction (default: {IMPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if not Society.objects.filter(id=options['society']).exists():
+            raise CommandError(f'Society {options["society"]} does not exist')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+
+        report_file = None
+        report = None
+        if options['report']:
+            report_file = open(options['report'], 'w', newline='', encoding='utf-8')
+            writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            report = writer.writerow
+
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8-sig') as csv_file:
+                summary = import_payments(
+                    options['society'],
+                    csv_file,
+                    user,
+                    report=report,
+                    chunk_size=options['chunk_size'],
+                )
+        finally:
+            if report_file:
+                report_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {summary["imported"]} of {summary["rows"]} rows imported '
+            f'({summary["amount"]}), {summary["unmatched"]} unmatched'
+        ))
+        if summary['unmatched'] and options['report']:
+            self.stdout.write(self.style.WARNING(f'Unmatched rows written to {options["report"]}'))
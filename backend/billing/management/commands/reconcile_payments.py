@@ -0,0 +1,53 @@
+"""
+Django management command to check Bill.paid_amount against payments.
+
+Meant to run nightly from cron, e.g.:
+    0 2 * * * cd /path/to/backend && python manage.py reconcile_payments --fix
+"""
+
+from django.core.management.base import BaseCommand
+
+from billing.reconcile import reconcile_paid_amounts
+
+
+# Drifted bills listed in the output; the summary always counts all of them
+REPORT_LIMIT = 50
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally fix) bills whose paid_amount does not match their successful payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--society',
+            type=int,
+            help='Only check this society ID (default: every society)',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Correct paid_amount and status of drifted bills',
+        )
+
+    def handle(self, *args, **options):
+        reported = []
+
+        def report(row):
+            if len(reported) < REPORT_LIMIT:
+                reported.append(row)
+
+        summary = reconcile_paid_amounts(options['society'], fix=options['fix'], report=report)
+
+        for row in reported:
+            self.stdout.write(
+                f'Bill {row["bill"]} (flat {row["flat"]}): paid_amount {row["paid_amount"]}, '
+                f'successful payments {row["payments_total"]}'
+            )
+        if summary['drifted'] > len(reported):
+            self.stdout.write(f'... and {summary["drifted"] - len(reported)} more')
+
+        style = self.style.SUCCESS if summary['drifted'] == summary['fixed'] else self.style.WARNING
+        self.stdout.write(style(
+            f'[OK] {summary["drifted"]} bills drifted, {summary["fixed"]} fixed '
+            f'(difference {summary["difference"]:.2f})'
+        ))
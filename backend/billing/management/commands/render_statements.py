@@ -0,0 +1,58 @@
+"""
+Django management command to render every flat's monthly statement PDF.
+
+Meant to run at month end after the bill run, e.g.:
+    python manage.py render_statements --month 2025-01 --workers 8
+
+Statements whose data hasn't changed since the last run are already cached
+and are skipped.
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from society.models import Society
+from billing.documents import render_documents, statement_documents
+
+
+class Command(BaseCommand):
+    help = 'Render monthly statement PDFs for every flat'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            help='Statement month as YYYY-MM (default: current month)',
+        )
+        parser.add_argument(
+            '--society',
+            type=int,
+            help='Only render this society ID (default: every society)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Rendering processes (default: DOCUMENT_RENDER_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            month = (
+                datetime.strptime(options['month'], '%Y-%m').date()
+                if options['month'] else timezone.now().date().replace(day=1)
+            )
+        except ValueError:
+            raise CommandError('--month must be in YYYY-MM format')
+
+        societies = Society.objects.all()
+        if options['society']:
+            societies = societies.filter(id=options['society'])
+
+        for society in societies.only('id', 'name'):
+            documents = statement_documents(society.id, month)
+            summary = render_documents(documents, workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {society.name}: {summary["rendered"]} statements rendered, '
+                f'{summary["cached"]} already up to date'
+            ))
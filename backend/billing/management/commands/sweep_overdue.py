@@ -0,0 +1,34 @@
+"""
+Django management command to mark past-due bills overdue and apply late fees.
+
+Meant to run once a day from cron, e.g.:
+    0 1 * * * cd /path/to/backend && python manage.py sweep_overdue
+"""
+
+from django.core.management.base import BaseCommand
+
+from society.models import Society
+from billing.sweeper import sweep_overdue
+
+
+class Command(BaseCommand):
+    help = 'Mark past-due bills overdue and apply tariff late fees'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--society',
+            type=int,
+            help='Only sweep this society ID (default: every society)',
+        )
+
+    def handle(self, *args, **options):
+        societies = Society.objects.all()
+        if options['society']:
+            societies = societies.filter(id=options['society'])
+
+        for society in societies.only('id', 'name'):
+            summary = sweep_overdue(society.id)
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {society.name}: {summary["overdue"]} marked overdue, '
+                f'{summary["late_fees"]} late fees applied'
+            ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_payment_idempotency_key'),
+        ('society', '0003_block_flat_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('financial_year', models.IntegerField(help_text='Starting year of the financial year, e.g. 2025 for 2025-26')),
+                ('next_value', models.BigIntegerField(default=1)),
+                ('society', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipt_sequences', to='society.society')),
+            ],
+            options={
+                'unique_together': {('society', 'financial_year')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0006_receipt_sequence'),
+        ('society', '0003_block_flat_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tariff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('maintenance_per_sqft', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('maintenance_by_bhk', models.JSONField(blank=True, default=dict, help_text='Flat fee by BHK, e.g. {"2BHK": 2500}')),
+                ('parking_per_slot', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('water_charge', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('due_in_days', models.IntegerField(default=30, help_text='Days after the billing month starts that bills are due')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('society', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tariff', to='society.society')),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0007_tariff'),
+        ('society', '0003_block_flat_block'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tariff',
+            name='late_fee_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='tariff',
+            name='late_fee_grace_days',
+            field=models.IntegerField(default=0, help_text='Days after the due date before the late fee applies'),
+        ),
+        migrations.AddField(
+            model_name='tariff',
+            name='late_fee_percent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=5),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['society', 'status', 'due_date'], name='billing_bil_society_bd2100_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_ledger(apps, schema_editor):
+    """Raise existing bills and post successful payments, then total the balances"""
+    Bill = apps.get_model('billing', 'Bill')
+    Payment = apps.get_model('billing', 'Payment')
+    LedgerEntry = apps.get_model('billing', 'LedgerEntry')
+    FlatBalance = apps.get_model('billing', 'FlatBalance')
+
+    entries = [
+        LedgerEntry(
+            society_id=bill.society_id,
+            flat_id=bill.flat_id,
+            bill_id=bill.id,
+            entry_type='BILL',
+            amount=bill.total_amount,
+            description=f"Bill for {bill.billing_month.strftime('%B %Y')}",
+            created_at=bill.created_at,
+        )
+        for bill in Bill.objects.exclude(total_amount=0).iterator()
+    ]
+    entries.extend(
+        LedgerEntry(
+            society_id=payment.bill.society_id,
+            flat_id=payment.bill.flat_id,
+            bill_id=payment.bill_id,
+            payment_id=payment.id,
+            entry_type='PAYMENT',
+            amount=-payment.amount,
+            description=f"Payment {payment.receipt_number}",
+            created_at=payment.created_at,
+        )
+        for payment in Payment.objects.filter(payment_status='SUCCESS').select_related('bill').iterator()
+    )
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    FlatBalance.objects.bulk_create(
+        [
+            FlatBalance(flat_id=row['flat_id'], society_id=row['society_id'], balance=row['balance'])
+            for row in LedgerEntry.objects.values('flat_id', 'society_id').annotate(balance=Sum('amount'))
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0009_payment_transaction_id_index'),
+        ('society', '0003_block_flat_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlatBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('flat', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='society.flat')),
+                ('society', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flat_balances', to='society.society')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['society', 'balance'], name='billing_fla_society_659270_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('BILL', 'Bill Raised'), ('PAYMENT', 'Payment'), ('LATE_FEE', 'Late Fee'), ('ADJUSTMENT', 'Adjustment')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bill', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='billing.bill')),
+                ('flat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='society.flat')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='billing.payment')),
+                ('society', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='society.society')),
+            ],
+            options={
+                'verbose_name_plural': 'Ledger entries',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(fields=['flat', 'created_at'], name='billing_led_flat_id_1ff83a_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,47 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.db.models.lookups import Exact, GreaterThan, GreaterThanOrEqual
 from django.conf import settings
+from django.utils import timezone
 from decimal import Decimal
 
 
+def bill_status_expression(paid_amount=None, total_amount=None, today=None):
+    """
+    SQL equivalent of Bill.update_status() for set-based updates.
+    
+    Pass expressions for paid_amount/total_amount when they change in the
+    same UPDATE, so the status is derived from the new values.
+    """
+    paid_amount = F('paid_amount') if paid_amount is None else paid_amount
+    total_amount = F('total_amount') if total_amount is None else total_amount
+    today = today or timezone.now().date()
+    
+    return Case(
+        When(GreaterThanOrEqual(paid_amount, total_amount), then=Value(Bill.Status.PAID)),
+        When(GreaterThan(paid_amount, 0), then=Value(Bill.Status.PARTIAL)),
+        When(Q(due_date__lt=today) & Exact(paid_amount, 0), then=Value(Bill.Status.OVERDUE)),
+        default=Value(Bill.Status.UNPAID),
+        output_field=CharField(),
+    )
+
+
+def apply_payment_amount(bill_id, amount):
+    """
+    Atomically add a payment amount to a bill and re-derive its status in
+    the same UPDATE, so concurrent payments can't overwrite each other.
+    """
+    paid_amount = F('paid_amount') + amount
+    
+    # status is assigned before paid_amount: MySQL evaluates SET clauses left
+    # to right, so this keeps both assignments reading the old paid_amount.
+    return Bill.objects.filter(pk=bill_id).update(
+        status=bill_status_expression(paid_amount=paid_amount),
+        paid_amount=paid_amount,
+        updated_at=timezone.now(),
+    )
+
+
 class Bill(models.Model):
     """Model for billing"""
     
@@ -55,11 +94,8 @@ class Bill(models.Model):
         )
         return self.total_amount
     
-    def save(self, *args, **kwargs):
-        self.calculate_total()
-        
-        # Update status based on payment
-        from django.utils import timezone
+    def update_status(self):
+        """Update status based on payment"""
         today = timezone.now().date()
         
         if self.paid_amount >= self.total_amount:
@@ -70,12 +106,49 @@ class Bill(models.Model):
             self.status = Bill.Status.OVERDUE
         else:
             self.status = Bill.Status.UNPAID
+        return self.status
+    
+    def save(self, *args, **kwargs):
+        from .ledger import record_bill_saved
+        
+        self.calculate_total()
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # paid_amount is only changed by set-based updates (payments,
+            # imports, reconciliation). The row is locked until commit and
+            # paid_amount is left out of the UPDATE, so an edit of a loaded
+            # bill can't undo a payment applied since it was read.
+            if self._state.adding:
+                previous = None
+            else:
+                previous = (
+                    Bill.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values('total_amount', 'paid_amount')
+                    .first()
+                )
+            
+            if previous is not None:
+                self.paid_amount = previous['paid_amount']
+                update_fields = kwargs.get('update_fields')
+                if update_fields is None:
+                    update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+                kwargs['update_fields'] = [name for name in update_fields if name != 'paid_amount']
+            
+            self.update_status()
+            super().save(*args, **kwargs)
+            
+            # Post the new bill, or the change to its total, to the flat's ledger
+            previous_total = previous['total_amount'] if previous is not None else None
+            if previous_total is None or previous_total != self.total_amount:
+                record_bill_saved(self, previous_total)
     
     class Meta:
         ordering = ['-billing_month']
         unique_together = ['flat', 'billing_month']
+        indexes = [
+            models.Index(fields=['society', 'status', 'due_date']),
+        ]
 
 
 class Payment(models.Model):
@@ -100,7 +173,7 @@ class Payment(models.Model):
     payment_status = models.CharField(max_length=10, choices=PaymentStatus.choices, default=PaymentStatus.PENDING)
     
     # Payment gateway details
-    transaction_id = models.CharField(max_length=100, blank=True)
+    transaction_id = models.CharField(max_length=100, blank=True, db_index=True)
     
     # Receipt
     receipt_number = models.CharField(max_length=50, unique=True)
@@ -108,6 +181,9 @@ class Payment(models.Model):
     paid_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payments_made')
     notes = models.TextField(blank=True)
     
+    # Client-supplied Idempotency-Key, so retried requests don't post twice
+    idempotency_key = models.CharField(max_length=100, null=True, blank=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -115,18 +191,133 @@ class Payment(models.Model):
         return f"Payment {self.receipt_number} - {self.amount}"
     
     def save(self, *args, **kwargs):
+        from .ledger import payment_entry, post_entries
+        
         # Generate receipt number if not exists
         if not self.receipt_number:
-            from django.utils import timezone
-            self.receipt_number = f"RCP{timezone.now().strftime('%Y%m%d%H%M%S')}"
+            from .receipts import receipt_allocator
+            self.receipt_number = receipt_allocator.allocate(self.bill.society_id)[0]
         
-        super().save(*args, **kwargs)
-        
-        # Update bill's paid amount
-        if self.payment_status == Payment.PaymentStatus.SUCCESS:
-            self.bill.paid_amount += self.amount
-            self.bill.save()
+        with transaction.atomic():
+            # Only a payment that becomes successful adds to the bill, not every
+            # re-save. The row is locked until commit, so concurrent re-saves
+            # (e.g. duplicate gateway callbacks) can't both see it as pending.
+            if self._state.adding:
+                previous_status = None
+            else:
+                previous_status = (
+                    Payment.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('payment_status', flat=True)
+                    .first()
+                )
+            
+            super().save(*args, **kwargs)
+            
+            # Update bill's paid amount
+            if (self.payment_status == Payment.PaymentStatus.SUCCESS
+                    and previous_status != Payment.PaymentStatus.SUCCESS):
+                apply_payment_amount(self.bill_id, self.amount)
+                self.bill.refresh_from_db(fields=['paid_amount', 'status', 'updated_at'])
+                post_entries([payment_entry(self, self.bill.society_id, self.bill.flat_id)])
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['bill', 'idempotency_key'], name='unique_payment_idempotency_key'),
+        ]
+
+
+
+class ReceiptSequence(models.Model):
+    """Receipt number sequence per society and financial year"""
+    society = models.ForeignKey('society.Society', on_delete=models.CASCADE, related_name='receipt_sequences')
+    financial_year = models.IntegerField(help_text="Starting year of the financial year, e.g. 2025 for 2025-26")
+    next_value = models.BigIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.society} - FY{self.financial_year} ({self.next_value})"
+    
+    class Meta:
+        unique_together = ['society', 'financial_year']
+
+
+class Tariff(models.Model):
+    """Billing rates used by the monthly bill run for a society"""
+    society = models.OneToOneField('society.Society', on_delete=models.CASCADE, related_name='tariff')
+    
+    # Maintenance: per square foot of Flat.area_sqft plus a flat fee by BHK
+    maintenance_per_sqft = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    maintenance_by_bhk = models.JSONField(default=dict, blank=True, help_text='Flat fee by BHK, e.g. {"2BHK": 2500}')
+    
+    # Parking: per slot in Flat.parking_slots
+    parking_per_slot = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    
+    # Water: flat fee per flat
+    water_charge = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    
+    due_in_days = models.IntegerField(default=30, help_text="Days after the billing month starts that bills are due")
+    
+    # Late fee applied once by the overdue sweeper: a flat amount plus a percentage of the bill
+    late_fee_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    late_fee_percent = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    late_fee_grace_days = models.IntegerField(default=0, help_text="Days after the due date before the late fee applies")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Tariff - {self.society}"
+
 
+class LedgerEntry(models.Model):
+    """
+    Append-only record of every change to what a flat owes.
+    
+    Amounts are signed: charges are positive and payments negative, so a
+    flat's balance is the sum of its entries. Entries are written by
+    billing.ledger in the same transaction as the Bill/Payment change.
+    """
+    
+    class EntryType(models.TextChoices):
+        BILL = 'BILL', 'Bill Raised'
+        PAYMENT = 'PAYMENT', 'Payment'
+        LATE_FEE = 'LATE_FEE', 'Late Fee'
+        ADJUSTMENT = 'ADJUSTMENT', 'Adjustment'
+    
+    society = models.ForeignKey('society.Society', on_delete=models.CASCADE, related_name='ledger_entries')
+    flat = models.ForeignKey('society.Flat', on_delete=models.CASCADE, related_name='ledger_entries')
+    bill = models.ForeignKey(Bill, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    payment = models.ForeignKey(Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries')
+    
+    entry_type = models.CharField(max_length=10, choices=EntryType.choices)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    description = models.CharField(max_length=255, blank=True)
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.flat} - {self.get_entry_type_display()} {self.amount}"
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        verbose_name_plural = 'Ledger entries'
+        indexes = [
+            models.Index(fields=['flat', 'created_at']),
+        ]
+
+
+class FlatBalance(models.Model):
+    """Running balance of a flat's ledger, kept up to date by billing.ledger"""
+    flat = models.OneToOneField('society.Flat', on_delete=models.CASCADE, related_name='balance')
+    society = models.ForeignKey('society.Society', on_delete=models.CASCADE, related_name='flat_balances')
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.flat} - {self.balance}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['society', 'balance']),
+        ]
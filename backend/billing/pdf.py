@@ -0,0 +1,88 @@
+"""
+PDF rendering for receipts and statements.
+
+``render_pdf`` turns a plain document dict into PDF bytes with Pillow. It
+doesn't touch Django or the database, so it can run in worker processes
+started with the "spawn" method (see ``billing.documents``).
+
+Document format:
+    {
+        'title': str,
+        'details': [(label, value), ...],
+        'columns': [header, ...],
+        'rows': [[cell, ...], ...],
+        'footer': [(label, value), ...],
+    }
+"""
+import io
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+# A4 at 150 dpi
+PAGE_SIZE = (1240, 1754)
+RESOLUTION = 150.0
+MARGIN = 100
+LINE_HEIGHT = 36
+
+
+def _fonts():
+    return ImageFont.load_default(size=40), ImageFont.load_default(size=24)
+
+
+def _column_positions(count):
+    width = (PAGE_SIZE[0] - 2 * MARGIN) // max(count, 1)
+    return [MARGIN + index * width for index in range(count)]
+
+
+def render_pdf(document):
+    """Render a document dict to PDF bytes, adding pages as the rows need"""
+    title_font, font = _fonts()
+    pages = []
+
+    def new_page():
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        pages.append(page)
+        return ImageDraw.Draw(page), MARGIN
+
+    draw, y = new_page()
+    draw.text((MARGIN, y), document['title'], font=title_font, fill='black')
+    y += 2 * LINE_HEIGHT
+
+    for label, value in document.get('details', []):
+        draw.text((MARGIN, y), f'{label}: {value}', font=font, fill='black')
+        y += LINE_HEIGHT
+    y += LINE_HEIGHT
+
+    columns = document.get('columns', [])
+    positions = _column_positions(len(columns))
+
+    def draw_header(draw, y):
+        for x, header in zip(positions, columns):
+            draw.text((x, y), str(header), font=font, fill='black')
+        y += LINE_HEIGHT
+        draw.line((MARGIN, y - 6, PAGE_SIZE[0] - MARGIN, y - 6), fill='black', width=2)
+        return y
+
+    if columns:
+        y = draw_header(draw, y)
+    for row in document.get('rows', []):
+        if y > PAGE_SIZE[1] - MARGIN - LINE_HEIGHT:
+            draw, y = new_page()
+            y = draw_header(draw, y)
+        for x, cell in zip(positions, row):
+            draw.text((x, y), str(cell), font=font, fill='black')
+        y += LINE_HEIGHT
+
+    footer = document.get('footer', [])
+    if footer:
+        if y > PAGE_SIZE[1] - MARGIN - (len(footer) + 1) * LINE_HEIGHT:
+            draw, y = new_page()
+        y += LINE_HEIGHT
+        for label, value in footer:
+            draw.text((MARGIN, y), f'{label}: {value}', font=font, fill='black')
+            y += LINE_HEIGHT
+
+    output = io.BytesIO()
+    pages[0].save(output, format='PDF', resolution=RESOLUTION, save_all=True, append_images=pages[1:])
+    return output.getvalue()
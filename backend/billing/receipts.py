@@ -0,0 +1,94 @@
+"""
+Receipt number allocation.
+
+Each process reserves blocks of receipt numbers per society and financial
+year from ``ReceiptSequence`` and hands them out from memory, so only one
+payment in every ``RECEIPT_BLOCK_SIZE`` needs a database round trip.
+Numbers are unique and increase within a process; numbers left unused when
+a process exits are simply skipped.
+"""
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ReceiptSequence
+
+
+RECEIPT_BLOCK_SIZE = 100
+
+# Indian financial years run April to March
+FINANCIAL_YEAR_START_MONTH = 4
+
+
+def financial_year(day):
+    """Return the starting year of the financial year containing `day`"""
+    return day.year if day.month >= FINANCIAL_YEAR_START_MONTH else day.year - 1
+
+
+def format_receipt_number(society_id, fy, number):
+    """e.g. RCP2526-3-000042 for society 3, FY 2025-26"""
+    return f"RCP{fy % 100:02d}{(fy + 1) % 100:02d}-{society_id}-{number:06d}"
+
+
+class ReceiptNumberAllocator:
+    """Hands out receipt numbers from ranges reserved per process"""
+    
+    def __init__(self, block_size=RECEIPT_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        # (society_id, financial_year) -> [next_value, end) available in memory
+        self._ranges = {}
+    
+    def allocate(self, society_id, count=1, day=None):
+        """Return `count` unused receipt numbers for a society"""
+        fy = financial_year(day or timezone.now().date())
+        key = (society_id, fy)
+        
+        with self._lock:
+            start, end = self._ranges.get(key, (0, 0))
+            taken = min(count, end - start)
+            numbers = list(range(start, start + taken))
+            if taken:
+                self._ranges[key] = (start + taken, end)
+        
+        if taken < count:
+            missing = count - taken
+            start = self._reserve(society_id, fy, max(missing, self.block_size))
+            end = start + max(missing, self.block_size)
+            numbers.extend(range(start, start + missing))
+            self._publish(key, start + missing, end)
+        
+        return [format_receipt_number(society_id, fy, number) for number in numbers]
+    
+    def _reserve(self, society_id, fy, size):
+        """Reserve `size` numbers in the database and return the first one"""
+        with transaction.atomic():
+            sequence, _ = ReceiptSequence.objects.select_for_update().get_or_create(
+                society_id=society_id,
+                financial_year=fy
+            )
+            ReceiptSequence.objects.filter(pk=sequence.pk).update(next_value=F('next_value') + size)
+        return sequence.next_value
+    
+    def _publish(self, key, start, end):
+        """Make the rest of a reserved block available to other callers"""
+        def publish():
+            # Blocks can be published out of order (a transaction holding a
+            # lower block may commit after a higher one was published), so
+            # only move forward: whatever is left of the lower block becomes
+            # a gap, and numbers keep increasing.
+            with self._lock:
+                if start > self._ranges.get(key, (0, 0))[0]:
+                    self._ranges[key] = (start, end)
+        
+        # If the reservation is still inside an open transaction it could be
+        # rolled back and handed out again, so only share it once committed.
+        if connection.in_atomic_block:
+            transaction.on_commit(publish)
+        else:
+            publish()
+
+
+receipt_allocator = ReceiptNumberAllocator()
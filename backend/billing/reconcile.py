@@ -0,0 +1,118 @@
+"""
+Bill.paid_amount integrity reconciler.
+
+Bill.paid_amount is denormalized from the bill's successful payments.
+Refunds, failed payments and races can leave it wrong, so the reconciler
+compares it with SUM(amount) of the SUCCESS payments of every bill in one
+grouped query and reports the bills that drifted. With ``fix=True`` the
+drifted bills are corrected a chunk at a time, with one UPDATE per chunk
+and the difference posted to the flats' ledgers.
+"""
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from society import dashboard
+from .ledger import post_entries
+from .models import Bill, LedgerEntry, Payment, bill_status_expression
+from . import cache as billing_cache
+
+
+RECONCILE_CHUNK_SIZE = 1000
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def drifted_bills(bills):
+    """
+    Annotate a Bill queryset with the sum of its successful payments and
+    keep only bills whose paid_amount differs from it.
+
+    Rows are (bill_id, society_id, flat_id, paid_amount, payments_total).
+    """
+    return (
+        bills.annotate(
+            payments_total=Coalesce(
+                Sum('payments__amount', filter=Q(payments__payment_status=Payment.PaymentStatus.SUCCESS)),
+                Value(0, output_field=MONEY),
+                output_field=MONEY,
+            )
+        )
+        .exclude(paid_amount=F('payments_total'))
+        .order_by('id')
+        .values_list('id', 'society_id', 'flat_id', 'paid_amount', 'payments_total')
+    )
+
+
+def reconcile_paid_amounts(society_id=None, fix=False, report=None, chunk_size=RECONCILE_CHUNK_SIZE):
+    """
+    Find (and with fix=True correct) bills whose paid_amount doesn't match
+    their successful payments.
+
+    Each drifted bill is passed to `report` as a dict. Returns
+    {'drifted': n, 'fixed': n, 'difference': sum of (payments - paid_amount)}.
+    """
+    bills = Bill.objects.all()
+    if society_id:
+        bills = bills.filter(society_id=society_id)
+
+    # Only drifted bills come back from the database, so this list stays small
+    rows = list(drifted_bills(bills))
+    summary = {'drifted': len(rows), 'fixed': 0, 'difference': 0.0}
+    for bill_id, bill_society_id, flat_id, paid_amount, payments_total in rows:
+        summary['difference'] += float(payments_total - paid_amount)
+        if report:
+            report({
+                'bill': bill_id,
+                'society': bill_society_id,
+                'flat': flat_id,
+                'paid_amount': paid_amount,
+                'payments_total': payments_total,
+            })
+
+    if fix:
+        for start in range(0, len(rows), chunk_size):
+            summary['fixed'] += _fix_chunk([row[0] for row in rows[start:start + chunk_size]])
+
+    return summary
+
+
+@transaction.atomic
+def _fix_chunk(bill_ids):
+    """Set paid_amount to the payments total for a chunk of drifted bills"""
+    # Lock the bills, then recompute: a payment may have landed since the scan
+    locked = list(Bill.objects.select_for_update().filter(pk__in=bill_ids).values_list('id', flat=True))
+    rows = list(drifted_bills(Bill.objects.filter(pk__in=locked)))
+    if not rows:
+        return 0
+
+    corrected = Case(
+        *[When(pk=bill_id, then=Value(payments_total)) for bill_id, _, _, _, payments_total in rows],
+        output_field=MONEY,
+    )
+    # status is assigned before paid_amount for MySQL's left-to-right SET evaluation
+    Bill.objects.filter(pk__in=[row[0] for row in rows]).update(
+        status=bill_status_expression(paid_amount=corrected),
+        paid_amount=corrected,
+        updated_at=timezone.now(),
+    )
+
+    post_entries(
+        LedgerEntry(
+            society_id=society_id,
+            flat_id=flat_id,
+            bill_id=bill_id,
+            entry_type=LedgerEntry.EntryType.ADJUSTMENT,
+            amount=paid_amount - payments_total,
+            description='Paid amount reconciled with payments',
+        )
+        for bill_id, society_id, flat_id, paid_amount, payments_total in rows
+    )
+
+    # Set-based updates bypass the Bill signals
+    for society_id in {row[1] for row in rows}:
+        transaction.on_commit(lambda society_id=society_id: dashboard.invalidate(society_id))
+        billing_cache.bump_version_on_commit(society_id)
+
+    return len(rows)
@@ -0,0 +1,131 @@
+"""
+Tariff change propagation.
+
+When a society's tariff changes mid-month, its open bills for the month are
+repriced with a single UPDATE: the new charges come from SQL expressions
+over each flat's columns (the same rules as ``billrun.compute_charges``),
+and total_amount and status are derived in the same statement. The changed
+rows are read once beforehand, as (id, flat, block, old total, new total)
+tuples, for the ledger adjustments and the per-block summary.
+
+A bill is open while it isn't fully paid or nothing has been paid against
+it. The second half covers the empty default utility bills (0 of 0 paid),
+which are open for the bill run as well and are raised by their first
+repricing.
+"""
+from django.db import transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from society import dashboard
+from society.dashboard import NO_BLOCK
+from society.models import Flat
+from .ledger import bill_change_entry, post_entries
+from .models import Bill, LedgerEntry, bill_status_expression
+from . import cache as billing_cache
+
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+
+
+def charge_expressions(tariff):
+    """SQL expressions for a bill's tariff charges, computed from its flat"""
+    flat = Flat.objects.filter(pk=OuterRef('flat_id'))
+
+    by_bhk = Case(
+        *[When(bhk=bhk, then=Value(amount, output_field=MONEY)) for bhk, amount in (tariff.maintenance_by_bhk or {}).items()],
+        default=Value(0, output_field=MONEY),
+        output_field=MONEY,
+    )
+    area = Coalesce(F('area_sqft'), Value(0, output_field=MONEY))
+    maintenance = flat.annotate(
+        charge=Round(area * Value(tariff.maintenance_per_sqft, output_field=MONEY) + by_bhk, 2, output_field=MONEY)
+    ).values('charge')
+    parking = flat.annotate(
+        charge=Round(F('parking_slots') * Value(tariff.parking_per_slot, output_field=MONEY), 2, output_field=MONEY)
+    ).values('charge')
+
+    return {
+        'maintenance_charge': Subquery(maintenance, output_field=MONEY),
+        'parking_charge': Subquery(parking, output_field=MONEY),
+        'water_charge': Value(tariff.water_charge, output_field=MONEY),
+    }
+
+
+def total_expression(charges):
+    """total_amount for new tariff charges and the bill's other charge columns"""
+    return (
+        charges['maintenance_charge'] + charges['parking_charge'] + charges['water_charge']
+        + F('electricity_charge') + F('other_charges') + F('late_fee')
+    )
+
+
+@transaction.atomic
+def reprice_open_bills(tariff, billing_month):
+    """
+    Recompute the tariff charges of a month's open (not fully paid, or not
+    paid at all) bills.
+
+    Returns {'updated': n, 'blocks': [{'block', 'bills', 'previous_total', 'new_total'}]}.
+    """
+    society_id = tariff.society_id
+    billing_month = billing_month.replace(day=1)
+    charges = charge_expressions(tariff)
+    new_total = total_expression(charges)
+
+    changed = list(
+        Bill.objects.select_for_update(of=('self',)).filter(
+            Q(paid_amount__lt=F('total_amount')) | Q(paid_amount=0),
+            society_id=society_id,
+            billing_month=billing_month,
+        ).annotate(
+            new_maintenance=charges['maintenance_charge'],
+            new_parking=charges['parking_charge'],
+            new_total=new_total,
+            raised=Exists(LedgerEntry.objects.filter(bill=OuterRef('pk'), entry_type=LedgerEntry.EntryType.BILL)),
+        ).exclude(
+            maintenance_charge=F('new_maintenance'),
+            parking_charge=F('new_parking'),
+            water_charge=charges['water_charge'],
+        ).values_list('id', 'flat_id', 'flat__block__name', 'total_amount', 'new_total', 'raised')
+    )
+    if not changed:
+        return {'updated': 0, 'blocks': []}
+
+    # One UPDATE for the whole month. Every assignment is written against the
+    # old row values, and status comes first, so MySQL's left-to-right SET
+    # evaluation gives the same result as other backends.
+    updated = Bill.objects.filter(pk__in=[bill_id for bill_id, *_ in changed]).update(
+        status=bill_status_expression(total_amount=new_total),
+        total_amount=new_total,
+        updated_at=timezone.now(),
+        **charges
+    )
+
+    description = f"Repriced bill for {billing_month.strftime('%B %Y')}"
+    post_entries(
+        bill_change_entry(
+            Bill(pk=bill_id, society_id=society_id, flat_id=flat_id, billing_month=billing_month, total_amount=total),
+            previous_total,
+            raised,
+            description=description,
+        )
+        for bill_id, flat_id, _, previous_total, total, raised in changed
+    )
+
+    blocks = {}
+    for _, _, block_name, previous_total, total, _ in changed:
+        summary = blocks.setdefault(block_name or NO_BLOCK, {'bills': 0, 'previous_total': 0, 'new_total': 0})
+        summary['bills'] += 1
+        summary['previous_total'] += float(previous_total)
+        summary['new_total'] += float(total)
+
+    # Set-based updates bypass the Bill signals
+    transaction.on_commit(lambda: dashboard.invalidate(society_id))
+    billing_cache.bump_version_on_commit(society_id)
+
+    return {
+        'updated': updated,
+        'blocks': [{'block': name, **summary} for name, summary in sorted(blocks.items())],
+    }
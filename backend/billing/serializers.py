@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Bill, Payment
+from .models import Bill, FlatBalance, LedgerEntry, Payment
 from society.serializers import FlatSerializer
 
 
@@ -34,6 +34,49 @@ class BillSerializer(serializers.ModelSerializer):
         return obj.total_amount - obj.paid_amount
 
 
+def query_param_set(request, name):
+    """Parse a comma-separated query parameter (e.g. ?fields=a,b) into a set"""
+    if request is None:
+        return set()
+    value = request.query_params.get(name, '')
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+class BillListSerializer(serializers.ModelSerializer):
+    """
+    Compact serializer for bill lists.
+    
+    Payments are only nested with ?expand=payments, and ?fields=a,b limits
+    the response to the listed fields.
+    """
+    flat_number = serializers.SerializerMethodField()
+    balance_amount = serializers.SerializerMethodField()
+    payments = PaymentSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Bill
+        fields = '__all__'
+        read_only_fields = ('society', 'total_amount', 'paid_amount', 'status')
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        
+        if 'payments' not in query_param_set(request, 'expand'):
+            self.fields.pop('payments')
+        
+        requested = query_param_set(request, 'fields')
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+    
+    def get_flat_number(self, obj):
+        return obj.flat.flat_number if obj.flat else None
+    
+    def get_balance_amount(self, obj):
+        return obj.total_amount - obj.paid_amount
+
+
 class BillDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for Bill"""
     flat = FlatSerializer(read_only=True)
@@ -54,3 +97,20 @@ class CreatePaymentSerializer(serializers.Serializer):
     payment_method = serializers.ChoiceField(choices=Payment.PaymentMethod.choices)
     notes = serializers.CharField(required=False, allow_blank=True)
 
+
+class FlatBalanceSerializer(serializers.ModelSerializer):
+    """Serializer for a flat's outstanding balance"""
+    flat_number = serializers.CharField(source='flat.flat_number', read_only=True)
+    
+    class Meta:
+        model = FlatBalance
+        fields = ['flat', 'flat_number', 'balance', 'updated_at']
+
+
+class LedgerEntrySerializer(serializers.ModelSerializer):
+    """Serializer for a statement line; running_balance is set by the view"""
+    running_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = LedgerEntry
+        fields = ['id', 'entry_type', 'amount', 'description', 'bill', 'payment', 'created_at', 'running_balance']
@@ -0,0 +1,35 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Bill, Payment
+from .ledger import record_bill_deleted
+from . import cache as billing_cache
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def invalidate_bill_caches(sender, instance, **kwargs):
+    """Invalidate cached billing results for the bill's society"""
+    billing_cache.bump_version_on_commit(instance.society_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_payment_caches(sender, instance, **kwargs):
+    """Invalidate cached billing results for the payment's society"""
+    try:
+        society_id = instance.bill.society_id
+    except Bill.DoesNotExist:
+        # Deleted along with its bill, which invalidates on its own
+        return
+    billing_cache.bump_version_on_commit(society_id)
+
+
+@receiver(post_delete, sender=Bill)
+def write_off_deleted_bill(sender, instance, origin=None, **kwargs):
+    """Post the outstanding amount of a deleted bill back to the flat's ledger"""
+    # Bills deleted along with their flat or society take the ledger with them
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not Bill:
+        return
+    record_bill_deleted(instance)
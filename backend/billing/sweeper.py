@@ -0,0 +1,104 @@
+"""
+Overdue sweeper.
+
+Bill.status only changes when a bill is saved, so bills that pass their due
+date without being touched keep showing UNPAID. The sweeper brings a
+society's bills up to date with a couple of set-based UPDATE statements and
+never loads Bill instances into Python; only the (id, flat, fee) tuples
+needed for the late fee ledger entries are read, in keyset chunks so the
+UPDATE never carries more than a chunk of ids. Run it daily with the
+``sweep_overdue`` management command.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Value, DecimalField
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from society import dashboard
+from .models import Bill, LedgerEntry, Tariff, bill_status_expression
+from .ledger import post_entries
+from . import cache as billing_cache
+
+
+SWEEP_CHUNK_SIZE = 1000
+
+def late_fee_expression(tariff):
+    """Late fee for a bill: flat amount plus a percentage of its total"""
+    fee = Value(tariff.late_fee_amount, output_field=DecimalField(max_digits=10, decimal_places=2))
+    if tariff.late_fee_percent:
+        fee = fee + Round(F('total_amount') * Value(tariff.late_fee_percent / Decimal('100')), 2)
+    return fee
+
+
+@transaction.atomic
+def sweep_overdue(society_id, today=None, chunk_size=SWEEP_CHUNK_SIZE):
+    """
+    Apply late fees and flip past-due bills to OVERDUE for one society.
+
+    Returns {'late_fees': rows charged a late fee, 'overdue': rows marked overdue}.
+    """
+    today = today or timezone.now().date()
+    bills = Bill.objects.filter(society_id=society_id)
+    summary = {'late_fees': 0, 'overdue': 0}
+
+    tariff = Tariff.objects.filter(society_id=society_id).first()
+    if tariff and (tariff.late_fee_amount or tariff.late_fee_percent):
+        fee = late_fee_expression(tariff)
+        new_total = F('total_amount') + fee
+
+        # Once per bill: only bills still without a late fee and not fully paid.
+        # Each chunk's fees are read (and the rows locked) first for the ledger
+        # entries, then exactly those rows are charged.
+        due = bills.filter(
+            due_date__lt=today - timedelta(days=tariff.late_fee_grace_days),
+            late_fee=0,
+            paid_amount__lt=F('total_amount'),
+        ).annotate(fee=fee).order_by('id')
+        last_id = 0
+        while True:
+            charged = list(
+                due.select_for_update().filter(id__gt=last_id)
+                .values_list('id', 'flat_id', 'billing_month', 'fee')[:chunk_size]
+            )
+            if not charged:
+                break
+            last_id = charged[-1][0]
+
+            # status and late_fee come before total_amount because MySQL evaluates
+            # SET clauses left to right and both must read the old total.
+            summary['late_fees'] += Bill.objects.filter(pk__in=[bill_id for bill_id, _, _, _ in charged]).update(
+                status=bill_status_expression(total_amount=new_total, today=today),
+                late_fee=fee,
+                total_amount=new_total,
+                updated_at=timezone.now(),
+            )
+
+            post_entries(
+                LedgerEntry(
+                    society_id=society_id,
+                    flat_id=flat_id,
+                    bill_id=bill_id,
+                    entry_type=LedgerEntry.EntryType.LATE_FEE,
+                    amount=bill_fee,
+                    description=f"Late fee for {billing_month.strftime('%B %Y')}",
+                )
+                for bill_id, flat_id, billing_month, bill_fee in charged
+            )
+
+    # Same rule as Bill.update_status(): nothing paid and past the due date
+    summary['overdue'] = bills.filter(
+        status=Bill.Status.UNPAID,
+        due_date__lt=today,
+        paid_amount=0,
+        total_amount__gt=0,
+    ).update(status=Bill.Status.OVERDUE, updated_at=timezone.now())
+
+    if summary['late_fees'] or summary['overdue']:
+        # Set-based updates bypass the Bill signals
+        transaction.on_commit(lambda: dashboard.invalidate(society_id))
+        billing_cache.bump_version_on_commit(society_id)
+
+    return summary
@@ -0,0 +1,1208 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from datetime import date, timedelta
+from rest_framework.test import APIClient
+from rest_framework import status
+from decimal import Decimal
+
+from society.models import Society, Flat
+from .models import Bill, Payment
+
+User = get_user_model()
+
+
+class BillingTestCase(TestCase):
+    """Shared fixtures for billing tests"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.society = Society.objects.create(
+            name='Test Society',
+            address='123 Test St',
+            city='Test City',
+            state='Test State',
+            pincode='123456',
+            total_flats=100,
+            total_floors=10
+        )
+        
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            role='ADMIN',
+            society=self.society
+        )
+        
+        self.flat = Flat.objects.create(
+            society=self.society,
+            flat_number='A-101',
+            floor=1,
+            bhk='2BHK'
+        )
+        self.current_month = date.today().replace(day=1)
+        self.last_month = (self.current_month - timedelta(days=1)).replace(day=1)
+        
+        # Replace the default utility bill with a real one for the current month
+        Bill.objects.filter(flat=self.flat).delete()
+        self.bill = Bill.objects.create(
+            society=self.society,
+            flat=self.flat,
+            billing_month=self.current_month,
+            due_date=self.current_month + timedelta(days=30),
+            maintenance_charge=Decimal('1000.00'),
+            total_amount=Decimal('1000.00'),
+        )
+    
+    def _bill_queries(self, context):
+        return [q for q in context.captured_queries if 'billing_bill' in q['sql']]
+
+
+class BillStatsTest(BillingTestCase):
+    """Test the bill stats endpoint"""
+    
+    def setUp(self):
+        super().setUp()
+        Bill.objects.create(
+            society=self.society,
+            flat=self.flat,
+            billing_month=self.last_month,
+            due_date=date.today() - timedelta(days=1),
+            maintenance_charge=Decimal('500.00'),
+            total_amount=Decimal('500.00'),
+            paid_amount=Decimal('500.00'),
+        )
+        self.client.force_authenticate(user=self.admin_user)
+    
+    def test_stats_is_a_single_query(self):
+        """Test that all stats come from one aggregate query"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/billing/bills/stats/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self._bill_queries(context)), 1)
+        self.assertEqual(response.data['total_bills'], 2)
+        self.assertEqual(response.data['paid'], 1)
+        self.assertEqual(response.data['unpaid'], 1)
+        self.assertEqual(response.data['total_amount'], 1500.0)
+        self.assertEqual(response.data['total_paid'], 500.0)
+        self.assertEqual(response.data['total_pending'], 1000.0)
+    
+    def test_stats_month_breakdown(self):
+        """Test that ?month= adds the figures for one billing month"""
+        month = self.last_month.strftime('%Y-%m')
+        response = self.client.get(f'/api/billing/bills/stats/?month={month}')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_bills'], 2)
+        self.assertEqual(response.data['month']['month'], month)
+        self.assertEqual(response.data['month']['total_bills'], 1)
+        self.assertEqual(response.data['month']['paid'], 1)
+        self.assertEqual(response.data['month']['total_pending'], 0.0)
+    
+    def test_stats_invalid_month(self):
+        """Test that a malformed month is rejected"""
+        response = self.client.get('/api/billing/bills/stats/?month=June')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_stats_cached_until_bill_write(self):
+        """Test that stats are served from cache until a bill changes"""
+        self.client.get('/api/billing/bills/stats/')
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/billing/bills/stats/')
+        self.assertEqual(len(self._bill_queries(context)), 0)
+        self.assertEqual(response.data['total_amount'], 1500.0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bill.maintenance_charge = Decimal('2000.00')
+            self.bill.save()
+        
+        response = self.client.get('/api/billing/bills/stats/')
+        self.assertEqual(response.data['total_amount'], 2500.0)
+
+    
+    def test_deploy_check_warns_about_per_process_cache(self):
+        """Test that a cache not shared between workers is flagged for deployment"""
+        from django.test import override_settings
+        from .checks import check_shared_cache
+        
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['billing.W001'])
+        
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class PaymentApplicationTest(BillingTestCase):
+    """Test applying payments to bills"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.admin_user)
+    
+    def _pay(self, amount, **kwargs):
+        return Payment.objects.create(
+            bill=self.bill,
+            amount=Decimal(amount),
+            payment_method=Payment.PaymentMethod.CASH,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            paid_by=self.admin_user,
+            **kwargs
+        )
+    
+    def test_payment_updates_paid_amount_and_status(self):
+        """Test that payments are added atomically and the status is derived"""
+        self._pay('400.00', receipt_number='R1')
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('400.00'))
+        self.assertEqual(self.bill.status, Bill.Status.PARTIAL)
+        
+        # A stale in-memory bill must not overwrite the first payment
+        stale_bill = Bill.objects.get(pk=self.bill.pk)
+        stale_bill.paid_amount = Decimal('0.00')
+        Payment.objects.create(
+            bill=stale_bill,
+            amount=Decimal('600.00'),
+            payment_method=Payment.PaymentMethod.UPI,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            paid_by=self.admin_user,
+            receipt_number='R2'
+        )
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('1000.00'))
+        self.assertEqual(self.bill.status, Bill.Status.PAID)
+    
+    def test_resaving_payment_does_not_apply_twice(self):
+        """Test that re-saving a successful payment leaves the bill alone"""
+        payment = self._pay('400.00', receipt_number='R1')
+        payment.notes = 'Edited'
+        payment.save()
+        
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('400.00'))
+    
+    def test_duplicate_success_callbacks_apply_once(self):
+        """Test that two stale copies of a pending payment marked successful apply once"""
+        payment = Payment.objects.create(
+            bill=self.bill,
+            amount=Decimal('400.00'),
+            payment_method=Payment.PaymentMethod.UPI,
+            payment_status=Payment.PaymentStatus.PENDING,
+            paid_by=self.admin_user,
+            receipt_number='R1'
+        )
+        first_callback = Payment.objects.get(pk=payment.pk)
+        second_callback = Payment.objects.get(pk=payment.pk)
+        for callback in (first_callback, second_callback):
+            callback.payment_status = Payment.PaymentStatus.SUCCESS
+            callback.save()
+        
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('400.00'))
+        from .models import LedgerEntry
+        self.assertEqual(LedgerEntry.objects.filter(entry_type=LedgerEntry.EntryType.PAYMENT).count(), 1)
+    
+    def test_editing_a_stale_bill_keeps_payments(self):
+        """Test that saving a bill loaded before a payment doesn't undo the payment"""
+        stale_bill = Bill.objects.get(pk=self.bill.pk)
+        self._pay('400.00', receipt_number='R1')
+        
+        stale_bill.notes = 'Edited'
+        stale_bill.late_fee = Decimal('100.00')
+        stale_bill.save()
+        
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('400.00'))
+        self.assertEqual(self.bill.status, Bill.Status.PARTIAL)
+        self.assertEqual(self.bill.total_amount, Decimal('1100.00'))
+        self.assertEqual(self.bill.notes, 'Edited')
+    
+    def test_record_payment_idempotency_key(self):
+        """Test that a retried record_payment with the same key posts once"""
+        url = f'/api/billing/bills/{self.bill.id}/record_payment/'
+        data = {'amount': '250.00', 'payment_method': 'CASH'}
+        
+        first = self.client.post(url, data, HTTP_IDEMPOTENCY_KEY='abc-123')
+        second = self.client.post(url, data, HTTP_IDEMPOTENCY_KEY='abc-123')
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(self.bill.payments.count(), 1)
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('250.00'))
+    
+    def test_mark_paid_pays_outstanding_balance_once(self):
+        """Test that mark_paid records the balance and is safe to retry"""
+        self._pay('300.00', receipt_number='R1')
+        url = f'/api/billing/bills/{self.bill.id}/mark_paid/'
+        
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='mark-1')
+        self.client.post(url, HTTP_IDEMPOTENCY_KEY='mark-1')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Bill.Status.PAID)
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('1000.00'))
+        self.assertEqual(self.bill.payments.count(), 2)
+
+
+class ReceiptNumberAllocatorTest(BillingTestCase):
+    """Test receipt number allocation"""
+    
+    def test_numbers_are_unique_and_increasing(self):
+        """Test that allocated numbers are consecutive within a block"""
+        from .receipts import ReceiptNumberAllocator
+        allocator = ReceiptNumberAllocator(block_size=10)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            first = allocator.allocate(self.society.id, count=3)
+        second = allocator.allocate(self.society.id, count=2)
+        
+        numbers = first + second
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertTrue(numbers[0].endswith(f'-{self.society.id}-000001'))
+    
+    def test_only_one_round_trip_per_block(self):
+        """Test that the database is only hit when a block runs out"""
+        from .receipts import ReceiptNumberAllocator
+        allocator = ReceiptNumberAllocator(block_size=10)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            allocator.allocate(self.society.id)
+        
+        with self.assertNumQueries(0):
+            for _ in range(9):
+                allocator.allocate(self.society.id)
+    
+    def test_late_publish_of_lower_block_keeps_numbers_increasing(self):
+        """Test that a lower block committed after a higher one doesn't replace it"""
+        from .receipts import ReceiptNumberAllocator
+        allocator = ReceiptNumberAllocator(block_size=10)
+        
+        # The first block's transaction commits only after the second block is published
+        with self.captureOnCommitCallbacks() as lower_block:
+            first = allocator.allocate(self.society.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            second = allocator.allocate(self.society.id)
+        for callback in lower_block:
+            callback()
+        third = allocator.allocate(self.society.id)
+        
+        self.assertTrue(first[0].endswith('-000001'))
+        self.assertTrue(second[0].endswith('-000011'))
+        self.assertTrue(third[0].endswith('-000012'))
+    
+    def test_payments_in_same_second_get_distinct_receipts(self):
+        """Test that back-to-back payments don't collide on receipt_number"""
+        payments = [
+            Payment.objects.create(
+                bill=self.bill,
+                amount=Decimal('10.00'),
+                payment_method=Payment.PaymentMethod.CASH,
+                payment_status=Payment.PaymentStatus.SUCCESS,
+                paid_by=self.admin_user
+            )
+            for _ in range(5)
+        ]
+        self.assertEqual(len({payment.receipt_number for payment in payments}), 5)
+
+
+class BillRunTest(BillingTestCase):
+    """Test the monthly bill run"""
+    
+    def setUp(self):
+        super().setUp()
+        from .models import Tariff
+        self.tariff = Tariff.objects.create(
+            society=self.society,
+            maintenance_per_sqft=Decimal('2.50'),
+            maintenance_by_bhk={'2BHK': 500, '3BHK': 800},
+            parking_per_slot=Decimal('300.00'),
+            water_charge=Decimal('150.00'),
+        )
+        self.flat.area_sqft = Decimal('1000.00')
+        self.flat.parking_slots = 2
+        self.flat.save()
+        self.flat_3bhk = Flat.objects.create(
+            society=self.society,
+            flat_number='A-102',
+            floor=1,
+            bhk='3BHK'
+        )
+        self.next_month = (self.current_month + timedelta(days=32)).replace(day=1)
+    
+    def test_generate_bills_from_tariff(self):
+        """Test that charges follow the tariff rules"""
+        from .billrun import generate_bills
+        
+        summary = generate_bills(self.tariff, self.next_month)
+        
+        self.assertEqual(summary['created'], 2)
+        bill = Bill.objects.get(flat=self.flat, billing_month=self.next_month)
+        self.assertEqual(bill.maintenance_charge, Decimal('3000.00'))
+        self.assertEqual(bill.parking_charge, Decimal('600.00'))
+        self.assertEqual(bill.water_charge, Decimal('150.00'))
+        self.assertEqual(bill.total_amount, Decimal('3750.00'))
+        self.assertEqual(bill.status, Bill.Status.UNPAID)
+        
+        bill = Bill.objects.get(flat=self.flat_3bhk, billing_month=self.next_month)
+        self.assertEqual(bill.total_amount, Decimal('950.00'))
+    
+    def test_rerun_is_a_no_op_and_paid_bills_are_kept(self):
+        """Test that a repeated run changes nothing and skips bills with payments"""
+        from .billrun import generate_bills
+        
+        # Both unpaid bills of the current month are repriced from the tariff
+        summary = generate_bills(self.tariff, self.current_month)
+        self.assertEqual(summary, {'created': 0, 'updated': 2, 'unchanged': 0, 'skipped': 0})
+        
+        # The empty default bill of the new flat is raised, not adjusted
+        from .models import LedgerEntry
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(flat=self.flat_3bhk).values_list('entry_type', 'amount')),
+            [(LedgerEntry.EntryType.BILL, Decimal('950.00'))]
+        )
+        self.assertEqual(
+            LedgerEntry.objects.filter(bill=self.bill).latest('id').entry_type,
+            LedgerEntry.EntryType.ADJUSTMENT
+        )
+        
+        Bill.objects.filter(pk=self.bill.pk).update(paid_amount=Decimal('100.00'))
+        self.tariff.water_charge = Decimal('175.00')
+        self.tariff.save()
+        
+        summary = generate_bills(self.tariff, self.current_month)
+        self.assertEqual(summary, {'created': 0, 'updated': 1, 'unchanged': 0, 'skipped': 1})
+        
+        summary = generate_bills(self.tariff, self.current_month)
+        self.assertEqual(summary, {'created': 0, 'updated': 0, 'unchanged': 1, 'skipped': 1})
+    
+    def test_bills_inserted_by_a_concurrent_run_are_not_counted(self):
+        """Test that bills a concurrent run inserted first are reported as skipped"""
+        from unittest import mock
+        from .billrun import generate_bills
+        
+        bulk_create = Bill.objects.bulk_create
+        
+        def concurrent_run_first(bills, **kwargs):
+            Bill.objects.create(
+                society=self.society,
+                flat=self.flat_3bhk,
+                billing_month=self.next_month,
+                due_date=self.next_month + timedelta(days=30),
+                maintenance_charge=Decimal('800.00'),
+            )
+            return bulk_create(bills, **kwargs)
+        
+        with mock.patch.object(Bill.objects, 'bulk_create', side_effect=concurrent_run_first):
+            summary = generate_bills(self.tariff, self.next_month)
+        
+        self.assertEqual(summary, {'created': 1, 'updated': 0, 'unchanged': 0, 'skipped': 1})
+        self.assertEqual(Bill.objects.filter(billing_month=self.next_month).count(), 2)
+    
+    def test_generate_endpoint(self):
+        """Test running the bill run through the API"""
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.post('/api/billing/bills/generate/', {'month': self.next_month.strftime('%Y-%m')})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Bill.objects.filter(billing_month=self.next_month).count(), 2)
+
+
+class OverdueSweeperTest(BillingTestCase):
+    """Test the overdue sweeper"""
+    
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        Bill.objects.filter(pk=self.bill.pk).update(
+            due_date=self.today - timedelta(days=10),
+            status=Bill.Status.UNPAID
+        )
+    
+    def test_sweeper_marks_overdue_without_loading_bills(self):
+        """Test that past-due unpaid bills are flipped in a single UPDATE"""
+        from .sweeper import sweep_overdue
+        
+        with CaptureQueriesContext(connection) as context:
+            summary = sweep_overdue(self.society.id, today=self.today)
+        
+        self.assertEqual(summary, {'late_fees': 0, 'overdue': 1})
+        self.assertFalse(any(q['sql'].startswith('SELECT "billing_bill"') for q in context.captured_queries))
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.status, Bill.Status.OVERDUE)
+    
+    def test_sweeper_applies_late_fee_once(self):
+        """Test that the configured late fee is added to the total exactly once"""
+        from .models import Tariff
+        from .sweeper import sweep_overdue
+        
+        Tariff.objects.create(
+            society=self.society,
+            late_fee_amount=Decimal('50.00'),
+            late_fee_percent=Decimal('2.00'),
+            late_fee_grace_days=5,
+        )
+        
+        summary = sweep_overdue(self.society.id, today=self.today)
+        self.assertEqual(summary['late_fees'], 1)
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.late_fee, Decimal('70.00'))
+        self.assertEqual(self.bill.total_amount, Decimal('1070.00'))
+        self.assertEqual(self.bill.status, Bill.Status.OVERDUE)
+        
+        summary = sweep_overdue(self.society.id, today=self.today)
+        self.assertEqual(summary, {'late_fees': 0, 'overdue': 0})
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.total_amount, Decimal('1070.00'))
+    
+    def test_sweeper_charges_late_fees_in_chunks(self):
+        """Test that every past-due bill is charged once when the ids span several chunks"""
+        from .models import LedgerEntry, Tariff
+        from .sweeper import sweep_overdue
+        
+        Tariff.objects.create(society=self.society, late_fee_amount=Decimal('50.00'))
+        Bill.objects.create(
+            society=self.society,
+            flat=self.flat,
+            billing_month=self.last_month,
+            due_date=self.today - timedelta(days=20),
+            maintenance_charge=Decimal('500.00'),
+        )
+        
+        summary = sweep_overdue(self.society.id, today=self.today, chunk_size=1)
+        self.assertEqual(summary['late_fees'], 2)
+        self.assertEqual(Bill.objects.filter(late_fee=Decimal('50.00')).count(), 2)
+        self.assertEqual(LedgerEntry.objects.filter(entry_type=LedgerEntry.EntryType.LATE_FEE).count(), 2)
+    
+    def test_sweeper_respects_grace_days(self):
+        """Test that bills within the grace period get no late fee"""
+        from .models import Tariff
+        from .sweeper import sweep_overdue
+        
+        Tariff.objects.create(society=self.society, late_fee_amount=Decimal('50.00'), late_fee_grace_days=15)
+        
+        summary = sweep_overdue(self.society.id, today=self.today)
+        self.assertEqual(summary, {'late_fees': 0, 'overdue': 1})
+
+
+class PaymentImportTest(BillingTestCase):
+    """Test importing payments from statement CSVs"""
+    
+    def setUp(self):
+        super().setUp()
+        self.month = self.current_month.strftime('%Y-%m')
+    
+    def _csv(self, *rows):
+        import io
+        lines = ['flat_number,month,amount,transaction_id,payment_method']
+        lines.extend(','.join(row) for row in rows)
+        return io.StringIO('\n'.join(lines) + '\n')
+    
+    def test_import_matches_rows_and_reports_unmatched(self):
+        """Test that matched rows become payments and the rest are reported"""
+        from .imports import import_payments
+        
+        unmatched = []
+        summary = import_payments(self.society.id, self._csv(
+            ('A-101', self.month, '400.00', 'UTR1', 'UPI'),
+            ('a-101', self.month, '600.00', 'UTR2', ''),
+            ('B-999', self.month, '100.00', 'UTR3', 'UPI'),
+            ('A-101', self.month, 'abc', 'UTR4', 'UPI'),
+            ('A-101', self.month, '100.00', 'UTR1', 'UPI'),
+        ), self.admin_user, report=unmatched.append, chunk_size=2)
+        
+        self.assertEqual(summary['imported'], 2)
+        self.assertEqual(summary['unmatched'], 3)
+        self.assertEqual(summary['amount'], Decimal('1000.00'))
+        self.assertEqual(
+            [row['reason'] for row in unmatched],
+            ['no matching bill', 'invalid amount', 'duplicate transaction_id']
+        )
+        
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('1000.00'))
+        self.assertEqual(self.bill.status, Bill.Status.PAID)
+        self.assertEqual(self.bill.payments.count(), 2)
+        self.assertEqual(len(set(self.bill.payments.values_list('receipt_number', flat=True))), 2)
+    
+    def test_reimporting_a_statement_is_a_no_op(self):
+        """Test that already imported transaction ids are skipped"""
+        from .imports import import_payments
+        
+        import_payments(self.society.id, self._csv(('A-101', self.month, '400.00', 'UTR1', 'UPI')), self.admin_user)
+        summary = import_payments(self.society.id, self._csv(('A-101', self.month, '400.00', 'UTR1', 'UPI')), self.admin_user)
+        
+        self.assertEqual(summary['imported'], 0)
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('400.00'))
+    
+    def test_import_rejects_bad_amounts_and_rows_without_transaction_id(self):
+        """Test that non-finite, oversized and unreferenced rows are reported, not imported"""
+        from .imports import import_payments
+        
+        unmatched = []
+        summary = import_payments(self.society.id, self._csv(
+            ('A-101', self.month, 'NaN', 'UTR1', 'UPI'),
+            ('A-101', self.month, 'Infinity', 'UTR2', 'UPI'),
+            ('A-101', self.month, '1e12', 'UTR3', 'UPI'),
+            ('A-101', self.month, '100.00', '', 'UPI'),
+            ('A-101', self.month, '100.005', 'UTR4', 'UPI'),
+        ), self.admin_user, report=unmatched.append)
+        
+        self.assertEqual(summary['imported'], 1)
+        self.assertEqual(
+            [row['reason'] for row in unmatched],
+            ['invalid amount', 'invalid amount', 'invalid amount', 'missing transaction_id']
+        )
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('100.01'))
+    
+    def test_import_statement_endpoint(self):
+        """Test uploading a statement through the API"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        
+        self.client.force_authenticate(user=self.admin_user)
+        upload = SimpleUploadedFile(
+            'statement.csv',
+            self._csv(('A-101', self.month, '250.00', 'UTR9', 'UPI')).getvalue().encode(),
+            content_type='text/csv'
+        )
+        response = self.client.post('/api/billing/payments/import_statement/', {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['unmatched_rows'], [])
+
+
+class BillListTest(BillingTestCase):
+    """Test the compact bill list representation"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.admin_user)
+        for index in range(3):
+            Payment.objects.create(
+                bill=self.bill,
+                amount=Decimal('10.00'),
+                payment_method=Payment.PaymentMethod.CASH,
+                payment_status=Payment.PaymentStatus.SUCCESS,
+                paid_by=self.admin_user
+            )
+    
+    def _add_flats(self, count):
+        for index in range(count):
+            flat = Flat.objects.create(
+                society=self.society,
+                flat_number=f'B-1{index:02d}',
+                floor=1
+            )
+            Payment.objects.create(
+                bill=flat.bills.get(),
+                amount=Decimal('1.00'),
+                payment_method=Payment.PaymentMethod.CASH,
+                payment_status=Payment.PaymentStatus.SUCCESS,
+                paid_by=self.admin_user
+            )
+    
+    def test_list_omits_payments_by_default(self):
+        """Test that payments are only included when expanded"""
+        response = self.client.get('/api/billing/bills/')
+        self.assertNotIn('payments', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['flat_number'], 'A-101')
+        
+        response = self.client.get('/api/billing/bills/?expand=payments')
+        bill_data = next(b for b in response.data['results'] if b['id'] == self.bill.id)
+        self.assertEqual(len(bill_data['payments']), 3)
+        self.assertEqual(bill_data['payments'][0]['paid_by_name'], 'Admin User')
+    
+    def test_sparse_fieldsets(self):
+        """Test that ?fields= limits the returned fields"""
+        response = self.client.get('/api/billing/bills/?fields=id,status,balance_amount')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'balance_amount'})
+    
+    def test_expanded_list_query_count_is_constant(self):
+        """Test that expanding payments doesn't add queries per bill or payment"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/billing/bills/?expand=payments')
+        
+        self._add_flats(5)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/api/billing/bills/?expand=payments')
+        
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class LedgerTest(BillingTestCase):
+    """Test the per-flat ledger and running balance"""
+    
+    def _balance(self, flat=None):
+        from .models import FlatBalance
+        return FlatBalance.objects.get(flat=flat or self.flat).balance
+    
+    def _entries(self, flat=None):
+        from .models import LedgerEntry
+        return list(
+            LedgerEntry.objects.filter(flat=flat or self.flat).values_list('entry_type', 'amount')
+        )
+    
+    def test_bill_and_payment_writes_post_entries(self):
+        """Test that raising, paying, changing and deleting a bill keep the balance in sync"""
+        self.assertEqual(self._balance(), Decimal('1000.00'))
+        
+        Payment.objects.create(
+            bill=self.bill,
+            amount=Decimal('400.00'),
+            payment_method=Payment.PaymentMethod.CASH,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            paid_by=self.admin_user
+        )
+        self.assertEqual(self._balance(), Decimal('600.00'))
+        
+        self.bill.refresh_from_db()
+        self.bill.other_charges = Decimal('100.00')
+        self.bill.save()
+        self.assertEqual(self._balance(), Decimal('700.00'))
+        
+        self.bill.delete()
+        self.assertEqual(self._balance(), Decimal('0.00'))
+        
+        # Charging a flat's empty default bill raises it
+        new_flat = Flat.objects.create(society=self.society, flat_number='A-102', floor=1)
+        default_bill = Bill.objects.get(flat=new_flat)
+        default_bill.maintenance_charge = Decimal('500.00')
+        default_bill.save()
+        self.assertEqual(self._entries(new_flat), [('BILL', Decimal('500.00'))])
+        self.assertEqual(self._entries(), [
+            ('BILL', Decimal('1000.00')),
+            ('PAYMENT', Decimal('-400.00')),
+            ('ADJUSTMENT', Decimal('100.00')),
+            ('ADJUSTMENT', Decimal('-700.00')),
+        ])
+    
+    def test_bulk_paths_post_entries(self):
+        """Test that the bill run, sweeper and statement import post to the ledger"""
+        import io
+        from .models import Tariff
+        from .billrun import generate_bills
+        from .imports import import_payments
+        from .sweeper import sweep_overdue
+        
+        tariff = Tariff.objects.create(
+            society=self.society,
+            water_charge=Decimal('150.00'),
+            late_fee_amount=Decimal('25.00'),
+        )
+        
+        # The current bill is repriced, last month's is raised
+        generate_bills(tariff, self.current_month)
+        generate_bills(tariff, self.last_month)
+        generate_bills(tariff, self.last_month)
+        self.assertEqual(self._balance(), Decimal('300.00'))
+        
+        # Last month's bill is past due and gets the late fee
+        sweep_overdue(self.society.id, today=self.current_month + timedelta(days=1))
+        self.assertEqual(self._balance(), Decimal('325.00'))
+        
+        import_payments(self.society.id, io.StringIO(
+            'flat_number,month,amount,transaction_id\n'
+            f"A-101,{self.last_month.strftime('%Y-%m')},175.00,UTR1\n"
+        ), self.admin_user)
+        self.assertEqual(self._balance(), Decimal('150.00'))
+        self.assertEqual(self._entries(), [
+            ('BILL', Decimal('1000.00')),
+            ('ADJUSTMENT', Decimal('-850.00')),
+            ('BILL', Decimal('150.00')),
+            ('LATE_FEE', Decimal('25.00')),
+            ('PAYMENT', Decimal('-175.00')),
+        ])
+    
+    def test_balances_and_statement_endpoints(self):
+        """Test reading who owes what and a flat's statement"""
+        from .models import LedgerEntry
+        self.client.force_authenticate(user=self.admin_user)
+        
+        paid_flat = Flat.objects.create(society=self.society, flat_number='A-102', floor=1)
+        
+        response = self.client.get('/api/billing/bills/balances/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['flat_number'], row['balance']) for row in response.data['results']],
+            [('A-101', '1000.00')]
+        )
+        
+        # Backdate the bill so a statement period can start after it
+        LedgerEntry.objects.filter(flat=self.flat).update(created_at=timezone.now() - timedelta(days=40))
+        Payment.objects.create(
+            bill=self.bill,
+            amount=Decimal('250.00'),
+            payment_method=Payment.PaymentMethod.CASH,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            paid_by=self.admin_user
+        )
+        
+        start = (date.today() - timedelta(days=7)).isoformat()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/billing/bills/statement/?flat={self.flat.id}&from={start}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['opening_balance'], '1000.00')
+        self.assertEqual(response.data['closing_balance'], '750.00')
+        self.assertEqual(len(response.data['entries']), 1)
+        self.assertEqual(response.data['entries'][0]['running_balance'], '750.00')
+        self.assertFalse(any('billing_bill' in q['sql'] for q in context.captured_queries))
+        
+        response = self.client.get(f'/api/billing/bills/statement/?flat={paid_flat.id}')
+        self.assertEqual(response.data['entries'], [])
+        
+        response = self.client.get('/api/billing/bills/statement/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AgingReportTest(BillingTestCase):
+    """Test the dues aging report"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.admin_user)
+        self.today = date.today()
+        
+        from society.models import Block
+        self.block = Block.objects.create(society=self.society, name='A', floors=1, units_per_floor=0)
+        self.flat.block = self.block
+        self.flat.save()
+        other_flat = Flat.objects.create(society=self.society, flat_number='B-101', floor=1)
+        
+        # Current bill of 1000 is not yet due; add 45 and 120 days past due bills
+        for days, flat, total, paid in [(45, self.flat, '500.00', '200.00'), (120, other_flat, '300.00', '0')]:
+            month = (self.today - timedelta(days=days)).replace(day=1) - timedelta(days=365)
+            Bill.objects.create(
+                society=self.society,
+                flat=flat,
+                billing_month=month,
+                due_date=self.today - timedelta(days=days),
+                other_charges=Decimal(total),
+                total_amount=Decimal(total),
+                paid_amount=Decimal(paid),
+            )
+    
+    def test_buckets_per_flat_and_block(self):
+        """Test that outstanding amounts land in the right buckets"""
+        from .aging import build_aging_report
+        
+        with CaptureQueriesContext(connection) as context:
+            report = build_aging_report(self.society.id, self.today)
+        self.assertEqual(len(context.captured_queries), 1)
+        
+        self.assertEqual(report['totals']['current'], 1000.0)
+        self.assertEqual(report['totals']['days_31_60'], 300.0)
+        self.assertEqual(report['totals']['days_90_plus'], 300.0)
+        self.assertEqual(report['totals']['total'], 1600.0)
+        self.assertEqual(
+            {row['block']: row['total'] for row in report['blocks']},
+            {'A': 1300.0, 'No Block': 300.0}
+        )
+        flat_row = next(row for row in report['flats'] if row['flat_number'] == 'A-101')
+        self.assertEqual(flat_row['days_31_60'], 300.0)
+        self.assertEqual(flat_row['oldest_due_date'], (self.today - timedelta(days=45)).isoformat())
+    
+    def test_endpoint_is_cached_until_payment(self):
+        """Test that the report is served from cache until a payment is recorded"""
+        response = self.client.get('/api/billing/bills/aging/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals']['total'], 1600.0)
+        
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/billing/bills/aging/')
+        self.assertEqual(self._bill_queries(context), [])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(
+                bill=self.bill,
+                amount=Decimal('1000.00'),
+                payment_method=Payment.PaymentMethod.CASH,
+                payment_status=Payment.PaymentStatus.SUCCESS,
+                paid_by=self.admin_user
+            )
+        response = self.client.get('/api/billing/bills/aging/')
+        self.assertEqual(response.data['totals']['total'], 600.0)
+    
+    def test_report_follows_version_bumped_by_another_worker(self):
+        """Test that a shared cache carries another worker's billing version bump"""
+        from django.core.cache import caches
+        from django.core.management import call_command
+        from django.test import override_settings
+        from . import cache as billing_cache
+        from .aging import get_aging_report
+        
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_cache'}}
+        with override_settings(CACHES=shared):
+            call_command('createcachetable', verbosity=0)
+            self.assertEqual(get_aging_report(self.society.id)['totals']['total'], 1600.0)
+            
+            # Another worker writes without this process's signals and bumps
+            # the version through its own cache connection
+            Bill.objects.filter(pk=self.bill.pk).update(paid_amount=Decimal('1000.00'))
+            other_worker = caches.create_connection('default')
+            other_worker.incr(billing_cache._version_key(self.society.id))
+            
+            self.assertEqual(get_aging_report(self.society.id)['totals']['total'], 600.0)
+    
+    def test_csv_export_and_permissions(self):
+        """Test the CSV export and that residents can't read the report"""
+        response = self.client.get('/api/billing/bills/aging/?export=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = response.content.decode().strip().splitlines()
+        self.assertTrue(lines[0].startswith('flat_number,block,current'))
+        self.assertEqual(len(lines), 3)
+        
+        resident = User.objects.create_user(
+            username='resident', password='testpass123', role='RESIDENT', society=self.society
+        )
+        self.client.force_authenticate(user=resident)
+        response = self.client.get('/api/billing/bills/aging/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_management_command(self):
+        """Test printing totals and exporting CSV from the command line"""
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+        
+        out = io.StringIO()
+        call_command('aging_report', society=self.society.id, stdout=out)
+        self.assertIn('1600.00 outstanding', out.getvalue())
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'aging.csv')
+            call_command('aging_report', society=self.society.id, csv=path, stdout=io.StringIO())
+            with open(path) as output:
+                self.assertEqual(len(output.read().strip().splitlines()), 3)
+
+
+class ExportTest(BillingTestCase):
+    """Test the streaming CSV exports"""
+    
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.admin_user)
+        for index in range(4):
+            Flat.objects.create(society=self.society, flat_number=f'B-10{index}', floor=1)
+        Payment.objects.create(
+            bill=self.bill,
+            amount=Decimal('400.00'),
+            payment_method=Payment.PaymentMethod.UPI,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            transaction_id='UTR1',
+            paid_by=self.admin_user
+        )
+    
+    def _rows(self, response):
+        import csv
+        import io
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(content)))
+    
+    def test_bill_export_streams_every_row(self):
+        """Test that bills are exported with the list filters applied"""
+        response = self.client.get('/api/billing/bills/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = self._rows(response)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['flat_number'], 'A-101')
+        self.assertEqual(rows[0]['total_amount'], '1000.00')
+        
+        response = self.client.get('/api/billing/bills/export/?status=PARTIAL')
+        self.assertEqual([row['bill_id'] for row in self._rows(response)], [str(self.bill.id)])
+    
+    def test_export_reads_in_keyset_chunks(self):
+        """Test that each chunk is a separate bounded query"""
+        from .exports import BILL_EXPORT_FIELDS, stream_csv
+        
+        with CaptureQueriesContext(connection) as context:
+            lines = ''.join(stream_csv(Bill.objects.all(), BILL_EXPORT_FIELDS, chunk_size=2)).splitlines()
+        
+        self.assertEqual(len(lines), 6)
+        # Three full or partial chunks and one empty read to finish
+        self.assertEqual(len(context.captured_queries), 4)
+        self.assertTrue(all('LIMIT 2' in q['sql'] for q in context.captured_queries))
+    
+    def test_payment_export_and_permissions(self):
+        """Test the payment export and that residents can't export"""
+        today = date.today().isoformat()
+        response = self.client.get(f'/api/billing/payments/export/?from={today}&to={today}')
+        rows = self._rows(response)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['transaction_id'], 'UTR1')
+        self.assertEqual(rows[0]['paid_by'], 'admin')
+        
+        resident = User.objects.create_user(
+            username='resident', password='testpass123', role='RESIDENT', society=self.society
+        )
+        self.client.force_authenticate(user=resident)
+        self.assertEqual(self.client.get('/api/billing/bills/export/').status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/api/billing/payments/export/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class DocumentRenderingTest(BillingTestCase):
+    """Test receipt and statement PDFs"""
+    
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+        
+        self.client.force_authenticate(user=self.admin_user)
+        self.payment = Payment.objects.create(
+            bill=self.bill,
+            amount=Decimal('400.00'),
+            payment_method=Payment.PaymentMethod.UPI,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            paid_by=self.admin_user
+        )
+    
+    def _pdf(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+        return content
+    
+    def test_receipt_is_rendered_once_and_served_from_cache(self):
+        """Test that unchanged payments reuse the stored PDF"""
+        from unittest import mock
+        from . import documents
+        
+        with self.settings(MEDIA_ROOT=self.media_root, DOCUMENT_RENDER_WORKERS=0):
+            url = f'/api/billing/payments/{self.payment.id}/receipt/'
+            self._pdf(self.client.get(url))
+            
+            with mock.patch.object(documents, 'render_pdf') as render:
+                self._pdf(self.client.get(url))
+            render.assert_not_called()
+            
+            # A change to the payment produces a new document
+            Payment.objects.filter(pk=self.payment.pk).update(transaction_id='UTR9')
+            with mock.patch.object(documents, 'render_pdf', return_value=b'%PDF-new') as render:
+                self.assertEqual(self._pdf(self.client.get(url)), b'%PDF-new')
+            render.assert_called_once()
+    
+    def test_background_render_answers_202(self):
+        """Test that requests queue a render instead of waiting for it"""
+        from unittest import mock
+        from . import documents
+        
+        with self.settings(MEDIA_ROOT=self.media_root, DOCUMENT_RENDER_WORKERS=2):
+            with mock.patch.object(documents, '_get_executor') as get_executor:
+                response = self.client.get(f'/api/billing/payments/{self.payment.id}/receipt/')
+                self.client.get(f'/api/billing/payments/{self.payment.id}/receipt/')
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        # The second request finds the render already queued
+        get_executor.return_value.submit.assert_called_once()
+        documents._pending.clear()
+    
+    def test_monthly_statements(self):
+        """Test statement data, the endpoint and the batch render in a process pool"""
+        from .documents import render_documents, statement_documents
+        
+        Flat.objects.create(society=self.society, flat_number='A-102', floor=1)
+        with CaptureQueriesContext(connection) as context:
+            statements = statement_documents(self.society.id, self.current_month)
+        self.assertEqual(len(context.captured_queries), 5)
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(statements[0]['footer'], [('Closing balance', 'Rs. 600.00')])
+        self.assertEqual([row[2] for row in statements[0]['rows']], ['Rs. 1,000.00', 'Rs. -400.00'])
+        
+        with self.settings(MEDIA_ROOT=self.media_root):
+            self.assertEqual(render_documents(statements, workers=1), {'rendered': 2, 'cached': 0})
+            self.assertEqual(render_documents(statements, workers=1), {'rendered': 0, 'cached': 2})
+            
+            month = self.current_month.strftime('%Y-%m')
+            self._pdf(self.client.get(f'/api/billing/bills/monthly_statement/?flat={self.flat.id}&month={month}'))
+            
+            response = self.client.get('/api/billing/bills/monthly_statement/?flat=999999&month=' + month)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RepriceTest(BillingTestCase):
+    """Test repricing open bills after a tariff change"""
+    
+    def setUp(self):
+        super().setUp()
+        from society.models import Block
+        from .models import Tariff
+        from .billrun import generate_bills
+        
+        block = Block.objects.create(society=self.society, name='A', floors=1, units_per_floor=0)
+        self.flat.block = block
+        self.flat.area_sqft = Decimal('1000.00')
+        self.flat.parking_slots = 1
+        self.flat.save()
+        self.other_flat = Flat.objects.create(society=self.society, flat_number='B-101', floor=1, bhk='3BHK')
+        
+        self.tariff = Tariff.objects.create(
+            society=self.society,
+            maintenance_per_sqft=Decimal('2.00'),
+            maintenance_by_bhk={'3BHK': 800},
+            parking_per_slot=Decimal('300.00'),
+            water_charge=Decimal('100.00'),
+        )
+        self.paid_flat = Flat.objects.create(society=self.society, flat_number='B-102', floor=1)
+        generate_bills(self.tariff, self.current_month)
+        self.other_bill = Bill.objects.get(flat=self.other_flat, billing_month=self.current_month)
+        
+        # A fully paid bill is not repriced
+        Bill.objects.filter(flat=self.paid_flat).update(paid_amount=F('total_amount'), status=Bill.Status.PAID)
+    
+    def test_reprice_matches_bill_run_in_one_update(self):
+        """Test that repriced charges equal what the bill run computes"""
+        from .billrun import compute_charges
+        from .reprice import reprice_open_bills
+        
+        self.tariff.maintenance_per_sqft = Decimal('2.555')
+        self.tariff.maintenance_by_bhk = {'3BHK': 900}
+        self.tariff.water_charge = Decimal('120.00')
+        self.tariff.save()
+        
+        with CaptureQueriesContext(connection) as context:
+            summary = reprice_open_bills(self.tariff, self.current_month)
+        self.assertEqual(len([q for q in context.captured_queries if q['sql'].startswith('UPDATE "billing_bill"')]), 1)
+        
+        self.assertEqual(summary['updated'], 2)
+        self.assertEqual(
+            {block['block']: block['bills'] for block in summary['blocks']},
+            {'A': 1, 'No Block': 1}
+        )
+        
+        expected = compute_charges(self.tariff, Flat.objects.filter(
+            pk__in=[self.flat.pk, self.other_flat.pk]
+        ).values_list('id', 'area_sqft', 'bhk', 'parking_slots'))
+        for bill in Bill.objects.filter(flat__in=[self.flat, self.other_flat], billing_month=self.current_month):
+            for field, amount in expected[bill.flat_id].items():
+                self.assertEqual(getattr(bill, field), amount)
+            self.assertEqual(bill.total_amount, sum(expected[bill.flat_id].values()))
+        
+        bill = Bill.objects.get(pk=self.bill.pk)
+        self.assertEqual(bill.total_amount, Decimal('2975.00'))
+        self.assertEqual(self._balance_of(self.flat), Decimal('2975.00'))
+        
+        # Nothing changes on a second run
+        self.assertEqual(reprice_open_bills(self.tariff, self.current_month), {'updated': 0, 'blocks': []})
+    
+    def test_reprice_rederives_status(self):
+        """Test that a bill whose new total is covered becomes PAID"""
+        from .reprice import reprice_open_bills
+        
+        Bill.objects.filter(pk=self.other_bill.pk).update(paid_amount=Decimal('500.00'), status=Bill.Status.PARTIAL)
+        self.tariff.maintenance_by_bhk = {}
+        self.tariff.water_charge = Decimal('0')
+        self.tariff.save()
+        
+        reprice_open_bills(self.tariff, self.current_month)
+        self.other_bill.refresh_from_db()
+        self.assertEqual(self.other_bill.total_amount, Decimal('0.00'))
+        self.assertEqual(self.other_bill.status, Bill.Status.PAID)
+    
+    def test_reprice_raises_empty_default_bills(self):
+        """Test that a new flat's 0/0 default bill is open and raised by repricing"""
+        from .models import LedgerEntry
+        from .reprice import reprice_open_bills
+        
+        new_flat = Flat.objects.create(society=self.society, flat_number='B-103', floor=1, bhk='3BHK')
+        
+        summary = reprice_open_bills(self.tariff, self.current_month)
+        self.assertEqual(summary['updated'], 1)
+        bill = Bill.objects.get(flat=new_flat, billing_month=self.current_month)
+        self.assertEqual(bill.total_amount, Decimal('900.00'))
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(bill=bill).values_list('entry_type', 'amount')),
+            [(LedgerEntry.EntryType.BILL, Decimal('900.00'))]
+        )
+    
+    def test_reprice_endpoint(self):
+        """Test the admin-only reprice endpoint"""
+        self.client.force_authenticate(user=self.admin_user)
+        self.tariff.water_charge = Decimal('150.00')
+        self.tariff.save()
+        
+        response = self.client.post('/api/billing/bills/reprice/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+    
+    def _balance_of(self, flat):
+        from .models import FlatBalance
+        return FlatBalance.objects.get(flat=flat).balance
+
+
+class ReconcilerTest(BillingTestCase):
+    """Test the paid_amount reconciler"""
+    
+    def setUp(self):
+        super().setUp()
+        Payment.objects.create(
+            bill=self.bill,
+            amount=Decimal('400.00'),
+            payment_method=Payment.PaymentMethod.CASH,
+            payment_status=Payment.PaymentStatus.SUCCESS,
+            paid_by=self.admin_user
+        )
+        # A refund that never reached the bill, and a bill nobody paid
+        Payment.objects.filter(bill=self.bill).update(payment_status=Payment.PaymentStatus.REFUNDED)
+        other_flat = Flat.objects.create(society=self.society, flat_number='A-102', floor=1)
+        self.other_bill = other_flat.bills.get()
+    
+    def test_reports_drift_in_one_query(self):
+        """Test that drift is found with a single grouped query"""
+        from .reconcile import reconcile_paid_amounts
+        
+        rows = []
+        with CaptureQueriesContext(connection) as context:
+            summary = reconcile_paid_amounts(self.society.id, report=rows.append)
+        
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(summary, {'drifted': 1, 'fixed': 0, 'difference': -400.0})
+        self.assertEqual(rows[0]['bill'], self.bill.id)
+        self.assertEqual(rows[0]['payments_total'], Decimal('0'))
+    
+    def test_fix_corrects_paid_amount_status_and_ledger(self):
+        """Test that fixing drift updates the bill and posts the difference"""
+        from .models import FlatBalance
+        from .reconcile import reconcile_paid_amounts
+        
+        summary = reconcile_paid_amounts(self.society.id, fix=True)
+        self.assertEqual(summary['fixed'], 1)
+        
+        self.bill.refresh_from_db()
+        self.assertEqual(self.bill.paid_amount, Decimal('0.00'))
+        self.assertEqual(self.bill.status, Bill.Status.UNPAID)
+        self.assertEqual(FlatBalance.objects.get(flat=self.flat).balance, Decimal('1000.00'))
+        
+        self.assertEqual(reconcile_paid_amounts(self.society.id)['drifted'], 0)
+    
+    def test_management_command(self):
+        """Test the nightly command output"""
+        import io
+        from django.core.management import call_command
+        
+        out = io.StringIO()
+        call_command('reconcile_payments', fix=True, stdout=out)
+        self.assertIn(f'Bill {self.bill.id}', out.getvalue())
+        self.assertIn('1 bills drifted, 1 fixed', out.getvalue())
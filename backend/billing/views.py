@@ -1,14 +1,33 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Prefetch, Q, Sum
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import io
 from users.permissions import BillPermissions, PaymentPermissions
-from .models import Bill, Payment
+from .models import Bill, FlatBalance, LedgerEntry, Payment, Tariff
+from .billrun import generate_bills
+from .reprice import reprice_open_bills
+from . import aging, documents, exports
+from .imports import import_payments
+from . import cache as billing_cache
 from .serializers import (
-    BillSerializer, BillDetailSerializer, PaymentSerializer, CreatePaymentSerializer
+    BillSerializer, BillListSerializer, BillDetailSerializer, PaymentSerializer, CreatePaymentSerializer,
+    FlatBalanceSerializer, LedgerEntrySerializer, query_param_set
 )
 
 
+# Unmatched rows returned inline by PaymentViewSet.import_statement
+IMPORT_REPORT_LIMIT = 500
+
+
 class BillViewSet(viewsets.ModelViewSet):
     """ViewSet for Bill CRUD operations"""
     queryset = Bill.objects.all()
@@ -22,6 +41,8 @@ class BillViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return BillDetailSerializer
+        if self.action in ['list', 'my_bills']:
+            return BillListSerializer
         return BillSerializer
     
     def get_queryset(self):
@@ -38,17 +59,32 @@ class BillViewSet(viewsets.ModelViewSet):
             user_flats = Flat.objects.filter(current_resident=self.request.user)
             queryset = queryset.filter(flat__in=user_flats)
         
-        return queryset.select_related('society', 'flat').prefetch_related('payments')
+        queryset = queryset.select_related('society', 'flat')
+        
+        # Lists only nest payments with ?expand=payments; exports never do
+        if self.action == 'export':
+            return queryset
+        if self.action in ['list', 'my_bills'] and 'payments' not in query_param_set(self.request, 'expand'):
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch('payments', queryset=Payment.objects.select_related('paid_by'))
+        )
     
     @action(detail=True, methods=['post'])
     def record_payment(self, request, pk=None):
-        """Record a manual payment (cash/cheque)"""
+        """
+        Record a manual payment (cash/cheque).
+        
+        Send an Idempotency-Key header to make retries safe: a repeated key
+        for the same bill returns the original payment instead of posting again.
+        """
         bill = self.get_object()
         serializer = CreatePaymentSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        payment = Payment.objects.create(
-            bill=bill,
+        payment = _create_idempotent_payment(
+            bill,
+            request.headers.get('Idempotency-Key'),
             amount=serializer.validated_data['amount'],
             payment_method=serializer.validated_data['payment_method'],
             payment_status=Payment.PaymentStatus.SUCCESS,
@@ -75,48 +111,342 @@ class BillViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def mark_paid(self, request, pk=None):
-        """Mark a bill as paid (Admin only)"""
+        """Mark a bill as paid (Admin only). Accepts an Idempotency-Key header."""
         bill = self.get_object()
+        idempotency_key = request.headers.get('Idempotency-Key')
         
-        # Mark as fully paid
-        bill.paid_amount = bill.total_amount
-        bill.status = Bill.Status.PAID
-        bill.save()
-        
-        # Create a payment record
-        Payment.objects.create(
-            bill=bill,
-            amount=bill.total_amount,
-            payment_method=Payment.PaymentMethod.CASH,
-            payment_status=Payment.PaymentStatus.SUCCESS,
-            paid_by=request.user,
-            notes=request.data.get('notes', 'Marked as paid by admin')
-        )
+        with transaction.atomic():
+            # Lock the bill so two concurrent calls can't both pay the balance
+            locked_bill = Bill.objects.select_for_update().get(pk=bill.pk)
+            balance = locked_bill.total_amount - locked_bill.paid_amount
+            
+            # Record a cash payment for the outstanding balance, which marks the bill paid.
+            # A retried call finds no balance left, so it never pays twice.
+            if balance > 0:
+                _create_idempotent_payment(
+                    locked_bill,
+                    idempotency_key,
+                    amount=balance,
+                    payment_method=Payment.PaymentMethod.CASH,
+                    payment_status=Payment.PaymentStatus.SUCCESS,
+                    paid_by=request.user,
+                    notes=request.data.get('notes', 'Marked as paid by admin')
+                )
         
+        bill.refresh_from_db()
         return Response(BillSerializer(bill).data)
     
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Generate this month's (or ?month=YYYY-MM) bills from the society's tariff"""
+        return _tariff_run_response(request, generate_bills)
+    
+    @action(detail=False, methods=['post'])
+    def reprice(self, request):
+        """Reprice this month's (or ?month=YYYY-MM) open bills after a tariff change"""
+        return _tariff_run_response(request, reprice_open_bills)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get billing statistics"""
-        queryset = self.get_queryset()
+        """
+        Get billing statistics.
         
-        from django.db.models import Sum
+        Pass ?month=YYYY-MM to also get the same figures for a single
+        billing month, computed in the same query.
+        """
+        month = request.query_params.get('month')
+        month_start = None
+        if month:
+            try:
+                month_start = datetime.strptime(month, '%Y-%m').date()
+            except ValueError:
+                return Response(
+                    {'error': 'month must be in YYYY-MM format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         
-        total_bills = queryset.count()
-        total_amount = queryset.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        total_paid = queryset.aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0
+        # Results are cached per society and invalidated by Bill/Payment writes.
+        # Residents only see their own bills, so their results are cached per user.
+        society_id = getattr(request.user, 'society_id', None)
+        cache_key = None
+        if society_id:
+            scope = request.user.id if request.user.role == 'RESIDENT' else 'all'
+            cache_key = billing_cache.cache_key('stats', society_id, scope, month or '')
+            stats = cache.get(cache_key)
+            if stats is not None:
+                return Response(stats)
         
-        stats = {
-            'total_bills': total_bills,
-            'unpaid': queryset.filter(status=Bill.Status.UNPAID).count(),
-            'paid': queryset.filter(status=Bill.Status.PAID).count(),
-            'overdue': queryset.filter(status=Bill.Status.OVERDUE).count(),
-            'total_amount': float(total_amount),
-            'total_paid': float(total_paid),
-            'total_pending': float(total_amount - total_paid),
-        }
+        aggregates = _stats_aggregates('all_')
+        if month_start:
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            aggregates.update(_stats_aggregates(
+                'month_',
+                Q(billing_month__gte=month_start, billing_month__lt=next_month)
+            ))
+        totals = self.get_queryset().aggregate(**aggregates)
+        
+        stats = _stats_from_totals(totals, 'all_')
+        if month_start:
+            stats['month'] = {'month': month, **_stats_from_totals(totals, 'month_')}
+        
+        if cache_key:
+            cache.set(cache_key, stats, billing_cache.BILLING_CACHE_TIMEOUT)
         
         return Response(stats)
+    
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        """
+        Dues aging report: outstanding amounts per flat and block, bucketed
+        by days past due. Pass ?export=csv to download the flat rows.
+        """
+        society = getattr(request.user, 'society', None)
+        if not society:
+            return Response(
+                {'error': 'User is not associated with a society'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        report = aging.get_aging_report(society.id)
+        
+        if request.query_params.get('export') == 'csv':
+            response = HttpResponse(content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="aging-{report["as_of"]}.csv"'
+            aging.write_csv(report, response)
+            return response
+        
+        return Response(report)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream bills as CSV. Accepts the list filters plus ?from=YYYY-MM-DD
+        and ?to=YYYY-MM-DD on the billing month.
+        """
+        try:
+            start = _parse_date(request.query_params.get('from'))
+            end = _parse_date(request.query_params.get('to'))
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        bills = self.filter_queryset(self.get_queryset())
+        if start:
+            bills = bills.filter(billing_month__gte=start)
+        if end:
+            bills = bills.filter(billing_month__lte=end)
+        
+        return exports.csv_response(
+            bills,
+            exports.BILL_EXPORT_FIELDS,
+            f'bills-{timezone.now().date().isoformat()}.csv'
+        )
+    
+    @action(detail=False, methods=['get'])
+    def monthly_statement(self, request):
+        """
+        PDF statement of a flat for a month (?flat=<id>&month=YYYY-MM).
+        
+        Returns 202 while the PDF is being rendered; retry to download it.
+        """
+        try:
+            flat_id = int(request.query_params.get('flat', ''))
+            month = datetime.strptime(request.query_params.get('month', ''), '%Y-%m').date()
+        except ValueError:
+            return Response(
+                {'error': 'flat and month (YYYY-MM) are required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        from society.models import Flat
+        flat = self._ledger_scope(Flat.objects.filter(pk=flat_id)).first()
+        if flat is None:
+            return Response({'error': 'Flat not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        document = documents.statement_documents(flat.society_id, month, flat_ids=[flat.id])[0]
+        return _document_response(document, f'statement-{flat.flat_number}-{month:%Y-%m}.pdf')
+    
+    @action(detail=False, methods=['get'])
+    def balances(self, request):
+        """Flats with outstanding dues, largest first"""
+        balances = self._ledger_scope(FlatBalance.objects.filter(balance__gt=0))
+        balances = balances.select_related('flat').order_by('-balance', 'flat__flat_number')
+        
+        page = self.paginate_queryset(balances)
+        if page is not None:
+            serializer = FlatBalanceSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = FlatBalanceSerializer(balances, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def statement(self, request):
+        """
+        Ledger statement for a flat (?flat=<id>).
+        
+        Pass ?from=YYYY-MM-DD and/or ?to=YYYY-MM-DD to limit the period; the
+        opening balance covers everything posted before it.
+        """
+        try:
+            flat_id = int(request.query_params.get('flat', ''))
+        except ValueError:
+            return Response(
+                {'error': 'flat is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start = _parse_date(request.query_params.get('from'))
+            end = _parse_date(request.query_params.get('to'))
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Datetime bounds keep this a range scan of the (flat, created_at) index
+        entries = self._ledger_scope(LedgerEntry.objects.filter(flat_id=flat_id))
+        opening_balance = Decimal('0')
+        if start:
+            start_at = timezone.make_aware(datetime.combine(start, time.min))
+            opening_balance = entries.filter(created_at__lt=start_at).aggregate(total=Sum('amount'))['total'] or opening_balance
+            entries = entries.filter(created_at__gte=start_at)
+        if end:
+            entries = entries.filter(created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+        
+        running_balance = opening_balance
+        entries = list(entries)
+        for entry in entries:
+            running_balance += entry.amount
+            entry.running_balance = running_balance
+        
+        return Response({
+            'flat': flat_id,
+            'opening_balance': f'{opening_balance:.2f}',
+            'closing_balance': f'{running_balance:.2f}',
+            'entries': LedgerEntrySerializer(entries, many=True).data,
+        })
+    
+    def _ledger_scope(self, queryset):
+        """Limit Flat/FlatBalance/LedgerEntry rows to what the user may see"""
+        if hasattr(self.request.user, 'society') and self.request.user.society:
+            queryset = queryset.filter(society=self.request.user.society)
+        
+        # Residents can only see their own flats
+        if hasattr(self.request.user, 'role') and self.request.user.role == 'RESIDENT':
+            resident_field = 'current_resident' if queryset.model._meta.model_name == 'flat' else 'flat__current_resident'
+            queryset = queryset.filter(**{resident_field: self.request.user})
+        
+        return queryset
+
+
+def _document_response(document, filename):
+    """Serve a rendered document, or queue it and answer 202 until it is ready"""
+    path = documents.render_in_background(document)
+    if path is None:
+        response = Response({'status': 'rendering'}, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = '2'
+        return response
+    return FileResponse(open(path, 'rb'), content_type='application/pdf', filename=filename)
+
+
+def _tariff_run_response(request, run):
+    """
+    Call run(tariff, billing_month) for the user's society and this month
+    (or ?month=YYYY-MM), and answer with its summary.
+    """
+    society = getattr(request.user, 'society', None)
+    if not society:
+        return Response(
+            {'error': 'User is not associated with a society'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    month = request.data.get('month') or request.query_params.get('month')
+    try:
+        billing_month = datetime.strptime(month, '%Y-%m').date() if month else timezone.now().date().replace(day=1)
+    except ValueError:
+        return Response(
+            {'error': 'month must be in YYYY-MM format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        tariff = society.tariff
+    except Tariff.DoesNotExist:
+        return Response(
+            {'error': 'No tariff configured for this society'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    summary = run(tariff, billing_month)
+    return Response({'month': billing_month.strftime('%Y-%m'), **summary})
+
+
+def _parse_date(value):
+    """Parse an optional YYYY-MM-DD query parameter"""
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _create_idempotent_payment(bill, idempotency_key, **payment_fields):
+    """
+    Create a payment for a bill, or return the one already recorded with the
+    same Idempotency-Key. The unique (bill, idempotency_key) constraint
+    settles races between concurrent retries.
+    """
+    if idempotency_key:
+        existing = bill.payments.filter(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+    
+    try:
+        with transaction.atomic():
+            return Payment.objects.create(
+                bill=bill,
+                idempotency_key=idempotency_key or None,
+                **payment_fields
+            )
+    except IntegrityError:
+        existing = bill.payments.filter(idempotency_key=idempotency_key).first() if idempotency_key else None
+        if existing is None:
+            raise
+        return existing
+
+
+def _stats_aggregates(prefix, condition=None):
+    """Conditional aggregates for BillViewSet.stats, optionally restricted by a Q"""
+    def scoped(q=None):
+        if condition is None:
+            return q
+        return condition & q if q is not None else condition
+    
+    return {
+        f'{prefix}total_bills': Count('id', filter=scoped()),
+        f'{prefix}unpaid': Count('id', filter=scoped(Q(status=Bill.Status.UNPAID))),
+        f'{prefix}paid': Count('id', filter=scoped(Q(status=Bill.Status.PAID))),
+        f'{prefix}overdue': Count('id', filter=scoped(Q(status=Bill.Status.OVERDUE))),
+        f'{prefix}total_amount': Sum('total_amount', filter=scoped()),
+        f'{prefix}total_paid': Sum('paid_amount', filter=scoped()),
+    }
+
+
+def _stats_from_totals(totals, prefix):
+    """Shape the aggregate() result of _stats_aggregates into the stats response"""
+    total_amount = totals[f'{prefix}total_amount'] or 0
+    total_paid = totals[f'{prefix}total_paid'] or 0
+    
+    return {
+        'total_bills': totals[f'{prefix}total_bills'],
+        'unpaid': totals[f'{prefix}unpaid'],
+        'paid': totals[f'{prefix}paid'],
+        'overdue': totals[f'{prefix}overdue'],
+        'total_amount': float(total_amount),
+        'total_paid': float(total_paid),
+        'total_pending': float(total_amount - total_paid),
+    }
 
 
 class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
@@ -139,5 +469,77 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
         if hasattr(self.request.user, 'role') and self.request.user.role == 'RESIDENT':
             queryset = queryset.filter(paid_by=self.request.user)
         
-        return queryset.select_related('bill', 'paid_by')
+        return queryset.select_related('bill__society', 'bill__flat', 'paid_by')
+    
+    @action(detail=True, methods=['get'])
+    def receipt(self, request, pk=None):
+        """
+        PDF receipt for a payment.
+        
+        Returns 202 while the PDF is being rendered; retry to download it.
+        """
+        payment = self.get_object()
+        document = documents.receipt_document(payment)
+        return _document_response(document, f'receipt-{payment.receipt_number}.pdf')
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def import_statement(self, request):
+        """
+        Import payments from an uploaded bank/UPI statement CSV (field: file).
+        
+        Returns the import summary and up to IMPORT_REPORT_LIMIT unmatched rows.
+        """
+        society = getattr(request.user, 'society', None)
+        if not society:
+            return Response(
+                {'error': 'User is not associated with a society'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response(
+                {'error': 'file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        unmatched_rows = []
+        
+        def report(row):
+            if len(unmatched_rows) < IMPORT_REPORT_LIMIT:
+                unmatched_rows.append(row)
+        
+        csv_file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        summary = import_payments(society.id, csv_file, request.user, report=report)
+        
+        return Response({**summary, 'unmatched_rows': unmatched_rows})
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream payments as CSV. Accepts the list filters plus ?from=YYYY-MM-DD
+        and ?to=YYYY-MM-DD on the payment date.
+        """
+        try:
+            start = _parse_date(request.query_params.get('from'))
+            end = _parse_date(request.query_params.get('to'))
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        payments = self.filter_queryset(self.get_queryset())
+        if start:
+            payments = payments.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+        if end:
+            payments = payments.filter(
+                created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+            )
+        
+        return exports.csv_response(
+            payments,
+            exports.PAYMENT_EXPORT_FIELDS,
+            f'payments-{timezone.now().date().isoformat()}.csv'
+        )
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Complaint, ComplaintUpdate
+from .models import Complaint, ComplaintResolutionRollup, ComplaintUpdate
 
 
 class ComplaintUpdateInline(admin.TabularInline):
@@ -13,6 +13,7 @@ class ComplaintAdmin(admin.ModelAdmin):
     list_filter = ('society', 'category', 'priority', 'status')
     search_fields = ('title', 'description')
     date_hierarchy = 'created_at'
+    raw_id_fields = ('duplicate_of',)
     inlines = [ComplaintUpdateInline]
 
 
@@ -22,3 +23,9 @@ class ComplaintUpdateAdmin(admin.ModelAdmin):
     list_filter = ('complaint__society',)
     date_hierarchy = 'created_at'
 
+
+@admin.register(ComplaintResolutionRollup)
+class ComplaintResolutionRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'society', 'category', 'priority', 'bucket', 'resolved_count', 'total_seconds')
+    list_filter = ('society', 'category', 'priority')
+    date_hierarchy = 'day'
@@ -0,0 +1,138 @@
+"""
+Near-duplicate complaint detection and clustering.
+
+Every complaint stores a MinHash signature of the character shingles of its
+title and description (Complaint.signature, recomputed by Complaint.save
+when either changes). The fraction of equal signature values estimates the
+Jaccard similarity of two complaints' shingle sets, so reworded or
+re-punctuated copies of the same complaint compare as close without reading
+their text again.
+
+A new complaint is compared with the recent open complaints of the same
+society and category. Above ATTACH_THRESHOLD it joins the best match's
+cluster: clusters are flat, every duplicate points at the cluster's primary
+complaint through Complaint.duplicate_of. A whole cluster can then be
+resolved or closed in one transaction (``transition_cluster``).
+"""
+import hashlib
+import random
+import re
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from search.index import normalize
+from .models import Complaint
+from .workflow import UPDATED, bulk_transition
+
+
+SHINGLE_SIZE = 4
+NUM_HASHES = 64
+
+# Estimated Jaccard similarity to join a cluster on creation / to be suggested
+ATTACH_THRESHOLD = 0.5
+SUGGEST_THRESHOLD = 0.2
+
+# Only open complaints this recent are candidates, newest first
+CANDIDATE_WINDOW = timedelta(days=14)
+CANDIDATE_LIMIT = 500
+
+OPEN_STATUSES = [Complaint.Status.OPEN, Complaint.Status.IN_PROGRESS]
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+# Fixed (a, b) pairs: signatures must stay comparable across processes and releases
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+
+def shingles(title, description=''):
+    """Character shingles of a complaint's normalized text"""
+    text = ' '.join(re.findall(r'\w+', normalize(f'{title} {description}')))
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[index:index + SHINGLE_SIZE] for index in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(title, description=''):
+    """MinHash signature (NUM_HASHES 32-bit ints) of a complaint's text, or None if empty"""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in shingles(title, description)
+    ]
+    if not hashes:
+        return None
+    return [min((a * value + b) % _PRIME for value in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures"""
+    if not signature or not other or len(signature) != len(other):
+        return 0.0
+    return sum(1 for mine, theirs in zip(signature, other) if mine == theirs) / len(signature)
+
+
+def similar_complaints(complaint, threshold=SUGGEST_THRESHOLD):
+    """
+    Recent open complaints of the same society and category that look like
+    `complaint`, as [(similarity, id, duplicate_of_id)] best first. An open
+    duplicate of a primary that was already resolved or closed belongs to a
+    finished cluster and isn't a candidate.
+    """
+    signature = complaint.signature or minhash_signature(complaint.title, complaint.description)
+    candidates = (
+        Complaint.objects.filter(
+            Q(duplicate_of__isnull=True) | Q(duplicate_of__status__in=OPEN_STATUSES),
+            society_id=complaint.society_id,
+            category=complaint.category,
+            status__in=OPEN_STATUSES,
+            created_at__gte=timezone.now() - CANDIDATE_WINDOW,
+        )
+        .exclude(pk=complaint.pk)
+        .order_by('-created_at')
+        .values_list('id', 'duplicate_of_id', 'signature')[:CANDIDATE_LIMIT]
+    )
+    matches = [
+        (round(similarity(signature, other), 2), candidate_id, duplicate_of_id)
+        for candidate_id, duplicate_of_id, other in candidates
+    ]
+    return sorted((match for match in matches if match[0] >= threshold), reverse=True)
+
+
+def find_cluster(complaint):
+    """Primary complaint id of the cluster a new complaint belongs to, or None"""
+    matches = similar_complaints(complaint, ATTACH_THRESHOLD)
+    if not matches:
+        return None
+    _, candidate_id, duplicate_of_id = matches[0]
+    return duplicate_of_id or candidate_id
+
+
+@transaction.atomic
+def attach(complaint, primary):
+    """
+    Make `complaint` (and any duplicates it had) duplicates of `primary`'s
+    cluster. Returns the cluster's primary complaint.
+    """
+    if primary.duplicate_of_id:
+        primary = primary.duplicate_of
+    Complaint.objects.filter(duplicate_of=complaint).update(duplicate_of=primary, updated_at=timezone.now())
+    complaint.duplicate_of = primary
+    complaint.save(update_fields=['duplicate_of', 'updated_at'])
+    return primary
+
+
+def transition_cluster(primary, action, user, resolution_notes=''):
+    """
+    Resolve or close ('resolve' / 'close') a cluster's primary complaint and
+    all its duplicates in one transaction (see workflow.bulk_transition).
+    Returns the number of complaints updated.
+    """
+    members = Complaint.objects.filter(Q(pk=primary.pk) | Q(duplicate_of=primary)).values_list('id', flat=True)
+    verb = 'resolved' if action == 'resolve' else 'closed'
+    message = f'Complaint {verb} with cluster #{primary.pk}'
+    if resolution_notes:
+        message = f'{message}. {resolution_notes}'
+    results = bulk_transition(list(members), action, user, resolution_notes=resolution_notes, message=message)
+    return sum(1 for result in results.values() if result == UPDATED)
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:37
+
+from bisect import bisect_left
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# complaints.sla's buckets when this migration was written; copied so later
+# changes there don't change what this migration does
+SLA_BUCKET_HOURS = [1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720]
+
+
+def bucket_for(seconds):
+    return bisect_left(SLA_BUCKET_HOURS, seconds / 3600)
+
+
+def backfill_rollups(apps, schema_editor):
+    """Build the rollups of complaints resolved before they existed"""
+    Complaint = apps.get_model('complaints', 'Complaint')
+    ComplaintResolutionRollup = apps.get_model('complaints', 'ComplaintResolutionRollup')
+
+    rollups = {}
+    resolved = Complaint.objects.exclude(resolved_at=None).values_list(
+        'society_id', 'category', 'priority', 'created_at', 'resolved_at'
+    )
+    for society_id, category, priority, created_at, resolved_at in resolved.iterator():
+        seconds = max(int((resolved_at - created_at).total_seconds()), 0)
+        key = (society_id, timezone.localtime(resolved_at).date(), category, priority, bucket_for(seconds))
+        count, total = rollups.get(key, (0, 0))
+        rollups[key] = (count + 1, total + seconds)
+
+    ComplaintResolutionRollup.objects.bulk_create(
+        [
+            ComplaintResolutionRollup(
+                society_id=society_id, day=day, category=category, priority=priority, bucket=bucket,
+                resolved_count=count, total_seconds=total,
+            )
+            for (society_id, day, category, priority, bucket), (count, total) in rollups.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0002_initial'),
+        ('society', '0003_block_flat_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComplaintResolutionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=[('PLUMBING', 'Plumbing'), ('ELECTRICAL', 'Electrical'), ('CIVIL', 'Civil Work'), ('CARPENTRY', 'Carpentry'), ('CLEANING', 'Cleaning'), ('SECURITY', 'Security'), ('LIFT', 'Lift'), ('GENERATOR', 'Generator'), ('WATER', 'Water Supply'), ('OTHER', 'Other')], max_length=20)),
+                ('priority', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('URGENT', 'Urgent')], max_length=10)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('resolved_count', models.IntegerField(default=0)),
+                ('total_seconds', models.BigIntegerField(default=0)),
+                ('society', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='complaint_rollups', to='society.society')),
+            ],
+            options={
+                'unique_together': {('society', 'day', 'category', 'priority', 'bucket')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
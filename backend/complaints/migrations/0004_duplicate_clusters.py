@@ -0,0 +1,80 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:45
+
+import hashlib
+import random
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# complaints.duplicates' MinHash when this migration was written; copied so
+# the migration doesn't import live app code (or complaints.models)
+SHINGLE_SIZE = 4
+NUM_HASHES = 64
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+
+def shingles(title, description=''):
+    decomposed = unicodedata.normalize('NFKD', f'{title} {description}')
+    normalized = ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+    text = ' '.join(re.findall(r'\w+', normalized))
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[index:index + SHINGLE_SIZE] for index in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(title, description=''):
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in shingles(title, description)
+    ]
+    if not hashes:
+        return None
+    return [min((a * value + b) % _PRIME for value in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS]
+
+
+def backfill_signatures(apps, schema_editor):
+    Complaint = apps.get_model('complaints', 'Complaint')
+    # Only open complaints are duplicate candidates; others get one when next saved
+    complaints = Complaint.objects.filter(status__in=['OPEN', 'IN_PROGRESS']).only('title', 'description')
+    batch = []
+    for complaint in complaints.iterator(chunk_size=1000):
+        complaint.signature = minhash_signature(complaint.title, complaint.description)
+        batch.append(complaint)
+        if len(batch) >= 1000:
+            Complaint.objects.bulk_update(batch, ['signature'])
+            batch = []
+    Complaint.objects.bulk_update(batch, ['signature'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0003_resolution_rollup'),
+        ('society', '0003_block_flat_block'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaint',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='complaints.complaint'),
+        ),
+        migrations.AddField(
+            model_name='complaint',
+            name='signature',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['society', 'category', 'status', 'created_at'], name='complaints__society_12b71a_idx'),
+        ),
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+    ]
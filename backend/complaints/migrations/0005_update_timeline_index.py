@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0004_duplicate_clusters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaintupdate',
+            index=models.Index(fields=['complaint', 'created_at'], name='complaints__complai_36b92b_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:36
+
+import posixpath
+
+from django.db import migrations, models
+
+
+# society.images' naming of the last thumbnail it writes, when this migration
+# was written; copied so the migration doesn't import live app code
+def last_thumbnail_name(name):
+    return posixpath.join('thumbnails', f'{posixpath.splitext(name)[0]}_large.jpg')
+
+
+def mark_processed_photos(apps, schema_editor):
+    """Flag the photos whose thumbnails were written before the flags existed"""
+    from django.core.files.storage import default_storage
+
+    Complaint = apps.get_model('complaints', 'Complaint')
+    for field in ['photo1', 'photo2', 'photo3']:
+        names = (
+            Complaint.objects.exclude(**{f'{field}__isnull': True})
+            .exclude(**{field: ''})
+            .values_list(field, flat=True)
+            .distinct()
+        )
+        ready = [name for name in names if default_storage.exists(last_thumbnail_name(name))]
+        for start in range(0, len(ready), 1000):
+            Complaint.objects.filter(**{f'{field}__in': ready[start:start + 1000]}).update(
+                **{f'{field}_thumbnails_ready': True}
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('complaints', '0005_update_timeline_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complaint',
+            name='photo1_thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='complaint',
+            name='photo2_thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='complaint',
+            name='photo3_thumbnails_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_processed_photos, migrations.RunPython.noop),
+    ]
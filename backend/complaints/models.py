@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 
@@ -44,6 +44,10 @@ class Complaint(models.Model):
     photo1 = models.ImageField(upload_to='complaints/', blank=True, null=True)
     photo2 = models.ImageField(upload_to='complaints/', blank=True, null=True)
     photo3 = models.ImageField(upload_to='complaints/', blank=True, null=True)
+    # Set once the photo's thumbnails are written (see society.images)
+    photo1_thumbnails_ready = models.BooleanField(default=False, editable=False)
+    photo2_thumbnails_ready = models.BooleanField(default=False, editable=False)
+    photo3_thumbnails_ready = models.BooleanField(default=False, editable=False)
     
     # Tracking
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='complaints_created')
@@ -53,14 +57,46 @@ class Complaint(models.Model):
     resolution_notes = models.TextField(blank=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
     
+    # Near-duplicate clustering (see complaints.duplicates)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
+    signature = models.JSONField(null=True, blank=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.title} - {self.status}"
     
+    def save(self, *args, **kwargs):
+        from .duplicates import minhash_signature
+        from .sla import ROLLUP_FIELDS, update_rollups
+        
+        # Keep the SLA rollups in step with this complaint's resolution
+        previous = None
+        if not self._state.adding:
+            previous = Complaint.objects.filter(pk=self.pk).values(*ROLLUP_FIELDS, 'title', 'description').first()
+        
+        # Only recompute the duplicate signature when the text changes and is saved
+        update_fields = kwargs.get('update_fields')
+        text_changed = (
+            previous is None
+            or self.signature is None
+            or (previous['title'], previous['description']) != (self.title, self.description)
+        )
+        if text_changed and (update_fields is None or {'title', 'description'} & set(update_fields)):
+            self.signature = minhash_signature(self.title, self.description)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'signature'}
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            update_rollups(previous, self)
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['society', 'category', 'status', 'created_at']),
+        ]
 
 
 class ComplaintUpdate(models.Model):
@@ -75,4 +111,30 @@ class ComplaintUpdate(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['complaint', 'created_at']),
+        ]
+
 
+class ComplaintResolutionRollup(models.Model):
+    """
+    Daily time-to-resolve histogram per category and priority.
+    
+    One row per (society, resolution day, category, priority, bucket), where
+    bucket indexes complaints.sla.SLA_BUCKET_HOURS. Maintained incrementally
+    by Complaint.save.
+    """
+    society = models.ForeignKey('society.Society', on_delete=models.CASCADE, related_name='complaint_rollups')
+    day = models.DateField()
+    category = models.CharField(max_length=20, choices=Complaint.Category.choices)
+    priority = models.CharField(max_length=10, choices=Complaint.Priority.choices)
+    bucket = models.PositiveSmallIntegerField()
+    
+    resolved_count = models.IntegerField(default=0)
+    total_seconds = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.day} {self.category}/{self.priority} #{self.bucket}: {self.resolved_count}"
+    
+    class Meta:
+        unique_together = ['society', 'day', 'category', 'priority', 'bucket']
@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from .models import Complaint, ComplaintUpdate
+from .duplicates import find_cluster
+from .workflow import TRANSITIONS
 from users.serializers import UserSerializer
-from society.serializers import FlatSerializer
+from society.serializers import FlatSerializer, ThumbnailsField
+from search.serializers import SearchHighlightsField
 
 
 class ComplaintUpdateSerializer(serializers.ModelSerializer):
@@ -11,7 +14,7 @@ class ComplaintUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = ComplaintUpdate
         fields = '__all__'
-        read_only_fields = ('updated_by',)
+        read_only_fields = ('complaint', 'updated_by')
     
     def get_updated_by_name(self, obj):
         return obj.updated_by.get_full_name() if obj.updated_by else None
@@ -23,11 +26,15 @@ class ComplaintSerializer(serializers.ModelSerializer):
     assigned_to_name = serializers.SerializerMethodField()
     flat_number = serializers.SerializerMethodField()
     updates_count = serializers.SerializerMethodField()
+    photo1_thumbnails = ThumbnailsField(source='photo1')
+    photo2_thumbnails = ThumbnailsField(source='photo2')
+    photo3_thumbnails = ThumbnailsField(source='photo3')
+    search_highlights = SearchHighlightsField(['title', 'description'])
     
     class Meta:
         model = Complaint
-        fields = '__all__'
-        read_only_fields = ('society', 'created_by', 'resolved_at')
+        exclude = ('signature', 'photo1_thumbnails_ready', 'photo2_thumbnails_ready', 'photo3_thumbnails_ready')
+        read_only_fields = ('society', 'created_by', 'resolved_at', 'duplicate_of')
     
     def get_created_by_name(self, obj):
         return obj.created_by.get_full_name() if obj.created_by else None
@@ -39,22 +46,66 @@ class ComplaintSerializer(serializers.ModelSerializer):
         return obj.flat.flat_number if obj.flat else None
     
     def get_updates_count(self, obj):
+        # Annotated by ComplaintViewSet.get_queryset
+        if hasattr(obj, 'num_updates'):
+            return obj.num_updates
         return obj.updates.count()
     
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         validated_data['society'] = self.context['request'].user.society
+        
+        # Join the cluster of an open complaint this one near-duplicates
+        probe = Complaint(
+            society=validated_data['society'],
+            category=validated_data.get('category'),
+            title=validated_data.get('title', ''),
+            description=validated_data.get('description', ''),
+        )
+        validated_data['duplicate_of_id'] = find_cluster(probe)
         return super().create(validated_data)
 
 
+class ComplaintChangesSerializer(ComplaintSerializer):
+    """
+    Only the given fields of a complaint (plus its id), for responses to
+    actions that change a few of them:
+    ComplaintChangesSerializer(complaint, fields=['status', 'updated_at'])
+    """
+    
+    def __init__(self, *args, fields=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in set(self.fields) - {'id', *fields}:
+            self.fields.pop(name)
+
+
 class ComplaintDetailSerializer(serializers.ModelSerializer):
-    """Detailed serializer for Complaint with nested data"""
+    """
+    Detailed serializer for Complaint with nested data. The update timeline
+    is paginated separately (ComplaintViewSet.updates).
+    """
     created_by = UserSerializer(read_only=True)
     assigned_to = UserSerializer(read_only=True)
     flat = FlatSerializer(read_only=True)
-    updates = ComplaintUpdateSerializer(many=True, read_only=True)
+    duplicates = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    photo1_thumbnails = ThumbnailsField(source='photo1')
+    photo2_thumbnails = ThumbnailsField(source='photo2')
+    photo3_thumbnails = ThumbnailsField(source='photo3')
     
     class Meta:
         model = Complaint
-        fields = '__all__'
+        exclude = ('signature', 'photo1_thumbnails_ready', 'photo2_thumbnails_ready', 'photo3_thumbnails_ready')
+
 
+
+class ComplaintBulkActionSerializer(serializers.Serializer):
+    """Serializer for bulk workflow transitions"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+    action = serializers.ChoiceField(choices=list(TRANSITIONS))
+    assigned_to = serializers.IntegerField(required=False)
+    resolution_notes = serializers.CharField(required=False, allow_blank=True, default='')
+    
+    def validate(self, data):
+        if data['action'] == 'assign' and not data.get('assigned_to'):
+            raise serializers.ValidationError({'assigned_to': 'assigned_to is required to assign'})
+        return data
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from search.index import register
+from society.images import process_uploads
+from .models import Complaint
+from .sla import ROLLUP_FIELDS, move_rollups
+
+
+# Strip EXIF and generate thumbnails for uploaded photos
+process_uploads(Complaint, ['photo1', 'photo2', 'photo3'])
+
+# Keep complaints in the full-text search index
+register(Complaint, {'title': 3, 'description': 1})
+
+
+@receiver(post_delete, sender=Complaint)
+def remove_resolution_rollup(sender, instance, **kwargs):
+    """A deleted complaint no longer counts towards the SLA rollups"""
+    move_rollups([({field: getattr(instance, field) for field in ROLLUP_FIELDS}, None)])
@@ -0,0 +1,146 @@
+"""
+Complaint time-to-resolve (SLA) metrics.
+
+Resolution times are kept in ComplaintResolutionRollup rows: per society,
+resolution day, category and priority, a histogram of how many complaints
+were resolved within each SLA_BUCKET_HOURS bucket and their total time.
+Complaint.save adds (or removes) a complaint's contribution with F()
+increments and deleting a complaint removes it (complaints.signals), so the
+SLA report reads a few hundred rollup rows instead of scanning the
+complaints table.
+
+Means are exact. p50/p90 are reported as the upper bound of the histogram
+bucket the percentile falls in (for the open-ended last bucket, its mean).
+"""
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ComplaintResolutionRollup
+
+
+# Upper bounds (hours) of the histogram buckets; a last bucket holds the rest
+SLA_BUCKET_HOURS = [1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720]
+
+# Complaint fields a rollup contribution depends on
+ROLLUP_FIELDS = ['society_id', 'category', 'priority', 'created_at', 'resolved_at']
+
+PERCENTILES = [('p50_hours', 0.5), ('p90_hours', 0.9)]
+
+
+def bucket_for(seconds):
+    """Index of the SLA_BUCKET_HOURS bucket for a resolution time"""
+    return bisect_left(SLA_BUCKET_HOURS, seconds / 3600)
+
+
+def _contribution(values):
+    """(rollup key, seconds) for a complaint's ROLLUP_FIELDS, or None if unresolved"""
+    if not values or not values['resolved_at']:
+        return None
+    seconds = max(int((values['resolved_at'] - values['created_at']).total_seconds()), 0)
+    key = {
+        'society_id': values['society_id'],
+        'day': timezone.localtime(values['resolved_at']).date(),
+        'category': values['category'],
+        'priority': values['priority'],
+        'bucket': bucket_for(seconds),
+    }
+    return key, seconds
+
+
+def _add(key, count, seconds):
+    # Removing a contribution never needs a new row (and mustn't create one
+    # while a society and its rollups are being deleted)
+    if count > 0:
+        ComplaintResolutionRollup.objects.bulk_create([ComplaintResolutionRollup(**key)], ignore_conflicts=True)
+    ComplaintResolutionRollup.objects.filter(**key).update(
+        resolved_count=F('resolved_count') + count,
+        total_seconds=F('total_seconds') + seconds,
+    )
+
+
+def move_rollups(changes):
+    """
+    Move the contributions of many complaints at once; `changes` is a list of
+    (previous, current) dicts of ROLLUP_FIELDS (either may be None). Use
+    after set-based updates, inside their transaction: each rollup row is
+    written once however many complaints it gains or loses.
+    """
+    deltas = {}
+    for previous, current in changes:
+        old, new = _contribution(previous), _contribution(current)
+        if old == new:
+            continue
+        for contribution, sign in ((old, -1), (new, 1)):
+            if contribution:
+                key, seconds = contribution
+                count, total = deltas.get(tuple(key.items()), (0, 0))
+                deltas[tuple(key.items())] = (count + sign, total + sign * seconds)
+
+    for key, (count, seconds) in deltas.items():
+        if count or seconds:
+            _add(dict(key), count, seconds)
+
+
+def update_rollups(previous, complaint):
+    """
+    Move a complaint's contribution from its previous field values (a dict
+    of ROLLUP_FIELDS, or None) to its current ones. Call inside the
+    transaction that saves the complaint.
+    """
+    move_rollups([(previous, {field: getattr(complaint, field) for field in ROLLUP_FIELDS})])
+
+
+def _percentile_hours(buckets, fraction):
+    """Estimate a percentile from {bucket: (count, seconds)}"""
+    total = sum(count for count, _ in buckets.values())
+    rank = fraction * total
+    seen = 0
+    for bucket in sorted(buckets):
+        count, seconds = buckets[bucket]
+        seen += count
+        if seen >= rank and count:
+            if bucket < len(SLA_BUCKET_HOURS):
+                return SLA_BUCKET_HOURS[bucket]
+            return round(seconds / count / 3600, 2)
+    return None
+
+
+def sla_report(society_id, start_month=None, end_month=None):
+    """
+    Mean/p50/p90 hours to resolve per month, category and priority, for
+    complaints resolved between start_month and end_month (inclusive).
+    """
+    rollups = ComplaintResolutionRollup.objects.filter(society_id=society_id, resolved_count__gt=0)
+    if start_month:
+        rollups = rollups.filter(day__gte=start_month.replace(day=1))
+    if end_month:
+        rollups = rollups.filter(day__lt=(end_month.replace(day=1) + timedelta(days=32)).replace(day=1))
+
+    groups = {}
+    for row in (
+        rollups.annotate(month=TruncMonth('day'))
+        .values('month', 'category', 'priority', 'bucket')
+        .annotate(count=Sum('resolved_count'), seconds=Sum('total_seconds'))
+        .order_by('month', 'category', 'priority', 'bucket')
+    ):
+        month = row['month'].date() if isinstance(row['month'], datetime) else row['month']
+        group = groups.setdefault((month, row['category'], row['priority']), {})
+        group[row['bucket']] = (row['count'], row['seconds'])
+
+    report = []
+    for (month, category, priority), buckets in groups.items():
+        resolved = sum(count for count, _ in buckets.values())
+        seconds = sum(total for _, total in buckets.values())
+        report.append({
+            'month': month.strftime('%Y-%m'),
+            'category': category,
+            'priority': priority,
+            'resolved': resolved,
+            'mean_hours': round(seconds / resolved / 3600, 2),
+            **{key: _percentile_hours(buckets, fraction) for key, fraction in PERCENTILES},
+        })
+    return report
@@ -0,0 +1,546 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from society.models import Society
+from .models import Complaint, ComplaintResolutionRollup
+
+User = get_user_model()
+
+
+class ComplaintTestCase(TestCase):
+    """Shared fixtures for complaint tests"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.society = Society.objects.create(
+            name='Test Society',
+            address='123 Test St',
+            city='Test City',
+            state='Test State',
+            pincode='123456',
+            total_flats=100,
+            total_floors=10
+        )
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            role='ADMIN',
+            society=self.society
+        )
+        self.client.force_authenticate(user=self.admin_user)
+    
+    def _complaint(self, category=Complaint.Category.PLUMBING, priority=Complaint.Priority.HIGH, **kwargs):
+        kwargs.setdefault('title', 'Leaking tap')
+        kwargs.setdefault('description', 'Kitchen tap is leaking')
+        return Complaint.objects.create(
+            society=self.society,
+            category=category,
+            priority=priority,
+            created_by=self.admin_user,
+            **kwargs
+        )
+    
+    def _resolve_after(self, complaint, hours):
+        """Resolve a complaint as if it took `hours` to fix"""
+        Complaint.objects.filter(pk=complaint.pk).update(created_at=timezone.now() - timedelta(hours=hours))
+        complaint.refresh_from_db()
+        complaint.status = Complaint.Status.RESOLVED
+        complaint.resolved_at = timezone.now()
+        complaint.save()
+
+
+class ComplaintStatsTest(ComplaintTestCase):
+    """Test the complaint stats endpoint"""
+    
+    def test_stats_is_a_single_query(self):
+        """Test that all counts come from one aggregate"""
+        self._complaint()
+        self._complaint(status=Complaint.Status.IN_PROGRESS)
+        self._complaint(status=Complaint.Status.CLOSED)
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/complaints/stats/')
+        
+        self.assertEqual(response.data, {'total': 3, 'open': 1, 'in_progress': 1, 'resolved': 0, 'closed': 1})
+        self.assertEqual(len([q for q in context.captured_queries if 'complaints_complaint' in q['sql']]), 1)
+
+
+class ComplaintSLATest(ComplaintTestCase):
+    """Test the time-to-resolve rollups and SLA endpoint"""
+    
+    def test_rollups_follow_resolution_changes(self):
+        """Test that resolving, recategorising and reopening move the rollup counts"""
+        complaint = self._complaint()
+        self._resolve_after(complaint, 3)
+        rollup = ComplaintResolutionRollup.objects.get(resolved_count=1)
+        self.assertEqual((rollup.category, rollup.bucket), ('PLUMBING', 2))
+        
+        complaint.category = Complaint.Category.ELECTRICAL
+        complaint.save()
+        self.assertEqual(
+            list(ComplaintResolutionRollup.objects.filter(resolved_count=1).values_list('category', flat=True)),
+            ['ELECTRICAL']
+        )
+        
+        complaint.resolved_at = None
+        complaint.status = Complaint.Status.OPEN
+        complaint.save()
+        self.assertFalse(ComplaintResolutionRollup.objects.filter(resolved_count__gt=0).exists())
+    
+    def test_deleting_a_resolved_complaint_removes_its_rollup(self):
+        """Test that a deleted complaint no longer counts towards the SLA metrics"""
+        complaint = self._complaint()
+        self._resolve_after(complaint, 3)
+        self._resolve_after(self._complaint(), 3)
+        
+        complaint.delete()
+        rollup = ComplaintResolutionRollup.objects.get()
+        self.assertEqual(rollup.resolved_count, 1)
+        
+        self.society.delete()
+        self.assertFalse(ComplaintResolutionRollup.objects.exists())
+    
+    def test_sla_endpoint_reads_rollups_only(self):
+        """Test mean/p50/p90 per category and priority without scanning complaints"""
+        for hours in [1.5, 3, 5, 10, 30]:
+            self._resolve_after(self._complaint(), hours)
+        self._resolve_after(self._complaint(priority=Complaint.Priority.LOW), 900)
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/complaints/sla/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('complaints_complaint"' in q['sql'] for q in context.captured_queries))
+        
+        rows = {row['priority']: row for row in response.data}
+        high = rows['HIGH']
+        self.assertEqual(high['month'], timezone.localtime().strftime('%Y-%m'))
+        self.assertEqual(high['resolved'], 5)
+        self.assertAlmostEqual(high['mean_hours'], 9.9, places=1)
+        self.assertEqual(high['p50_hours'], 8)
+        self.assertEqual(high['p90_hours'], 48)
+        
+        # The open-ended last bucket reports its mean
+        self.assertAlmostEqual(rows['LOW']['p90_hours'], 900, places=0)
+    
+    def test_sla_is_admin_only(self):
+        """Test that residents can't read SLA metrics"""
+        resident = User.objects.create_user(
+            username='resident', password='testpass123', role='RESIDENT', society=self.society
+        )
+        self.client.force_authenticate(user=resident)
+        response = self.client.get('/api/complaints/sla/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ComplaintPhotoTest(ComplaintTestCase):
+    """Test EXIF stripping and thumbnails for uploaded photos"""
+    
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+    
+    def _photo(self, image_format='JPEG', orientation=6):
+        from PIL import Image
+        image = Image.new('RGB', (2000, 1000), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = orientation  # 6: rotated 90 degrees
+        exif[0x010F] = 'PhoneMaker'
+        output = io.BytesIO()
+        if image_format == 'MPO':
+            # Phone camera format: a JPEG with extra frames
+            image.save(output, format='MPO', exif=exif, save_all=True, append_images=[Image.new('RGB', (2000, 1000))])
+        else:
+            image.save(output, format=image_format, exif=exif)
+        output.name = 'leak.jpg'
+        output.seek(0)
+        return output
+    
+    def _post(self, photo):
+        return self.client.post('/api/complaints/', {
+            'title': 'Leaking tap',
+            'description': 'Kitchen tap is leaking',
+            'category': 'PLUMBING',
+            'photo1': photo,
+        }, format='multipart')
+    
+    def test_upload_is_stripped_and_thumbnailed(self):
+        """Test that an uploaded photo loses its EXIF and gets upright thumbnails"""
+        from PIL import Image
+        from django.core.files.storage import default_storage
+        
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/complaints/', {
+                    'title': 'Leaking tap',
+                    'description': 'Kitchen tap is leaking',
+                    'category': 'PLUMBING',
+                    'photo1': self._photo(),
+                }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            
+            complaint = Complaint.objects.get(pk=response.data['id'])
+            with default_storage.open(complaint.photo1.name) as original:
+                image = Image.open(original)
+                self.assertEqual(image.size, (1000, 2000))
+                self.assertEqual(dict(image.getexif()), {})
+            
+            response = self.client.get(f'/api/complaints/{complaint.id}/')
+            thumbnails = response.data['photo1_thumbnails']
+            self.assertEqual(set(thumbnails), {'small', 'large'})
+            self.assertIsNone(response.data['photo2_thumbnails'])
+            
+            name = complaint.photo1.name.rsplit('.', 1)[0]
+            self.assertTrue(thumbnails['small']['webp'].endswith(f'thumbnails/{name}_small.webp'))
+            with default_storage.open(f'thumbnails/{name}_small.webp') as thumbnail:
+                image = Image.open(thumbnail)
+                self.assertEqual((image.format, image.size), ('WEBP', (160, 320)))
+            with default_storage.open(f'thumbnails/{name}_large.jpg') as thumbnail:
+                self.assertEqual(Image.open(thumbnail).size, (640, 1280))
+
+    
+    def test_upright_mpo_upload_is_stripped(self):
+        """Test that an MPO photo without rotation loses its EXIF and gets thumbnails"""
+        from PIL import Image
+        from django.core.files.storage import default_storage
+        
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._post(self._photo('MPO', orientation=1))
+            
+            complaint = Complaint.objects.get(pk=response.data['id'])
+            with default_storage.open(complaint.photo1.name) as original:
+                image = Image.open(original)
+                self.assertEqual((image.format, image.size), ('JPEG', (2000, 1000)))
+                self.assertEqual(dict(image.getexif()), {})
+            
+            name = complaint.photo1.name.rsplit('.', 1)[0]
+            self.assertTrue(default_storage.exists(f'thumbnails/{name}_large.webp'))
+    
+    def test_original_is_overwritten_in_place(self):
+        """Test that processing never deletes the original before its replacement exists"""
+        from unittest import mock
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from society.images import process_photo
+        
+        with override_settings(MEDIA_ROOT=self.media_root):
+            name = default_storage.save('complaints/leak.jpg', ContentFile(self._photo().read()))
+            with mock.patch.object(default_storage, 'delete', side_effect=AssertionError('original deleted')):
+                process_photo(name)
+            self.assertEqual(os.listdir(os.path.join(self.media_root, 'complaints')), ['leak.jpg'])
+    
+    def test_thumbnails_are_null_until_processed(self):
+        """Test that thumbnail URLs only appear once the thumbnails exist"""
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self._post(self._photo())
+            self.assertEqual(response.data['photo1_thumbnails'], {'small': None, 'large': None})
+            
+            for callback in callbacks:
+                callback()
+            
+            # The URLs come from the model's flag, without storage lookups
+            from unittest import mock
+            from django.core.files.storage import default_storage
+            with mock.patch.object(default_storage, 'exists', side_effect=AssertionError('storage lookup')):
+                response = self.client.get(f"/api/complaints/{response.data['id']}/")
+            self.assertTrue(response.data['photo1_thumbnails']['small']['webp'].endswith('_small.webp'))
+            self.assertNotIn('photo1_thumbnails_ready', response.data)
+    
+    def test_replaced_photo_is_not_marked_by_an_earlier_upload(self):
+        """Test that processing a photo that was replaced meanwhile leaves the new photo unmarked"""
+        with override_settings(MEDIA_ROOT=self.media_root, IMAGE_PROCESSING_WORKERS=0):
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self._post(self._photo())
+            complaint = Complaint.objects.get(pk=response.data['id'])
+            Complaint.objects.filter(pk=complaint.pk).update(photo1='complaints/other.jpg')
+            
+            for callback in callbacks:
+                callback()
+            complaint.refresh_from_db()
+            self.assertFalse(complaint.photo1_thumbnails_ready)
+
+
+class ComplaintSearchTest(ComplaintTestCase):
+    """Test full-text search through the search index"""
+    
+    def test_search_ranks_and_highlights(self):
+        """Test that every term must match, title matches rank first, and matches are marked"""
+        in_description = Complaint.objects.create(
+            society=self.society, title='Kitchen problem', description='The water pipe is leaking again',
+            category=Complaint.Category.PLUMBING, created_by=self.admin_user,
+        )
+        in_title = Complaint.objects.create(
+            society=self.society, title='Leaking water pipe', description='Near the <b>lift</b>',
+            category=Complaint.Category.PLUMBING, created_by=self.admin_user,
+        )
+        Complaint.objects.create(
+            society=self.society, title='Leaking roof', description='Rain comes in',
+            category=Complaint.Category.OTHER, created_by=self.admin_user,
+        )
+        
+        response = self.client.get('/api/complaints/', {'search': 'LEAKING Pipe'})
+        self.assertEqual([row['id'] for row in response.data['results']], [in_title.id, in_description.id])
+        self.assertEqual(
+            response.data['results'][0]['search_highlights'],
+            {'title': '<mark>Leaking</mark> water <mark>pipe</mark>', 'description': None}
+        )
+        self.assertEqual(
+            response.data['results'][1]['search_highlights']['description'],
+            'The water <mark>pipe</mark> is <mark>leaking</mark> again'
+        )
+        
+        self.assertEqual(self.client.get('/api/complaints/', {'search': 'pipe elevator'}).data['count'], 0)
+        self.assertIsNone(self.client.get('/api/complaints/').data['results'][0]['search_highlights'])
+    
+    def test_index_follows_edits_and_deletes(self):
+        """Test that saving replaces an object's terms and deleting removes them"""
+        from search.models import SearchPosting
+        complaint = self._complaint()
+        complaint.title = 'Broken doorbell'
+        complaint.description = 'It does not ring'
+        complaint.save()
+        
+        self.assertEqual(self.client.get('/api/complaints/', {'search': 'tap'}).data['count'], 0)
+        self.assertEqual(self.client.get('/api/complaints/', {'search': 'doorbell'}).data['count'], 1)
+        
+        complaint.delete()
+        self.assertFalse(SearchPosting.objects.exists())
+    
+    def test_saves_without_text_changes_leave_the_index_alone(self):
+        """Test that a status-only save issues no SearchPosting writes"""
+        complaint = self._complaint()
+        
+        with CaptureQueriesContext(connection) as context:
+            complaint.status = Complaint.Status.IN_PROGRESS
+            complaint.save()
+            complaint.save(update_fields=['status', 'updated_at'])
+        self.assertFalse([q for q in context.captured_queries if 'search_searchposting' in q['sql']])
+        
+        complaint.title = 'Broken doorbell'
+        complaint.save(update_fields=['title'])
+        self.assertEqual(self.client.get('/api/complaints/', {'search': 'doorbell'}).data['count'], 1)
+
+
+class ComplaintDuplicateTest(ComplaintTestCase):
+    """Test near-duplicate detection and cluster transitions"""
+    
+    def _post(self, title, description, category='LIFT'):
+        response = self.client.post('/api/complaints/', {
+            'title': title, 'description': description, 'category': category,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+    
+    def test_new_complaint_joins_cluster(self):
+        """Test that near-identical complaints in a category are attached to the first one"""
+        first = self._post('Lift not working', 'The lift in B wing is stuck on the 4th floor since morning')
+        second = self._post('Lift not working!!', 'B wing lift stuck at 4th floor since morning, please fix')
+        third = self._post('lift not working', 'The lift in B wing is stuck on the 4th floor since morning.')
+        other_category = self._post(
+            'Lift not working', 'The lift in B wing is stuck on the 4th floor since morning', category='ELECTRICAL'
+        )
+        unrelated = self._post('Lift light flickering', 'The light inside the A wing lift keeps flickering at night')
+        
+        self.assertIsNone(first['duplicate_of'])
+        self.assertEqual(second['duplicate_of'], first['id'])
+        self.assertEqual(third['duplicate_of'], first['id'])
+        self.assertIsNone(other_category['duplicate_of'])
+        self.assertIsNone(unrelated['duplicate_of'])
+        
+        detail = self.client.get(f"/api/complaints/{first['id']}/").data
+        self.assertEqual(sorted(detail['duplicates']), sorted([second['id'], third['id']]))
+        self.assertNotIn('signature', detail)
+        
+        cluster = self.client.get('/api/complaints/', {'duplicate_of': first['id']}).data
+        self.assertEqual(cluster['count'], 2)
+    
+    def test_finished_cluster_is_not_joined(self):
+        """Test that an open duplicate of a resolved primary doesn't pull new complaints into its cluster"""
+        primary = self._post('Lift not working', 'The lift in B wing is stuck on the 4th floor since morning')
+        duplicate = self._post('Lift not working!!', 'The lift in B wing is stuck on the 4th floor since morning!')
+        self.assertEqual(duplicate['duplicate_of'], primary['id'])
+        Complaint.objects.filter(pk=primary['id']).update(status=Complaint.Status.RESOLVED)
+        
+        new = self._post('lift not working', 'The lift in B wing is stuck on the 4th floor since morning.')
+        self.assertIsNone(new['duplicate_of'])
+    
+    def test_signature_is_only_recomputed_for_text_changes(self):
+        """Test that saves which don't change or persist the text skip the MinHash"""
+        from unittest import mock
+        complaint = self._complaint()
+        signature = complaint.signature
+        
+        with mock.patch('complaints.duplicates.minhash_signature') as minhash:
+            complaint.status = Complaint.Status.IN_PROGRESS
+            complaint.save()
+            complaint.title = 'Leaking kitchen tap'
+            complaint.save(update_fields=['status', 'updated_at'])
+        minhash.assert_not_called()
+        
+        complaint.save(update_fields=['title'])
+        complaint.refresh_from_db()
+        self.assertNotEqual(complaint.signature, signature)
+    
+    def test_attach_moves_whole_cluster(self):
+        """Test that attaching a primary complaint brings its duplicates along"""
+        first = self._complaint(title='Gate stuck', description='Main gate motor is jammed')
+        second = self._complaint(title='Water tank overflow', description='Overflowing since night')
+        third = self._complaint(title='Another', description='Something else', duplicate_of=second)
+        
+        response = self.client.post(f'/api/complaints/{second.id}/attach/', {'duplicate_of': third.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.post(f'/api/complaints/{second.id}/attach/', {'duplicate_of': first.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(Complaint.objects.filter(duplicate_of=first).values_list('id', flat=True)),
+            {second.id, third.id}
+        )
+    
+    def test_resolve_cluster_in_one_transaction(self):
+        """Test that resolving a cluster resolves every open member and updates the SLA rollups"""
+        primary = self._complaint()
+        duplicates = [self._complaint(duplicate_of=primary) for _ in range(3)]
+        self._complaint(duplicate_of=primary, status=Complaint.Status.CLOSED)
+        self._complaint()
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                f'/api/complaints/{duplicates[0].id}/resolve_cluster/', {'resolution_notes': 'Washer replaced'}
+            )
+        self.assertEqual(response.data, {'cluster': primary.id, 'updated': 4})
+        updates = [q for q in context.captured_queries if q['sql'].startswith('UPDATE "complaints_complaint"')]
+        self.assertEqual(len(updates), 1)
+        
+        self.assertEqual(Complaint.objects.filter(status=Complaint.Status.RESOLVED).count(), 4)
+        self.assertEqual(
+            ComplaintResolutionRollup.objects.get(resolved_count__gt=0).resolved_count, 4
+        )
+        self.assertEqual(primary.updates.get().message, f'Complaint resolved with cluster #{primary.id}. Washer replaced')
+        
+        response = self.client.post(f'/api/complaints/{primary.id}/close_cluster/')
+        self.assertEqual(response.data['updated'], 4)
+
+
+class ComplaintTimelineTest(ComplaintTestCase):
+    """Test the paginated update timeline and compact action responses"""
+    
+    def test_updates_are_cursor_paginated(self):
+        """Test that the timeline is served newest first, a page at a time"""
+        from .models import ComplaintUpdate
+        complaint = self._complaint()
+        ComplaintUpdate.objects.bulk_create([
+            ComplaintUpdate(complaint=complaint, message=f'Update {index}', updated_by=self.admin_user)
+            for index in range(25)
+        ])
+        
+        detail = self.client.get(f'/api/complaints/{complaint.id}/').data
+        self.assertNotIn('updates', detail)
+        
+        with CaptureQueriesContext(connection) as context:
+            first = self.client.get(f'/api/complaints/{complaint.id}/updates/').data
+        self.assertEqual(len(first['results']), 20)
+        self.assertEqual(first['results'][0]['updated_by_name'], 'Admin User')
+        self.assertLessEqual(len([q for q in context.captured_queries if 'users_user' in q['sql']]), 2)
+        
+        second = self.client.get(first['next']).data
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+    
+    def test_actions_return_only_changes(self):
+        """Test that actions return the new update and the changed fields"""
+        complaint = self._complaint()
+        
+        response = self.client.post(f'/api/complaints/{complaint.id}/add_update/', {'message': 'Plumber called'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['update']['message'], 'Plumber called')
+        self.assertEqual(response.data['complaint'], {'id': complaint.id})
+        
+        response = self.client.post(f'/api/complaints/{complaint.id}/resolve/', {'resolution_notes': 'Fixed'})
+        self.assertEqual(
+            set(response.data['complaint']), {'id', 'status', 'resolution_notes', 'resolved_at', 'updated_at'}
+        )
+        self.assertEqual(response.data['complaint']['status'], 'RESOLVED')
+        self.assertEqual(response.data['update']['message'], 'Complaint resolved. Fixed')
+        
+        response = self.client.post(f'/api/complaints/{complaint.id}/close/')
+        self.assertIsNone(response.data['update'])
+        self.assertEqual(response.data['complaint']['status'], 'CLOSED')
+        
+        listed = self.client.get('/api/complaints/').data['results'][0]
+        self.assertEqual(listed['updates_count'], 2)
+
+
+class ComplaintBulkActionTest(ComplaintTestCase):
+    """Test the bulk workflow endpoint"""
+    
+    def test_bulk_resolve(self):
+        """Test one UPDATE and one insert for many complaints, with a result per ID"""
+        other_society = Society.objects.create(
+            name='Other Society', address='1 Other St', city='Test City', state='Test State',
+            pincode='654321', total_flats=10, total_floors=2
+        )
+        foreign = Complaint.objects.create(
+            society=other_society, title='Theirs', description='Not ours',
+            category=Complaint.Category.OTHER, created_by=self.admin_user,
+        )
+        open_ones = [self._complaint() for _ in range(3)]
+        closed = self._complaint(status=Complaint.Status.CLOSED)
+        ids = [complaint.id for complaint in open_ones] + [closed.id, foreign.id, 999999]
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/complaints/bulk/', {
+                'ids': ids, 'action': 'resolve', 'resolution_notes': 'Fixed in bulk',
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(
+            [row['result'] for row in response.data['results']],
+            ['updated'] * 3 + ['unchanged', 'not_found', 'not_found']
+        )
+        sql = [q['sql'] for q in context.captured_queries]
+        self.assertEqual(len([q for q in sql if q.startswith('UPDATE "complaints_complaint"')]), 1)
+        self.assertEqual(len([q for q in sql if q.startswith('INSERT INTO "complaints_complaintupdate"')]), 1)
+        
+        self.assertEqual(Complaint.objects.filter(status=Complaint.Status.RESOLVED).count(), 3)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, Complaint.Status.OPEN)
+        self.assertEqual(ComplaintResolutionRollup.objects.get().resolved_count, 3)
+    
+    def test_bulk_assign(self):
+        """Test that assigning needs a user and skips complaints already assigned to them"""
+        complaints = [self._complaint() for _ in range(2)]
+        ids = [complaint.id for complaint in complaints]
+        
+        response = self.client.post('/api/complaints/bulk/', {'ids': ids, 'action': 'assign'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        payload = {'ids': ids, 'action': 'assign', 'assigned_to': self.admin_user.id}
+        self.assertEqual(self.client.post('/api/complaints/bulk/', payload, format='json').data['updated'], 2)
+        self.assertEqual(self.client.post('/api/complaints/bulk/', payload, format='json').data['updated'], 0)
+        self.assertEqual(complaints[0].updates.get().message, 'Complaint assigned to Admin User')
+        
+        resident = User.objects.create_user(
+            username='resident', password='testpass123', role='RESIDENT', society=self.society
+        )
+        self.client.force_authenticate(user=resident)
+        response = self.client.post('/api/complaints/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
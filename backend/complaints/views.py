@@ -1,23 +1,48 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Count, Q
 from django.utils import timezone
+from datetime import datetime, timedelta
+from search.filters import SearchIndexFilter
 from users.permissions import ComplaintPermissions
 from .models import Complaint, ComplaintUpdate
+from . import duplicates
+from .workflow import UPDATED, bulk_transition
+from .sla import sla_report
 from .serializers import (
-    ComplaintSerializer, ComplaintDetailSerializer, ComplaintUpdateSerializer
+    ComplaintSerializer, ComplaintDetailSerializer, ComplaintChangesSerializer, ComplaintUpdateSerializer,
+    ComplaintBulkActionSerializer
 )
 
 
+class ComplaintUpdatePagination(CursorPagination):
+    """Newest-first cursor pagination for a complaint's update timeline"""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    
+    def get_ordering(self, request, queryset, view):
+        # The complaint list's ?ordering= doesn't apply to the timeline
+        return self.ordering
+
+
 class ComplaintViewSet(viewsets.ModelViewSet):
     """ViewSet for Complaint CRUD operations"""
     queryset = Complaint.objects.all()
     serializer_class = ComplaintSerializer
     permission_classes = [ComplaintPermissions]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'priority', 'status', 'flat']
-    search_fields = ['title', 'description']
+    filter_backends = [DjangoFilterBackend, SearchIndexFilter, filters.OrderingFilter]
+    filterset_fields = {
+        'category': ['exact'],
+        'priority': ['exact'],
+        'status': ['exact'],
+        'flat': ['exact'],
+        'duplicate_of': ['exact', 'isnull'],
+    }
     ordering_fields = ['created_at', 'priority', 'status']
     
     def get_serializer_class(self):
@@ -36,7 +61,29 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         if self.request.user.role == 'RESIDENT':
             queryset = queryset.filter(created_by=self.request.user)
         
-        return queryset.select_related('society', 'flat', 'created_by', 'assigned_to')
+        queryset = queryset.select_related('society', 'flat', 'created_by', 'assigned_to')
+        if self.action == 'list':
+            queryset = queryset.annotate(num_updates=Count('updates'))
+        return queryset
+    
+    def _changes_response(self, complaint, fields, update=None, status_code=status.HTTP_200_OK):
+        """Respond to an action with the update it added and the complaint fields it changed"""
+        return Response({
+            'update': ComplaintUpdateSerializer(update).data if update else None,
+            'complaint': ComplaintChangesSerializer(
+                complaint, fields=fields, context=self.get_serializer_context()
+            ).data,
+        }, status=status_code)
+    
+    @action(detail=True, methods=['get'])
+    def updates(self, request, pk=None):
+        """A complaint's update timeline, newest first (cursor-paginated)"""
+        complaint = self.get_object()
+        queryset = ComplaintUpdate.objects.filter(complaint=complaint).select_related('updated_by')
+        
+        paginator = ComplaintUpdatePagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(ComplaintUpdateSerializer(page, many=True).data)
     
     @action(detail=True, methods=['post'])
     def add_update(self, request, pk=None):
@@ -44,9 +91,9 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         complaint = self.get_object()
         serializer = ComplaintUpdateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(complaint=complaint, updated_by=request.user)
+        update = serializer.save(complaint=complaint, updated_by=request.user)
         
-        return Response(ComplaintDetailSerializer(complaint).data)
+        return self._changes_response(complaint, [], update, status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
@@ -70,13 +117,15 @@ class ComplaintViewSet(viewsets.ModelViewSet):
             complaint.save()
             
             # Create update
-            ComplaintUpdate.objects.create(
+            update = ComplaintUpdate.objects.create(
                 complaint=complaint,
                 message=f"Complaint assigned to {user.get_full_name()}",
                 updated_by=request.user
             )
             
-            return Response(ComplaintDetailSerializer(complaint).data)
+            return self._changes_response(
+                complaint, ['status', 'assigned_to', 'assigned_to_name', 'updated_at'], update
+            )
         except User.DoesNotExist:
             return Response(
                 {'error': 'User not found'},
@@ -95,13 +144,15 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         complaint.save()
         
         # Create update
-        ComplaintUpdate.objects.create(
+        update = ComplaintUpdate.objects.create(
             complaint=complaint,
             message=f"Complaint resolved. {resolution_notes}",
             updated_by=request.user
         )
         
-        return Response(ComplaintDetailSerializer(complaint).data)
+        return self._changes_response(
+            complaint, ['status', 'resolution_notes', 'resolved_at', 'updated_at'], update
+        )
     
     @action(detail=True, methods=['post'])
     def close(self, request, pk=None):
@@ -110,20 +161,153 @@ class ComplaintViewSet(viewsets.ModelViewSet):
         complaint.status = Complaint.Status.CLOSED
         complaint.save()
         
-        return Response(ComplaintDetailSerializer(complaint).data)
+        return self._changes_response(complaint, ['status', 'updated_at'])
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Assign, resolve or close many complaints at once.
+        
+        Body: {"ids": [...], "action": "assign" | "resolve" | "close",
+        "assigned_to": user id (assign), "resolution_notes": "..." (resolve)}.
+        Returns a result per ID: updated, unchanged (already in that state)
+        or not_found (not a complaint you can manage).
+        """
+        serializer = ComplaintBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        assigned_to = None
+        if data['action'] == 'assign':
+            from django.contrib.auth import get_user_model
+            User = get_user_model()
+            
+            users = User.objects.filter(id=data['assigned_to'])
+            if request.user.society_id:
+                users = users.filter(society_id=request.user.society_id)
+            assigned_to = users.first()
+            if assigned_to is None:
+                return Response(
+                    {'error': 'User not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        # Permissions are checked set-wise: only IDs in the user's queryset are touched
+        ids = list(dict.fromkeys(data['ids']))
+        allowed = list(self.get_queryset().filter(pk__in=ids).values_list('id', flat=True))
+        results = bulk_transition(
+            allowed, data['action'], request.user,
+            assigned_to=assigned_to, resolution_notes=data['resolution_notes'],
+        )
+        
+        return Response({
+            'action': data['action'],
+            'updated': sum(1 for result in results.values() if result == UPDATED),
+            'results': [{'id': pk, 'result': results.get(pk, 'not_found')} for pk in ids],
+        })
+    
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Recent open complaints that look like this one, best match first"""
+        complaint = self.get_object()
+        matches = duplicates.similar_complaints(complaint)
+        titles = dict(Complaint.objects.filter(pk__in=[match[1] for match in matches]).values_list('id', 'title'))
+        
+        return Response([
+            {'id': complaint_id, 'title': titles.get(complaint_id), 'duplicate_of': duplicate_of_id, 'similarity': score}
+            for score, complaint_id, duplicate_of_id in matches
+        ])
+    
+    @action(detail=True, methods=['post'])
+    def attach(self, request, pk=None):
+        """Mark this complaint as a duplicate in another complaint's cluster"""
+        complaint = self.get_object()
+        try:
+            primary = self.get_queryset().get(pk=request.data.get('duplicate_of'))
+        except (Complaint.DoesNotExist, ValueError, TypeError):
+            return Response(
+                {'error': 'duplicate_of must be a complaint of this society'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if complaint.pk in (primary.pk, primary.duplicate_of_id):
+            return Response(
+                {'error': 'A complaint cannot be a duplicate of itself'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        duplicates.attach(complaint, primary)
+        return self._changes_response(complaint, ['duplicate_of', 'updated_at'])
+    
+    @action(detail=True, methods=['post'])
+    def detach(self, request, pk=None):
+        """Take this complaint out of its cluster"""
+        complaint = self.get_object()
+        complaint.duplicate_of = None
+        complaint.save(update_fields=['duplicate_of', 'updated_at'])
+        
+        return self._changes_response(complaint, ['duplicate_of', 'updated_at'])
+    
+    @action(detail=True, methods=['post'])
+    def resolve_cluster(self, request, pk=None):
+        """Resolve this complaint's whole cluster in one transaction"""
+        complaint = self.get_object()
+        primary = complaint.duplicate_of or complaint
+        updated = duplicates.transition_cluster(
+            primary, 'resolve', request.user, request.data.get('resolution_notes', '')
+        )
+        
+        return Response({'cluster': primary.pk, 'updated': updated})
+    
+    @action(detail=True, methods=['post'])
+    def close_cluster(self, request, pk=None):
+        """Close this complaint's whole cluster in one transaction"""
+        complaint = self.get_object()
+        primary = complaint.duplicate_of or complaint
+        updated = duplicates.transition_cluster(primary, 'close', request.user)
+        
+        return Response({'cluster': primary.pk, 'updated': updated})
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get complaint statistics"""
-        queryset = self.get_queryset()
-        
-        stats = {
-            'total': queryset.count(),
-            'open': queryset.filter(status=Complaint.Status.OPEN).count(),
-            'in_progress': queryset.filter(status=Complaint.Status.IN_PROGRESS).count(),
-            'resolved': queryset.filter(status=Complaint.Status.RESOLVED).count(),
-            'closed': queryset.filter(status=Complaint.Status.CLOSED).count(),
-        }
+        stats = self.get_queryset().aggregate(
+            total=Count('id'),
+            open=Count('id', filter=Q(status=Complaint.Status.OPEN)),
+            in_progress=Count('id', filter=Q(status=Complaint.Status.IN_PROGRESS)),
+            resolved=Count('id', filter=Q(status=Complaint.Status.RESOLVED)),
+            closed=Count('id', filter=Q(status=Complaint.Status.CLOSED)),
+        )
         
         return Response(stats)
-
+    
+    @action(detail=False, methods=['get'])
+    def sla(self, request):
+        """
+        Time-to-resolve per month, category and priority (mean/p50/p90 hours).
+        
+        Pass ?from=YYYY-MM and/or ?to=YYYY-MM to pick the months; defaults to
+        the last 12 months.
+        """
+        society = getattr(request.user, 'society', None)
+        if not society:
+            return Response(
+                {'error': 'User is not associated with a society'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start = request.query_params.get('from')
+            end = request.query_params.get('to')
+            start = datetime.strptime(start, '%Y-%m').date() if start else None
+            end = datetime.strptime(end, '%Y-%m').date() if end else None
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be in YYYY-MM format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if start is None and end is None:
+            start = (timezone.now().date().replace(day=1) - timedelta(days=335)).replace(day=1)
+        
+        return Response(sla_report(society.id, start, end))
@@ -0,0 +1,88 @@
+"""
+Set-based complaint workflow transitions.
+
+``bulk_transition`` applies assign/resolve/close to many complaints the way
+the single-complaint actions do, but with one UPDATE for the complaints and
+one bulk_create for their ComplaintUpdate rows. The SLA rollups, which
+Complaint.save maintains for single saves, are moved explicitly.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Complaint, ComplaintUpdate
+from .sla import ROLLUP_FIELDS, move_rollups
+
+
+# action -> (new status, statuses the action leaves alone)
+TRANSITIONS = {
+    'assign': (
+        Complaint.Status.IN_PROGRESS,
+        [Complaint.Status.RESOLVED, Complaint.Status.CLOSED, Complaint.Status.REJECTED],
+    ),
+    'resolve': (
+        Complaint.Status.RESOLVED,
+        [Complaint.Status.RESOLVED, Complaint.Status.CLOSED, Complaint.Status.REJECTED],
+    ),
+    'close': (
+        Complaint.Status.CLOSED,
+        [Complaint.Status.CLOSED, Complaint.Status.REJECTED],
+    ),
+}
+
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+
+
+def default_message(action, assigned_to=None, resolution_notes=''):
+    """The ComplaintUpdate message the single-complaint actions write"""
+    if action == 'assign':
+        return f"Complaint assigned to {assigned_to.get_full_name()}"
+    if action == 'resolve':
+        return f"Complaint resolved. {resolution_notes}"
+    return "Complaint closed"
+
+
+@transaction.atomic
+def bulk_transition(complaint_ids, action, user, assigned_to=None, resolution_notes='', message=None):
+    """
+    Apply a workflow action ('assign', 'resolve' or 'close') to complaints.
+
+    Complaints whose status the action leaves alone (e.g. resolving a closed
+    complaint, or assigning one to the user it is already assigned to) are
+    reported as unchanged. Returns {complaint id: 'updated' | 'unchanged'}
+    for the complaints that exist.
+    """
+    new_status, skipped = TRANSITIONS[action]
+    rows = list(
+        Complaint.objects.select_for_update()
+        .filter(pk__in=complaint_ids)
+        .values('id', 'status', 'assigned_to_id', *ROLLUP_FIELDS)
+    )
+
+    def unchanged(row):
+        if row['status'] in skipped:
+            return True
+        return action == 'assign' and row['status'] == new_status and row['assigned_to_id'] == assigned_to.pk
+
+    results = {row['id']: UNCHANGED if unchanged(row) else UPDATED for row in rows}
+    changed = [row for row in rows if results[row['id']] == UPDATED]
+    if not changed:
+        return results
+
+    now = timezone.now()
+    changes = {'status': new_status, 'updated_at': now}
+    if action == 'assign':
+        changes['assigned_to_id'] = assigned_to.pk
+    elif action == 'resolve':
+        changes.update(resolution_notes=resolution_notes, resolved_at=now)
+    Complaint.objects.filter(pk__in=[row['id'] for row in changed]).update(**changes)
+
+    # The set-based UPDATE bypasses Complaint.save
+    move_rollups([(row, {**row, **changes}) for row in changed])
+
+    message = message or default_message(action, assigned_to, resolution_notes)
+    ComplaintUpdate.objects.bulk_create([
+        ComplaintUpdate(complaint_id=row['id'], message=message, updated_by=user)
+        for row in changed
+    ])
+    return results
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'events',
     'alerts',
     'contact',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -119,6 +120,39 @@ else:
         }
     }
 
+# Cache
+# Cached read models (dashboard snapshots, billing versions and reports) must be
+# shared by every worker process: production uses Redis when REDIS_URL is set,
+# the database cache table otherwise (`python manage.py createcachetable`).
+# The database and local memory caches cull a third of their entries once they
+# hold MAX_ENTRIES (300 by default), so the limit is raised well above the
+# number of keys the read models keep per society.
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif PRODUCTION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+else:
+    # The development server runs a single process
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+        }
+    }
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -152,6 +186,22 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Processes rendering receipt/statement PDFs in the background (0 = render inline)
+DOCUMENT_RENDER_WORKERS = int(os.getenv('DOCUMENT_RENDER_WORKERS', '2'))
+
+# Threads stripping EXIF and generating thumbnails for uploaded photos (0 = inline)
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', '2'))
+
+# Pub/sub for live event streams (see society/broker.py): Redis when REDIS_URL
+# is set. The in-process broker only reaches streams served by the same
+# process, so streams refuse to use it unless LIVE_EVENTS_SINGLE_PROCESS
+# (the default in development)
+LIVE_EVENTS_BROKER = os.getenv(
+    'LIVE_EVENTS_BROKER',
+    'society.broker.RedisBroker' if REDIS_URL else 'society.broker.InProcessBroker'
+)
+LIVE_EVENTS_SINGLE_PROCESS = os.getenv('LIVE_EVENTS_SINGLE_PROCESS', str(DEBUG)) == 'True'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
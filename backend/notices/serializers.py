@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from .models import Notice
 from users.serializers import UserSerializer
+from search.serializers import SearchHighlightsField
 
 
 class NoticeSerializer(serializers.ModelSerializer):
     """Serializer for Notice model"""
     created_by_name = serializers.SerializerMethodField()
+    search_highlights = SearchHighlightsField(['title', 'content'])
     
     class Meta:
         model = Notice
@@ -0,0 +1,6 @@
+from search.index import register
+from .models import Notice
+
+
+# Keep notices in the full-text search index
+register(Notice, {'title': 3, 'content': 1})
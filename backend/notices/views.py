@@ -1,5 +1,6 @@
 from rest_framework import viewsets, filters
 from django_filters.rest_framework import DjangoFilterBackend
+from search.filters import SearchIndexFilter
 from users.permissions import NoticePermissions
 from .models import Notice
 from .serializers import NoticeSerializer, NoticeDetailSerializer
@@ -10,9 +11,8 @@ class NoticeViewSet(viewsets.ModelViewSet):
     queryset = Notice.objects.all()
     serializer_class = NoticeSerializer
     permission_classes = [NoticePermissions]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchIndexFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'priority', 'is_active']
-    search_fields = ['title', 'content']
     ordering_fields = ['created_at', 'priority']
     
     def get_serializer_class(self):
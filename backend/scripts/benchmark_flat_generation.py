@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Benchmark bulk flat generation for a large tower.
+
+Creates a temporary society and a 125-floor x 80-unit block (10,000 flats
+plus their default bills) through BlockWithFlatsSerializer, reports the
+elapsed time and query count, then rolls everything back.
+
+Usage:
+    python scripts/benchmark_flat_generation.py [floors] [units_per_floor]
+"""
+import os
+import sys
+import time
+import django
+
+# Add parent directory to path to allow importing config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from society.models import Society, Flat
+from society.serializers import BlockWithFlatsSerializer
+from billing.models import Bill
+
+
+class Rollback(Exception):
+    pass
+
+
+def benchmark(floors=125, units_per_floor=80):
+    units = floors * units_per_floor
+    print(f"Generating {floors} floors x {units_per_floor} units = {units} flats...")
+
+    try:
+        with transaction.atomic():
+            society = Society.objects.create(
+                name='Benchmark Society',
+                address='Benchmark',
+                city='Benchmark',
+                state='Benchmark',
+                pincode='000000',
+                total_flats=units,
+                total_floors=floors
+            )
+            serializer = BlockWithFlatsSerializer(data={
+                'society': society.id,
+                'name': 'T',
+                'floors': floors,
+                'units_per_floor': units_per_floor,
+            })
+            serializer.is_valid(raise_exception=True)
+
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                block = serializer.save()
+                elapsed = time.perf_counter() - start
+
+            flats = Flat.objects.filter(block=block).count()
+            bills = Bill.objects.filter(flat__block=block).count()
+            raise Rollback()
+    except Rollback:
+        pass
+
+    print(f"Created {flats} flats and {bills} bills in {elapsed:.2f}s using {len(queries)} queries")
+    print("All benchmark data was rolled back.")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    benchmark(*args)
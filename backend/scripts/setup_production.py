@@ -38,7 +38,7 @@ def setup_production():
     print(f"\n✅ Logs directory: {logs_dir}")
     
     # Run migrations
-    print("\n[1/3] Running database migrations...")
+    print("\n[1/4] Running database migrations...")
     try:
         call_command('migrate', verbosity=1)
         print("  ✅ Migrations completed")
@@ -46,8 +46,17 @@ def setup_production():
         print(f"  ❌ Migration error: {e}")
         return
     
+    # Create the cache table (a no-op when REDIS_URL is set)
+    print("\n[2/4] Creating cache table...")
+    try:
+        call_command('createcachetable', verbosity=1)
+        print("  ✅ Cache table ready")
+    except Exception as e:
+        print(f"  ❌ Cache table error: {e}")
+        return
+    
     # Collect static files
-    print("\n[2/3] Collecting static files...")
+    print("\n[3/4] Collecting static files...")
     try:
         call_command('collectstatic', '--noinput', verbosity=1)
         print("  ✅ Static files collected")
@@ -56,7 +65,7 @@ def setup_production():
         return
     
     # Check for superuser
-    print("\n[3/3] Checking for admin user...")
+    print("\n[4/4] Checking for admin user...")
     from django.contrib.auth import get_user_model
     User = get_user_model()
     if User.objects.filter(username='admin').exists():
@@ -70,7 +79,7 @@ def setup_production():
     print("=" * 60)
     print("\nNext steps:")
     print("1. Verify .env file has all required variables")
-    print("2. Start server with: gunicorn config.wsgi:application --bind 127.0.0.1:8000")
+    print("2. Start server with: gunicorn config.asgi:application -k uvicorn.workers.UvicornWorker --bind 127.0.0.1:8000")
     print("3. Or use systemd service (see PRODUCTION_DEPLOYMENT.md)")
     print("=" * 60)
 
@@ -0,0 +1,32 @@
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .index import search
+
+
+class SearchIndexFilter(BaseFilterBackend):
+    """
+    Full-text search through the search index, for models registered with
+    ``search.index.register``. Uses the same ``?search=`` parameter as DRF's
+    SearchFilter; results are ranked best match first unless ``?ordering=``
+    is given.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    
+    def get_search_query(self, request):
+        return request.query_params.get(self.search_param, '')
+    
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if not query.strip():
+            return queryset
+        return search(queryset, query, society_id=getattr(request.user, 'society_id', None))
+    
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Full-text search terms; every term must match',
+            'schema': {'type': 'string'},
+        }]
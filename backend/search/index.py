@@ -0,0 +1,207 @@
+"""
+Inverted full-text index for complaints and notices.
+
+Text fields of registered models are split into normalized terms and stored
+as SearchPosting rows (one per object and term, weighted by the field the
+term came from). A search looks the query's terms up in the
+(content_type, society, term) index, so its cost depends on how many
+objects contain the terms, not on how many rows the table has; a
+``LIKE '%word%'`` scan reads every row.
+
+The same tables and queries work on MySQL, PostgreSQL and SQLite. Results
+are ranked with TF-IDF: each term's weight in the object, times how rare
+the term is among the objects of the society.
+"""
+import math
+import re
+import unicodedata
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import SearchPosting
+
+
+MAX_TERM_LENGTH = 64
+
+# Queries with more terms than this only use the first ones
+MAX_QUERY_TERMS = 8
+
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or that the '
+    'this to was were will with'.split()
+)
+
+TOKEN_RE = re.compile(r'\w+')
+
+# model -> {'fields': {field: weight}, 'society_field': attname}
+REGISTRY = {}
+
+
+def normalize(text):
+    """Lowercase text and strip accents, so 'Café' matches 'cafe'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text):
+    """Index terms in text, in order (repeats included)"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(normalize(text))
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def query_terms(query):
+    """Distinct terms of a search query, in order"""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def term_weights(values, fields):
+    """{term: weight} for an object's field values and the field weights"""
+    weights = {}
+    for field, field_weight in fields.items():
+        for term in tokenize(values.get(field)):
+            weights[term] = weights.get(term, 0) + field_weight
+    return weights
+
+
+def postings_for(instance, content_type=None):
+    """Unsaved SearchPosting rows for an instance of a registered model"""
+    config = REGISTRY[type(instance)]
+    content_type = content_type or ContentType.objects.get_for_model(instance)
+    values = {field: getattr(instance, field) for field in config['fields']}
+    society_id = getattr(instance, config['society_field'])
+    return [
+        SearchPosting(
+            content_type=content_type,
+            object_id=instance.pk,
+            society_id=society_id,
+            term=term,
+            weight=weight,
+        )
+        for term, weight in term_weights(values, config['fields']).items()
+    ]
+
+
+@transaction.atomic
+def reindex(instance):
+    """Replace an object's postings"""
+    content_type = ContentType.objects.get_for_model(instance)
+    SearchPosting.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+    SearchPosting.objects.bulk_create(postings_for(instance, content_type))
+
+
+def unindex(instance):
+    """Remove an object's postings"""
+    SearchPosting.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+    ).delete()
+
+
+def rebuild(model, batch_size=1000):
+    """Rebuild the index of every row of a registered model; returns the row count"""
+    content_type = ContentType.objects.get_for_model(model)
+    config = REGISTRY[model]
+    SearchPosting.objects.filter(content_type=content_type).delete()
+
+    count = 0
+    postings = []
+    for instance in model.objects.only(config['society_field'], *config['fields']).iterator(chunk_size=batch_size):
+        postings.extend(postings_for(instance, content_type))
+        count += 1
+        if len(postings) >= batch_size:
+            SearchPosting.objects.bulk_create(postings)
+            postings = []
+    SearchPosting.objects.bulk_create(postings)
+    return count
+
+
+def register(model, fields, society_field='society_id'):
+    """
+    Index `fields` ({field name: weight}) of `model` and keep the index up to
+    date when instances are saved or deleted. Saves that don't store a
+    change to an indexed field leave the index alone.
+    """
+    REGISTRY[model] = {'fields': fields, 'society_field': society_field}
+    indexed = [*fields, society_field]
+    indexed_names = {model._meta.get_field(field).name for field in indexed}
+
+    def find_changes(sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw or instance._state.adding:
+            instance._search_reindex = not raw
+        elif update_fields is not None and not indexed_names & set(update_fields):
+            instance._search_reindex = False
+        else:
+            previous = model.objects.filter(pk=instance.pk).values(*indexed).first()
+            instance._search_reindex = previous is None or any(
+                previous[field] != getattr(instance, field) for field in indexed
+            )
+
+    def update_index(sender, instance, raw=False, **kwargs):
+        if instance.__dict__.pop('_search_reindex', not raw):
+            reindex(instance)
+
+    def remove_from_index(sender, instance, **kwargs):
+        unindex(instance)
+
+    uid = f'search_index_{model._meta.label_lower}'
+    pre_save.connect(find_changes, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(update_index, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(remove_from_index, sender=model, weak=False, dispatch_uid=uid)
+
+
+def search(queryset, query, society_id=None):
+    """
+    Filter a queryset of a registered model to the objects containing every
+    term of `query`, annotated with ``search_rank`` and ordered best first.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset
+
+    postings = SearchPosting.objects.filter(
+        content_type=ContentType.objects.get_for_model(queryset.model),
+        term__in=terms,
+    )
+    if society_id:
+        postings = postings.filter(society_id=society_id)
+
+    # How many objects contain each term, from the index alone
+    frequencies = dict(postings.values('term').annotate(objects=Count('id')).values_list('term', 'objects'))
+    if len(frequencies) < len(terms):
+        return queryset.none()
+    # IDF is 1 + log(df of the most common query term / df), which orders
+    # terms like log(N / df) without a count of every object in the society
+    most_common = max(frequencies.values())
+    score = Sum(
+        Case(
+            *[
+                When(term=term, then=F('weight') * Value(1 + math.log(most_common / frequencies[term])))
+                for term in terms
+            ],
+            output_field=FloatField(),
+        )
+    )
+
+    matching = (
+        postings.values('object_id')
+        .annotate(matched=Count('id'))
+        .filter(matched=len(terms))
+        .values('object_id')
+    )
+    rank = (
+        postings.filter(object_id=OuterRef('pk'))
+        .values('object_id')
+        .annotate(score=score)
+        .values('score')
+    )
+    return (
+        queryset.filter(pk__in=matching)
+        .annotate(search_rank=Subquery(rank, output_field=FloatField()))
+        .order_by('-search_rank', '-pk')
+    )
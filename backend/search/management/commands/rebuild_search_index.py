@@ -0,0 +1,20 @@
+"""
+Django management command to rebuild the full-text search index, e.g. after
+changing the tokenizer or a model's indexed fields:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from search.index import REGISTRY, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of complaints and notices'
+
+    def handle(self, *args, **options):
+        for model in REGISTRY:
+            count = rebuild(model)
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {model._meta.verbose_name_plural}: {count} indexed'
+            ))
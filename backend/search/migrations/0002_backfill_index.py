@@ -0,0 +1,76 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# Field weights as registered in complaints/signals.py and notices/signals.py
+INDEXED = [
+    ('complaints', 'Complaint', {'title': 3, 'description': 1}),
+    ('notices', 'Notice', {'title': 3, 'content': 1}),
+]
+
+# search.index's tokenizer when this migration was written; copied so later
+# changes there don't change what this migration does (rebuild_search_index
+# reindexes with the current one)
+MAX_TERM_LENGTH = 64
+
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have in is it its of on or that the '
+    'this to was were will with'.split()
+)
+
+
+def tokenize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    normalized = ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in re.findall(r'\w+', normalized)
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def term_weights(values, fields):
+    weights = {}
+    for field, field_weight in fields.items():
+        for term in tokenize(values.get(field)):
+            weights[term] = weights.get(term, 0) + field_weight
+    return weights
+
+
+def backfill_index(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchPosting = apps.get_model('search', 'SearchPosting')
+    for app_label, model_name, fields in INDEXED:
+        model = apps.get_model(app_label, model_name)
+        content_type, _ = ContentType.objects.get_or_create(app_label=app_label, model=model_name.lower())
+        postings = []
+        for row in model.objects.values('id', 'society_id', *fields).iterator(chunk_size=1000):
+            postings.extend(
+                SearchPosting(
+                    content_type_id=content_type.id,
+                    object_id=row['id'],
+                    society_id=row['society_id'],
+                    term=term,
+                    weight=weight,
+                )
+                for term, weight in term_weights(row, fields).items()
+            )
+            if len(postings) >= 1000:
+                SearchPosting.objects.bulk_create(postings)
+                postings = []
+        SearchPosting.objects.bulk_create(postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('complaints', '0003_resolution_rollup'),
+        ('notices', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_index, migrations.RunPython.noop),
+    ]
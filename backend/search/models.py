@@ -0,0 +1,24 @@
+from django.db import models
+from django.contrib.contenttypes.models import ContentType
+
+
+class SearchPosting(models.Model):
+    """
+    One entry of the inverted search index: a term occurring in an indexed
+    object, with its weight (occurrences, multiplied by the field's weight).
+    Maintained by ``search.index`` whenever an indexed object is saved.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveBigIntegerField()
+    society = models.ForeignKey('society.Society', on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+    
+    def __str__(self):
+        return f"{self.term} -> {self.content_type_id}:{self.object_id}"
+    
+    class Meta:
+        unique_together = ['content_type', 'object_id', 'term']
+        indexes = [
+            models.Index(fields=['content_type', 'society', 'term', 'object_id']),
+        ]
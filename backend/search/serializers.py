@@ -0,0 +1,64 @@
+import html
+import re
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .index import normalize, query_terms
+
+
+SNIPPET_LENGTH = 160
+
+
+def highlight(text, terms, length=SNIPPET_LENGTH):
+    """
+    HTML-escaped snippet of text around the first matching term, with the
+    words matching any term wrapped in <mark>. None if nothing matches.
+    """
+    text = text or ''
+    # normalize() keeps one character per character for most text; if it
+    # doesn't (e.g. ligatures), match against the text as it is
+    folded = normalize(text)
+    if len(folded) != len(text):
+        folded = text.lower()
+    matches = [
+        match.span()
+        for match in re.finditer(r'\w+', folded)
+        if match.group() in terms
+    ]
+    if not matches:
+        return None
+    
+    start = max(matches[0][0] - length // 4, 0)
+    end = min(start + length, len(text))
+    parts = ['…' if start else '']
+    position = start
+    for match_start, match_end in matches:
+        if match_start < start or match_end > end:
+            continue
+        parts.append(html.escape(text[position:match_start]))
+        parts.append(f'<mark>{html.escape(text[match_start:match_end])}</mark>')
+        position = match_end
+    parts.append(html.escape(text[position:end]))
+    parts.append('…' if end < len(text) else '')
+    return ''.join(parts)
+
+
+class SearchHighlightsField(serializers.Field):
+    """
+    {field: highlighted snippet} for the request's ``?search=`` terms, or
+    None when the request isn't a search. Use with source='*'.
+    """
+    
+    def __init__(self, fields, **kwargs):
+        self.highlight_fields = fields
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        terms = query_terms(request.query_params.get(api_settings.SEARCH_PARAM, '')) if request else []
+        if not terms:
+            return None
+        return {field: highlight(getattr(instance, field), set(terms)) for field in self.highlight_fields}
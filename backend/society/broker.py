@@ -0,0 +1,167 @@
+"""
+Publish/subscribe for live event streams.
+
+Publishers call ``get_broker().publish(channel, event)`` from any thread
+(usually from a transaction.on_commit callback); stream views subscribe
+from the ASGI event loop with ``await get_broker().subscribe(channels)`` and
+await events. The broker class is set by LIVE_EVENTS_BROKER:
+
+- RedisBroker (the default when REDIS_URL is set) goes through Redis
+  pub/sub, so events written by any worker reach streams in every worker.
+- InProcessBroker only reaches subscribers in the same process. It is not
+  ``shared``, and stream views refuse to use it unless the server runs a
+  single process (LIVE_EVENTS_SINGLE_PROCESS).
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# Sent to a subscriber that fell too far behind; it should reload its state
+RESYNC = {'event': 'resync'}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class BaseBroker:
+    """Interface of a LIVE_EVENTS_BROKER"""
+
+    # Whether events published in one process reach subscribers in the others
+    shared = True
+
+    def publish(self, channel, event):
+        """Send an event (a JSON-serializable dict) to a channel's subscribers"""
+        raise NotImplementedError
+
+    async def subscribe(self, channels):
+        """
+        Subscribe the running event loop to channels. Returns an object with
+        ``async get(timeout)`` (the next event, or None on timeout) and
+        ``async close()``. Events published after this returns are delivered.
+        """
+        raise NotImplementedError
+
+
+class InProcessSubscription:
+
+    def __init__(self, broker, channels, loop, max_pending):
+        self.broker = broker
+        self.channels = channels
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event):
+        """Queue an event from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's event loop is gone
+            self.broker.unsubscribe(self)
+
+    def _put(self, event):
+        if self.queue.full():
+            # Drop the backlog rather than block publishers on a slow client
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = RESYNC
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker(BaseBroker):
+    """Broker delivering events to subscribers in this process"""
+
+    shared = False
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    async def subscribe(self, channels):
+        subscription = InProcessSubscription(self, list(channels), asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+
+
+class RedisSubscription:
+
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout=None):
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message is not None:
+                return json.loads(message['data'])
+            if deadline is not None and loop.time() >= deadline:
+                return None
+
+    async def close(self):
+        await self.pubsub.unsubscribe()
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+class RedisBroker(BaseBroker):
+    """Broker over Redis pub/sub (REDIS_URL), reaching subscribers in every process"""
+
+    def __init__(self, url=None):
+        import redis
+
+        self.url = url or settings.REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+
+    def publish(self, channel, event):
+        self._client.publish(channel, json.dumps(event))
+
+    async def subscribe(self, channels):
+        from redis import asyncio as aioredis
+
+        # One connection per subscriber: a subscribed connection can't run other commands
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*channels)
+        return RedisSubscription(client, pubsub)
+
+
+def get_broker():
+    """The process-wide LIVE_EVENTS_BROKER instance"""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.LIVE_EVENTS_BROKER)()
+    return _broker
@@ -0,0 +1,165 @@
+"""
+Cached apartments dashboard snapshots.
+
+The dashboard for a society is stored in the cache as a single snapshot (the
+ordered block names plus one entry per flat), so a read is one cache lookup
+and an in-memory grouping by block and floor, whatever the number of flats.
+Signals in ``society.signals`` patch the entry of the flat that changed
+instead of rebuilding the whole snapshot; block changes drop the snapshot so
+the next read rebuilds it.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Block, Flat
+
+
+NO_BLOCK = 'No Block'
+
+# Snapshots depend on today's date (overdue status and current month bill),
+# so the date is part of the key and entries don't need to outlive a day.
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _cache_key(society_id, today):
+    return f'society:dashboard:{society_id}:{today.isoformat()}'
+
+
+def build_flat_entries(flats):
+    """Build dashboard entries for a Flat queryset, keyed by flat id"""
+    from billing.models import Bill
+
+    today = timezone.now().date()
+    current_month = today.replace(day=1)
+    flats = list(flats.select_related('block', 'current_resident', 'owner'))
+    flat_ids = [flat.id for flat in flats]
+
+    overdue_flat_ids = set()
+    current_month_bills = {}
+    if flat_ids:
+        overdue_flat_ids = set(
+            Bill.objects.filter(
+                flat_id__in=flat_ids,
+                due_date__lt=today
+            ).exclude(status=Bill.Status.PAID).values_list('flat_id', flat=True)
+        )
+
+        current_month_bills = {
+            bill['flat_id']: bill
+            for bill in Bill.objects.filter(
+                flat_id__in=flat_ids,
+                billing_month=current_month
+            ).values('flat_id', 'id', 'status')
+        }
+
+    entries = {}
+    for flat in flats:
+        current_bill = current_month_bills.get(flat.id, {})
+
+        flat_data = {
+            'id': flat.id,
+            'flat_number': flat.flat_number,
+            'floor': flat.floor,
+            'bhk': flat.bhk,
+            'occupancy_status': flat.occupancy_status,
+            'maintenance_status': 'overdue' if flat.id in overdue_flat_ids else 'paid',
+            'block_name': flat.block.name if flat.block else NO_BLOCK,
+            'current_bill_id': current_bill.get('id'),
+            'current_bill_status': current_bill.get('status', 'UNPAID'),
+        }
+
+        if flat.current_resident:
+            flat_data['current_resident'] = {
+                'id': flat.current_resident.id,
+                'first_name': flat.current_resident.first_name,
+                'last_name': flat.current_resident.last_name,
+                'email': flat.current_resident.email,
+                'phone': getattr(flat.current_resident, 'phone', None),
+            }
+        else:
+            flat_data['current_resident'] = None
+
+        if flat.owner:
+            flat_data['owner'] = {
+                'id': flat.owner.id,
+                'first_name': flat.owner.first_name,
+                'last_name': flat.owner.last_name,
+            }
+        else:
+            flat_data['owner'] = None
+
+        entries[flat.id] = flat_data
+
+    return entries
+
+
+def build_snapshot(blocks, flats):
+    """Build a dashboard snapshot from Block and Flat querysets"""
+    return {
+        'blocks': list(blocks.order_by('name').values_list('name', flat=True)),
+        'flats': build_flat_entries(flats),
+    }
+
+
+def get_snapshot(society_id):
+    """Return the cached snapshot for a society, building it on a miss"""
+    key = _cache_key(society_id, timezone.now().date())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(
+            Block.objects.filter(society_id=society_id),
+            Flat.objects.filter(society_id=society_id),
+        )
+        cache.set(key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+    return snapshot
+
+
+def render_snapshot(snapshot):
+    """Organize snapshot entries by block and floor for the API response"""
+    blocks_dict = defaultdict(lambda: defaultdict(list))
+    for flat_data in snapshot['flats'].values():
+        blocks_dict[flat_data['block_name']][flat_data['floor']].append(flat_data)
+
+    def floors_for(block_name):
+        return [
+            {
+                'floor': floor_num,
+                'flats': sorted(blocks_dict[block_name][floor_num], key=lambda x: x['flat_number'])
+            }
+            for floor_num in sorted(blocks_dict[block_name].keys(), reverse=True)
+        ]
+
+    # Include all blocks, even if they have no flats
+    blocks_list = [
+        {'name': block_name, 'floors': floors_for(block_name) if block_name in blocks_dict else []}
+        for block_name in snapshot['blocks']
+    ]
+
+    # Also include flats that don't have a block assigned (if any)
+    if NO_BLOCK in blocks_dict:
+        blocks_list.append({'name': NO_BLOCK, 'floors': floors_for(NO_BLOCK)})
+
+    return {'blocks': blocks_list}
+
+
+def refresh_flat(society_id, flat_id):
+    """Patch a single flat's entry in the cached snapshot, if one exists"""
+    key = _cache_key(society_id, timezone.now().date())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        return
+
+    entries = build_flat_entries(Flat.objects.filter(pk=flat_id, society_id=society_id))
+    if flat_id in entries:
+        snapshot['flats'][flat_id] = entries[flat_id]
+    else:
+        # The flat was deleted
+        snapshot['flats'].pop(flat_id, None)
+    cache.set(key, snapshot, DASHBOARD_CACHE_TIMEOUT)
+
+
+def invalidate(society_id):
+    """Drop the cached snapshot so the next read rebuilds it"""
+    cache.delete(_cache_key(society_id, timezone.now().date()))
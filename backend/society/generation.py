@@ -0,0 +1,197 @@
+"""
+Bulk flat generation and reconciliation for blocks.
+
+Flats are inserted with ``bulk_create`` inside a single transaction, along
+with their default utility bills. ``bulk_create`` doesn't send ``post_save``,
+so ``society.signals.create_default_utility_bill`` never runs per flat here;
+the bills it would have created are built with the same helper and inserted
+in bulk instead.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from billing.models import Bill
+from billing import cache as billing_cache
+from .models import Flat
+from .signals import build_default_utility_bill
+from . import dashboard
+
+
+BULK_BATCH_SIZE = 1000
+
+
+def flat_number_for(block_name, floor_num, unit_num):
+    """Format: BlockName-FloorUnit (e.g., A-404 = Block A, Floor 4, Unit 04)"""
+    # Always pad unit number to 2 digits for consistency
+    return f"{block_name}-{floor_num}{unit_num:02d}"
+
+
+def flat_grid(block):
+    """Yield (floor_num, unit_num, flat_number) for every unit in a block"""
+    for floor_num in range(1, block.floors + 1):
+        for unit_num in range(1, block.units_per_floor + 1):
+            yield floor_num, unit_num, flat_number_for(block.name, floor_num, unit_num)
+
+
+def grid_position(flat):
+    """
+    Return the (floor_num, unit_num) a flat occupies in its block's grid,
+    or None if its flat number doesn't follow the generated format.
+
+    The flat's floor column tells us where the floor digits end, so
+    "A-1203" on floor 12 is unit 3 rather than floor 1, unit 203.
+    """
+    _, separator, floor_unit = flat.flat_number.rpartition('-')
+    floor_prefix = str(flat.floor)
+    if not separator or not floor_unit.startswith(floor_prefix):
+        return None
+
+    unit = floor_unit[len(floor_prefix):]
+    if not unit.isdigit():
+        return None
+    return flat.floor, int(unit)
+
+
+def bulk_create_flats(block, flats):
+    """
+    Insert unsaved Flat instances for a block together with their default
+    utility bills. Must be called inside a transaction.
+    """
+    Flat.objects.bulk_create(flats, batch_size=BULK_BATCH_SIZE)
+
+    # Not every backend returns primary keys from bulk inserts (MySQL doesn't),
+    # so read back the ids of the flats we just inserted.
+    flat_numbers = {flat.flat_number for flat in flats}
+    created_ids = [
+        flat_id
+        for flat_id, flat_number in Flat.objects.filter(block=block).values_list('id', 'flat_number')
+        if flat_number in flat_numbers
+    ]
+
+    Bill.objects.bulk_create(
+        [build_default_utility_bill(block.society_id, flat_id) for flat_id in created_ids],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    # Bulk inserts bypass the dashboard and billing cache signals
+    society_id = block.society_id
+    transaction.on_commit(lambda: dashboard.invalidate(society_id))
+    billing_cache.bump_version_on_commit(society_id)
+
+    return len(created_ids)
+
+
+@transaction.atomic
+def generate_flats(block, bhk='2BHK'):
+    """Generate every flat of a new block in bulk and return the count"""
+    flats = [
+        Flat(
+            society_id=block.society_id,
+            block=block,
+            flat_number=flat_number,
+            floor=floor_num,
+            bhk=bhk
+        )
+        for floor_num, unit_num, flat_number in flat_grid(block)
+    ]
+    return bulk_create_flats(block, flats)
+
+
+def rename_flats(flats, old_numbers):
+    """
+    Save the new flat_number of Flat instances in bulk, given the numbers
+    they had before.
+
+    Uniqueness of (society, flat_number) is checked row by row while an
+    UPDATE runs (on MySQL and SQLite), so a flat can't take a number that
+    another flat in the same batch only gives up later. When new numbers
+    overlap old ones, the flats first move to temporary numbers.
+    """
+    if set(old_numbers) & {flat.flat_number for flat in flats}:
+        targets = {flat.id: flat.flat_number for flat in flats}
+        for flat in flats:
+            flat.flat_number = f'~{flat.id}'
+        Flat.objects.bulk_update(flats, ['flat_number'], batch_size=BULK_BATCH_SIZE)
+        for flat in flats:
+            flat.flat_number = targets[flat.id]
+    Flat.objects.bulk_update(flats, ['flat_number', 'updated_at'], batch_size=BULK_BATCH_SIZE)
+
+
+@transaction.atomic
+def reconcile_flats(block):
+    """
+    Bring a block's flats in line with its floors/units_per_floor grid.
+
+    Existing flats are matched to grid positions and kept, so their bills,
+    payments, visitors and complaints survive. Only flats that need a new
+    number are updated, missing positions are inserted in bulk and flats
+    outside the grid are deleted. An unchanged block costs a single SELECT.
+    """
+    target = {
+        (floor_num, unit_num): flat_number
+        for floor_num, unit_num, flat_number in flat_grid(block)
+    }
+    existing_flats = list(
+        Flat.objects.filter(block=block).only('id', 'flat_number', 'floor', 'bhk').order_by('id')
+    )
+
+    matched = {}
+    to_delete = []
+    for flat in existing_flats:
+        position = grid_position(flat)
+        if position not in target:
+            to_delete.append(flat.id)
+            continue
+
+        # Prefer the flat that already carries the exact target number
+        current = matched.get(position)
+        if current is None:
+            matched[position] = flat
+        elif flat.flat_number == target[position] and current.flat_number != target[position]:
+            to_delete.append(current.id)
+            matched[position] = flat
+        else:
+            to_delete.append(flat.id)
+
+    now = timezone.now()
+    to_update = []
+    old_numbers = []
+    for position, flat in matched.items():
+        if flat.flat_number != target[position]:
+            old_numbers.append(flat.flat_number)
+            flat.flat_number = target[position]
+            flat.updated_at = now
+            to_update.append(flat)
+
+    default_bhk = existing_flats[0].bhk if existing_flats and existing_flats[0].bhk else '2BHK'
+    to_create = [
+        Flat(
+            society_id=block.society_id,
+            block=block,
+            flat_number=flat_number,
+            floor=floor_num,
+            bhk=default_bhk,
+            occupancy_status=Flat.OccupancyStatus.VACANT,
+        )
+        for (floor_num, unit_num), flat_number in target.items()
+        if (floor_num, unit_num) not in matched
+    ]
+
+    # Delete first so freed flat numbers can be reused by renames and inserts
+    if to_delete:
+        Flat.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        rename_flats(to_update, old_numbers)
+    if to_create:
+        bulk_create_flats(block, to_create)
+    elif to_update or to_delete:
+        society_id = block.society_id
+        transaction.on_commit(lambda: dashboard.invalidate(society_id))
+
+    return {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(to_delete),
+        'unchanged': len(matched) - len(to_update),
+        'flats_count': len(target),
+    }
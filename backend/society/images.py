@@ -0,0 +1,228 @@
+"""
+Photo processing for uploaded images (complaint and visitor photos).
+
+Uploads are stored as they arrive; processing runs afterwards on a thread
+pool (Pillow releases the GIL while decoding, resizing and encoding):
+
+- the original is rewritten without its EXIF metadata (GPS position, device
+  details), with the EXIF orientation applied to the pixels first, and
+- WebP and JPEG thumbnails are written for every THUMBNAIL_SIZES entry.
+
+Thumbnail names are derived from the original's name (see
+``thumbnail_name``). Once a photo is processed, its model's
+``<field>_thumbnails_ready`` flag is set, so serializers build thumbnail URLs
+from the flag and the name without touching storage.
+IMAGE_PROCESSING_WORKERS = 0 processes photos inline instead.
+"""
+import io
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+THUMBNAILS_DIR = 'thumbnails'
+
+# Longest side (px) of each thumbnail
+THUMBNAIL_SIZES = {'small': 320, 'large': 1280}
+
+# Thumbnail format -> (file extension, Pillow save options)
+THUMBNAIL_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+EXIF_ORIENTATION = 0x0112
+
+_executor = None
+_lock = threading.Lock()
+
+
+def thumbnail_name(name, size, image_format):
+    """Storage name of an original's thumbnail"""
+    extension = THUMBNAIL_FORMATS[image_format][0]
+    return posixpath.join(THUMBNAILS_DIR, f'{posixpath.splitext(name)[0]}_{size}.{extension}')
+
+
+def ready_field(field):
+    """Name of the flag recording that a photo field's thumbnails are written"""
+    return f'{field}_thumbnails_ready'
+
+
+def thumbnail_names(name):
+    """{size: {format: storage name}} for every thumbnail of an original"""
+    return {
+        size: {image_format: thumbnail_name(name, size, image_format) for image_format in THUMBNAIL_FORMATS}
+        for size in THUMBNAIL_SIZES
+    }
+
+
+def _replace(name, data):
+    """
+    Overwrite a stored file, keeping its name. The previous content stays
+    readable until the new content is complete: on local storage the new
+    file is written next to it and moved over it.
+    """
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+
+    if path is None:
+        if getattr(default_storage, 'file_overwrite', False):
+            # e.g. django-storages' S3 storage, whose save overwrites in place
+            return default_storage.save(name, ContentFile(data))
+        default_storage.delete(name)
+        saved = default_storage.save(name, ContentFile(data))
+        if saved != name:
+            # Only possible if another writer recreated the file in between
+            logger.warning('Stored %s as %s', name, saved)
+        return saved
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            output.write(data)
+        os.chmod(temporary, getattr(default_storage, 'file_permissions_mode', None) or 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return name
+
+
+def _strip_metadata(image, orientation):
+    """Re-encode an original without EXIF; JPEGs keep their quantization tables"""
+    output = io.BytesIO()
+    # Phone cameras often produce MPO (JPEG with extra frames); keep the first frame
+    image_format = 'JPEG' if image.format in (None, 'JPEG', 'MPO') else image.format
+    # Pillow can only reuse the quantization tables of an unrotated JPEG file
+    keep_quality = image.format == 'JPEG' and orientation in (None, 1)
+    if orientation not in (None, 1):
+        image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG':
+        options = {'quality': 'keep' if keep_quality else 90}
+    else:
+        options = {}
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def _thumbnail(image, size, options):
+    thumbnail = image.copy()
+    thumbnail.thumbnail((size, size))
+    if thumbnail.mode not in ('RGB', 'L'):
+        thumbnail = thumbnail.convert('RGB')
+    output = io.BytesIO()
+    thumbnail.save(output, **options)
+    return output.getvalue()
+
+
+def process_photo(name):
+    """Strip an original's EXIF metadata and write its thumbnails"""
+    with default_storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image.load()
+
+    orientation = image.getexif().get(EXIF_ORIENTATION)
+    if image.info.get('exif') or orientation:
+        _replace(name, _strip_metadata(image, orientation))
+
+    upright = ImageOps.exif_transpose(image)
+    for size, pixels in THUMBNAIL_SIZES.items():
+        for image_format, (_, options) in THUMBNAIL_FORMATS.items():
+            _replace(thumbnail_name(name, size, image_format), _thumbnail(upright, pixels, options))
+
+
+def mark_ready(model, field, name, **lookups):
+    """
+    Set the thumbnails flag of the rows whose photo field holds `name`.
+    Filtering on the name skips photos that were replaced in the meantime.
+    """
+    return model.objects.filter(**{field: name}, **lookups).update(**{ready_field(field): True})
+
+
+def _process_safely(name, on_processed=None):
+    try:
+        process_photo(name)
+        if on_processed is not None:
+            on_processed(name)
+    except Exception:
+        logger.exception('Processing photo %s failed', name)
+
+
+def _process_in_worker(name, on_processed):
+    try:
+        _process_safely(name, on_processed)
+    finally:
+        # Pool threads outlive requests, so drop their connection the way a request would
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='photos',
+            )
+    return _executor
+
+
+def process_in_background(names, on_processed=None):
+    """
+    Queue photos for processing (inline when IMAGE_PROCESSING_WORKERS = 0).
+    on_processed(name) is called after each photo that was processed.
+    """
+    for name in names:
+        if not settings.IMAGE_PROCESSING_WORKERS:
+            _process_safely(name, on_processed)
+        else:
+            _get_executor().submit(_process_in_worker, name, on_processed)
+
+
+def process_uploads(model, fields):
+    """
+    Process the photos uploaded to `fields` of `model` whenever an instance
+    is saved, once the transaction that saves it commits. Each field needs a
+    BooleanField named ``ready_field(field)``, which is cleared on upload and
+    set once the photo's thumbnails are written.
+    """
+    def find_uploads(sender, instance, **kwargs):
+        # A freshly uploaded file isn't committed to storage until the save
+        instance._photo_uploads = [
+            field for field in fields
+            if getattr(instance, field) and not getattr(instance, field)._committed
+        ]
+        for field in instance._photo_uploads:
+            setattr(instance, ready_field(field), False)
+
+    def queue_uploads(sender, instance, **kwargs):
+        uploads = {getattr(instance, field).name: field for field in getattr(instance, '_photo_uploads', [])}
+        instance._photo_uploads = []
+        if uploads:
+            pk = instance.pk
+
+            def on_processed(name):
+                mark_ready(model, uploads[name], name, pk=pk)
+
+            transaction.on_commit(lambda: process_in_background(list(uploads), on_processed))
+
+    uid = f'process_uploads_{model._meta.label_lower}'
+    pre_save.connect(find_uploads, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(queue_uploads, sender=model, weak=False, dispatch_uid=uid)
@@ -0,0 +1,73 @@
+"""
+Django management command to strip EXIF metadata from, and generate
+thumbnails for, complaint and visitor photos already in storage, e.g.:
+    python manage.py process_photos --missing
+
+New uploads are processed automatically when they are saved.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from complaints.models import Complaint
+from visitors.models import Visitor
+from society.images import mark_ready, process_photo, ready_field
+
+
+PHOTO_FIELDS = [
+    (Complaint, ['photo1', 'photo2', 'photo3']),
+    (Visitor, ['photo']),
+]
+
+
+class Command(BaseCommand):
+    help = 'Strip EXIF metadata and generate thumbnails for stored photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only process photos whose thumbnails are not marked as written',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Processing threads (default: IMAGE_PROCESSING_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        # name -> [(model, field)] holding it
+        names = {}
+        for model, fields in PHOTO_FIELDS:
+            for field in fields:
+                photos = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                if options['missing']:
+                    photos = photos.filter(**{ready_field(field): False})
+                for name in photos.values_list(field, flat=True).distinct():
+                    names.setdefault(name, []).append((model, field))
+
+        workers = settings.IMAGE_PROCESSING_WORKERS if options['workers'] is None else options['workers']
+        failed = []
+
+        def process(name):
+            try:
+                process_photo(name)
+                for model, field in names[name]:
+                    mark_ready(model, field, name)
+            except Exception as exc:
+                failed.append((name, exc))
+
+        if workers:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(process, sorted(names)))
+        else:
+            for name in sorted(names):
+                process(name)
+
+        for name, exc in failed:
+            self.stderr.write(f'[FAILED] {name}: {exc}')
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {len(names) - len(failed)} photos processed, {len(failed)} failed'
+        ))
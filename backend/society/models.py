@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
 
 
 class Block(models.Model):
@@ -40,6 +42,29 @@ class Society(models.Model):
         ordering = ['name']
 
 
+class FlatQuerySet(models.QuerySet):
+    """QuerySet for Flat with billing annotations"""
+    
+    def with_billing_status(self):
+        """
+        Annotate each flat with `has_overdue_bills` and `latest_bill_status`
+        so serializers don't need to query Bill once per flat.
+        """
+        from billing.models import Bill
+        today = timezone.now().date()
+        
+        overdue_bills = Bill.objects.filter(
+            flat=OuterRef('pk'),
+            due_date__lt=today
+        ).exclude(status=Bill.Status.PAID)
+        latest_bill = Bill.objects.filter(flat=OuterRef('pk')).order_by('-billing_month')
+        
+        return self.annotate(
+            has_overdue_bills=Exists(overdue_bills),
+            latest_bill_status=Subquery(latest_bill.values('status')[:1]),
+        )
+
+
 class Flat(models.Model):
     """Model for individual flats"""
     
@@ -67,6 +92,8 @@ class Flat(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = FlatQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.society.name} - {self.flat_number}"
     
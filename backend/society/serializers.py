@@ -1,6 +1,34 @@
 from rest_framework import serializers
+from django.core.files.storage import default_storage
+from django.db import transaction
 from django.utils import timezone
 from .models import Society, Flat, Block
+from .generation import generate_flats
+from .images import ready_field, thumbnail_names
+
+
+class ThumbnailsField(serializers.ReadOnlyField):
+    """
+    URLs of a photo's thumbnails, {size: {format: url}}, or None without a
+    photo. Every size is None until the photo has been processed (see
+    ``society.images.ready_field``). Use as
+    ``photo_thumbnails = ThumbnailsField(source='photo')``.
+    """
+    
+    def to_representation(self, value):
+        if not value:
+            return None
+        names = thumbnail_names(value.name)
+        if not getattr(value.instance, ready_field(self.source), False):
+            return dict.fromkeys(names)
+        request = self.context.get('request')
+        thumbnails = {}
+        for size, size_names in names.items():
+            thumbnails[size] = {}
+            for image_format, name in size_names.items():
+                url = default_storage.url(name)
+                thumbnails[size][image_format] = request.build_absolute_uri(url) if request else url
+        return thumbnails
 
 
 class SocietySerializer(serializers.ModelSerializer):
@@ -28,38 +56,19 @@ class BlockWithFlatsSerializer(serializers.Serializer):
     units_per_floor = serializers.IntegerField(min_value=1)
     bhk = serializers.CharField(max_length=10, default='2BHK', required=False)
     
+    @transaction.atomic
     def create(self, validated_data):
         """Create block and generate flats automatically"""
-        society = validated_data['society']
-        name = validated_data['name']
-        floors = validated_data['floors']
-        units_per_floor = validated_data['units_per_floor']
-        bhk = validated_data.get('bhk', '2BHK')
-        
         # Create the block
         block = Block.objects.create(
-            society=society,
-            name=name,
-            floors=floors,
-            units_per_floor=units_per_floor
+            society=validated_data['society'],
+            name=validated_data['name'],
+            floors=validated_data['floors'],
+            units_per_floor=validated_data['units_per_floor']
         )
         
-        # Generate flats
-        flats = []
-        for floor_num in range(1, floors + 1):
-            for unit_num in range(1, units_per_floor + 1):
-                # Format: BlockName-FloorUnit (e.g., A-404 = Block A, Floor 4, Unit 04)
-                # Always pad unit number to 2 digits for consistency
-                flat_number = f"{name}-{floor_num}{unit_num:02d}"
-                
-                flat = Flat.objects.create(
-                    society=society,
-                    block=block,
-                    flat_number=flat_number,
-                    floor=floor_num,
-                    bhk=bhk
-                )
-                flats.append(flat)
+        # Generate flats (and their default bills) in bulk
+        generate_flats(block, bhk=validated_data.get('bhk', '2BHK'))
         
         return block
 
@@ -87,21 +96,27 @@ class FlatSerializer(serializers.ModelSerializer):
     
     def get_maintenance_status(self, obj):
         """Get maintenance payment status: 'paid' if no overdue, 'overdue' if any overdue"""
-        from billing.models import Bill
-        today = timezone.now().date()
-        
-        # Check for any overdue bills
-        overdue_bills = Bill.objects.filter(
-            flat=obj,
-            due_date__lt=today
-        ).exclude(status=Bill.Status.PAID)
+        # Use the annotation from FlatQuerySet.with_billing_status() when present
+        has_overdue_bills = getattr(obj, 'has_overdue_bills', None)
+        if has_overdue_bills is None:
+            from billing.models import Bill
+            today = timezone.now().date()
+            
+            # Check for any overdue bills
+            has_overdue_bills = Bill.objects.filter(
+                flat=obj,
+                due_date__lt=today
+            ).exclude(status=Bill.Status.PAID).exists()
         
-        if overdue_bills.exists():
+        if has_overdue_bills:
             return 'overdue'
         return 'paid'
     
     def get_latest_bill_status(self, obj):
         """Get the status of the latest bill"""
+        if hasattr(obj, 'latest_bill_status'):
+            return obj.latest_bill_status
+        
         from billing.models import Bill
         latest_bill = Bill.objects.filter(flat=obj).order_by('-billing_month').first()
         if latest_bill:
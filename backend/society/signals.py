@@ -1,36 +1,109 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
-from .models import Flat
-from billing.models import Bill
+from .models import Flat, Block
+from . import dashboard
+from billing.models import Bill, Payment
+from users.models import User
+
+# User fields shown in the resident and owner entries of the dashboard
+DASHBOARD_USER_FIELDS = {'first_name', 'last_name', 'email', 'phone'}
+
+
+def build_default_utility_bill(society_id, flat_id):
+    """Build (without saving) the default utility bill for a new flat"""
+    # Get current month
+    today = timezone.now().date()
+    billing_month = today.replace(day=1)  # First day of current month
+    due_date = billing_month + timedelta(days=30)  # Due date 30 days from billing month
+    
+    # Default utility bill with minimal charges
+    # These can be updated later by admins
+    bill = Bill(
+        society_id=society_id,
+        flat_id=flat_id,
+        billing_month=billing_month,
+        due_date=due_date,
+        maintenance_charge=0,
+        water_charge=0,
+        electricity_charge=0,
+        parking_charge=0,
+        other_charges=0,
+        late_fee=0,
+        total_amount=0,
+        paid_amount=0,
+        status=Bill.Status.UNPAID,
+        notes='Default utility bill created automatically'
+    )
+    # Match what Bill.save() would store, so bulk_create callers get the same row
+    bill.calculate_total()
+    bill.update_status()
+    return bill
 
 
 @receiver(post_save, sender=Flat)
 def create_default_utility_bill(sender, instance, created, **kwargs):
     """Create a default utility bill for each new flat"""
     if created:
-        # Get current month
-        today = timezone.now().date()
-        billing_month = today.replace(day=1)  # First day of current month
-        due_date = billing_month + timedelta(days=30)  # Due date 30 days from billing month
-        
-        # Create default utility bill with minimal charges
-        # These can be updated later by admins
-        Bill.objects.create(
-            society=instance.society,
-            flat=instance,
-            billing_month=billing_month,
-            due_date=due_date,
-            maintenance_charge=0,
-            water_charge=0,
-            electricity_charge=0,
-            parking_charge=0,
-            other_charges=0,
-            late_fee=0,
-            total_amount=0,
-            paid_amount=0,
-            status=Bill.Status.UNPAID,
-            notes='Default utility bill created automatically'
-        )
+        build_default_utility_bill(instance.society_id, instance.id).save()
+
+
+# ==================== DASHBOARD SNAPSHOT ====================
+
+@receiver(post_save, sender=Flat)
+@receiver(post_delete, sender=Flat)
+def refresh_dashboard_flat(sender, instance, **kwargs):
+    """Patch the flat's entry in the cached dashboard snapshot"""
+    society_id, flat_id = instance.society_id, instance.id
+    transaction.on_commit(lambda: dashboard.refresh_flat(society_id, flat_id))
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def refresh_dashboard_bill(sender, instance, **kwargs):
+    """Patch the dashboard entry of the flat a bill belongs to"""
+    society_id, flat_id = instance.society_id, instance.flat_id
+    transaction.on_commit(lambda: dashboard.refresh_flat(society_id, flat_id))
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_dashboard_payment(sender, instance, **kwargs):
+    """Patch the dashboard entry of the flat a payment was made for"""
+    try:
+        bill = instance.bill
+    except Bill.DoesNotExist:
+        # Deleted along with its bill, which patches the entry on its own
+        return
+    society_id, flat_id = bill.society_id, bill.flat_id
+    transaction.on_commit(lambda: dashboard.refresh_flat(society_id, flat_id))
+
+
+@receiver(post_save, sender=User)
+def refresh_dashboard_user(sender, instance, created, update_fields=None, **kwargs):
+    """Patch the dashboard entries of the flats a user lives in or owns"""
+    if created or (update_fields is not None and not DASHBOARD_USER_FIELDS.intersection(update_fields)):
+        return
+
+    flats = list(
+        Flat.objects.filter(Q(current_resident=instance) | Q(owner=instance))
+        .values_list('society_id', 'id')
+    )
+
+    def refresh():
+        for society_id, flat_id in flats:
+            dashboard.refresh_flat(society_id, flat_id)
+
+    if flats:
+        transaction.on_commit(refresh)
+
 
+@receiver(post_save, sender=Block)
+@receiver(post_delete, sender=Block)
+def invalidate_dashboard_block(sender, instance, **kwargs):
+    """Block changes affect the block list and its flats, so rebuild the snapshot"""
+    society_id = instance.society_id
+    transaction.on_commit(lambda: dashboard.invalidate(society_id))
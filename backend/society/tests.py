@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import date, timedelta
 from rest_framework.test import APIClient
@@ -7,6 +8,7 @@ from rest_framework import status
 from decimal import Decimal
 
 from .models import Society, Block, Flat
+from . import dashboard
 from billing.models import Bill
 
 User = get_user_model()
@@ -165,6 +167,32 @@ class BlockWithFlatsTest(TestCase):
         self.assertEqual(flat_210.floor, 2)
 
 
+    def test_generated_flats_get_default_bills_in_bulk(self):
+        """Test that bulk generation creates default bills without per-flat queries"""
+        from .serializers import BlockWithFlatsSerializer
+        
+        serializer = BlockWithFlatsSerializer(data={
+            'society': self.society.id,
+            'name': 'C',
+            'floors': 12,
+            'units_per_floor': 12,
+        })
+        self.assertTrue(serializer.is_valid())
+        
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as context:
+            block = serializer.save()
+        
+        # Batched inserts, not one insert per flat and bill
+        self.assertLess(len(context.captured_queries), 20)
+        
+        self.assertEqual(Flat.objects.filter(block=block).count(), 144)
+        self.assertEqual(Bill.objects.filter(flat__block=block).count(), 144)
+        self.assertTrue(Flat.objects.filter(flat_number='C-1212', floor=12).exists())
+
+
 class BlockViewSetTest(TestCase):
     """Test BlockViewSet API endpoints"""
     
@@ -273,10 +301,103 @@ class BlockViewSetTest(TestCase):
         self.assertFalse(Block.objects.filter(id=block.id).exists())
 
 
+class RegenerateFlatsTest(TestCase):
+    """Test reconciling a block's flats with its grid"""
+    
+    def setUp(self):
+        self.society = Society.objects.create(
+            name='Test Society',
+            address='123 Test St',
+            city='Test City',
+            state='Test State',
+            pincode='123456',
+            total_flats=100,
+            total_floors=20
+        )
+        
+        from .serializers import BlockWithFlatsSerializer
+        serializer = BlockWithFlatsSerializer(data={
+            'society': self.society.id,
+            'name': 'A',
+            'floors': 12,
+            'units_per_floor': 3,
+        })
+        self.assertTrue(serializer.is_valid())
+        self.block = serializer.save()
+    
+    def test_unchanged_block_is_a_single_query(self):
+        """Test that reconciling an unchanged block only reads its flats"""
+        from .generation import reconcile_flats
+        
+        # SAVEPOINT, SELECT and RELEASE SAVEPOINT
+        with self.assertNumQueries(3):
+            result = reconcile_flats(self.block)
+        
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(result['updated'], 0)
+        self.assertEqual(result['deleted'], 0)
+        self.assertEqual(result['unchanged'], 36)
+    
+    def test_reconcile_keeps_history_of_existing_flats(self):
+        """Test that growing and shrinking a block only touches the difference"""
+        from .generation import reconcile_flats
+        
+        flat_1203 = Flat.objects.get(flat_number='A-1203')
+        bill_ids = set(Bill.objects.filter(flat=flat_1203).values_list('id', flat=True))
+        
+        self.block.floors = 11
+        self.block.units_per_floor = 4
+        self.block.save()
+        result = reconcile_flats(self.block)
+        
+        # Floor 12 is removed and a fourth unit is added to each remaining floor
+        self.assertEqual(result['deleted'], 3)
+        self.assertEqual(result['created'], 11)
+        self.assertEqual(Flat.objects.filter(block=self.block).count(), 44)
+        self.assertFalse(Flat.objects.filter(id=flat_1203.id).exists())
+        
+        flat_1103 = Flat.objects.get(flat_number='A-1103')
+        self.assertEqual(flat_1103.floor, 11)
+        self.assertTrue(Bill.objects.filter(flat=flat_1103).exists())
+        self.assertTrue(Flat.objects.filter(flat_number='A-1104', floor=11).exists())
+        self.assertFalse(Bill.objects.filter(id__in=bill_ids).exists())
+    
+    def test_renamed_block_renames_flats_in_place(self):
+        """Test that renaming a block renumbers flats without recreating them"""
+        from .generation import reconcile_flats
+        
+        flat_ids = set(Flat.objects.filter(block=self.block).values_list('id', flat=True))
+        
+        self.block.name = 'B'
+        self.block.save()
+        result = reconcile_flats(self.block)
+        
+        self.assertEqual(result['updated'], 36)
+        self.assertEqual(set(Flat.objects.filter(block=self.block).values_list('id', flat=True)), flat_ids)
+        self.assertEqual(Flat.objects.get(flat_number='B-1203').floor, 12)
+
+    
+    def test_renames_can_take_numbers_held_by_other_renamed_flats(self):
+        """Test that a rename into a number another renamed flat gives up doesn't collide"""
+        from .generation import reconcile_flats
+        
+        # A-12 on floor 1 becomes A-102, which A-102 on floor 10 gives up to become A-1002
+        flat_102 = Flat.objects.get(flat_number='A-102')
+        flat_1002 = Flat.objects.get(flat_number='A-1002')
+        Flat.objects.filter(id=flat_102.id).update(flat_number='A-12')
+        Flat.objects.filter(id=flat_1002.id).update(flat_number='A-102')
+        
+        result = reconcile_flats(self.block)
+        
+        self.assertEqual(result['updated'], 2)
+        self.assertEqual(Flat.objects.get(id=flat_102.id).flat_number, 'A-102')
+        self.assertEqual(Flat.objects.get(id=flat_1002.id).flat_number, 'A-1002')
+
 class DashboardEndpointTest(TestCase):
     """Test the apartments dashboard endpoint"""
     
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.society = Society.objects.create(
             name='Test Society',
@@ -453,3 +574,187 @@ class DashboardEndpointTest(TestCase):
         flat_numbers = [f['flat_number'] for f in no_block_flats]
         self.assertIn('Standalone-101', flat_numbers)
 
+
+
+    def _find_flat(self, response, flat_id):
+        for block in response.data['blocks']:
+            for floor in block['floors']:
+                for flat in floor['flats']:
+                    if flat['id'] == flat_id:
+                        return flat
+        return None
+    
+    def test_dashboard_snapshot_is_patched_on_bill_change(self):
+        """Test that a bill write patches the cached snapshot instead of going stale"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/society/flats/dashboard/')
+        self.assertEqual(self._find_flat(response, self.flat2.id)['maintenance_status'], 'paid')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Bill.objects.create(
+                society=self.society,
+                flat=self.flat2,
+                billing_month=date.today().replace(day=1) - timedelta(days=60),
+                due_date=date.today() - timedelta(days=5),
+                maintenance_charge=Decimal('1000.00'),
+                total_amount=Decimal('1000.00'),
+            )
+        
+        with self.assertNumQueries(0):
+            snapshot = dashboard.get_snapshot(self.society.id)
+        self.assertEqual(snapshot['flats'][self.flat2.id]['maintenance_status'], 'overdue')
+        
+        response = self.client.get('/api/society/flats/dashboard/')
+        self.assertEqual(self._find_flat(response, self.flat2.id)['maintenance_status'], 'overdue')
+    
+    def test_dashboard_patches_of_different_flats_are_kept(self):
+        """Test that patching one flat's entry doesn't overwrite another flat's patch"""
+        dashboard.get_snapshot(self.society.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            for flat in (self.flat1, self.flat2):
+                Bill.objects.create(
+                    society=self.society,
+                    flat=flat,
+                    billing_month=date.today().replace(day=1) - timedelta(days=60),
+                    due_date=date.today() - timedelta(days=5),
+                    maintenance_charge=Decimal('1000.00'),
+                    total_amount=Decimal('1000.00'),
+                )
+        
+        with self.assertNumQueries(0):
+            snapshot = dashboard.get_snapshot(self.society.id)
+        self.assertEqual(snapshot['flats'][self.flat1.id]['maintenance_status'], 'overdue')
+        self.assertEqual(snapshot['flats'][self.flat2.id]['maintenance_status'], 'overdue')
+    
+    def test_dashboard_snapshot_is_patched_on_flat_change(self):
+        """Test that adding and removing flats patches the cached snapshot"""
+        dashboard.get_snapshot(self.society.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            new_flat = Flat.objects.create(
+                society=self.society,
+                block=self.block,
+                flat_number='A-202',
+                floor=2,
+                bhk='3BHK'
+            )
+        self.assertIn(new_flat.id, dashboard.get_snapshot(self.society.id)['flats'])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flat1.delete()
+        self.assertNotIn(self.flat1.id, dashboard.get_snapshot(self.society.id)['flats'])
+    
+    def test_dashboard_snapshot_is_patched_on_resident_change(self):
+        """Test that editing an occupant's name patches their flat's entry"""
+        self.flat1.current_resident = self.user
+        self.flat1.save()
+        dashboard.get_snapshot(self.society.id)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Renamed'
+            self.user.save()
+        
+        with self.assertNumQueries(0):
+            snapshot = dashboard.get_snapshot(self.society.id)
+        self.assertEqual(snapshot['flats'][self.flat1.id]['current_resident']['first_name'], 'Renamed')
+    
+    def test_dashboard_snapshot_is_one_cache_entry_for_large_societies(self):
+        """Test that a society with more flats than the cache's cull threshold is read without queries"""
+        from django.test import override_settings
+        
+        Flat.objects.bulk_create([
+            Flat(society=self.society, block=self.block, flat_number=f'A-{number}', floor=1, bhk='2BHK')
+            for number in range(1000, 1400)
+        ])
+        
+        # The backends' default limit, well below the number of flats
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'dashboard-large-society',
+            'OPTIONS': {'MAX_ENTRIES': 300},
+        }}):
+            dashboard.get_snapshot(self.society.id)
+            with self.assertNumQueries(0):
+                snapshot = dashboard.get_snapshot(self.society.id)
+        self.assertEqual(len(snapshot['flats']), 403)
+
+
+class FlatListQueryTest(TestCase):
+    """Test that flat lists don't query bills once per flat"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.society = Society.objects.create(
+            name='Test Society',
+            address='123 Test St',
+            city='Test City',
+            state='Test State',
+            pincode='123456',
+            total_flats=100,
+            total_floors=10
+        )
+        
+        self.user = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            first_name='Admin',
+            last_name='User',
+            role='ADMIN',
+            society=self.society
+        )
+        self.client.force_authenticate(user=self.user)
+    
+    def _create_flats(self, count, start=1):
+        flats = []
+        for unit_num in range(start, start + count):
+            flats.append(Flat.objects.create(
+                society=self.society,
+                flat_number=f'A-1{unit_num:02d}',
+                floor=1,
+                bhk='2BHK'
+            ))
+        return flats
+    
+    def _count_list_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+    
+    def test_list_query_count_is_constant(self):
+        """Test that listing flats costs the same number of queries for any page size"""
+        self._create_flats(2)
+        small_count = self._count_list_queries('/api/society/flats/')
+        
+        self._create_flats(10, start=3)
+        large_count = self._count_list_queries('/api/society/flats/')
+        
+        self.assertEqual(small_count, large_count)
+        
+        small_count = self._count_list_queries('/api/society/flats/my_society/')
+        self.assertEqual(small_count, large_count)
+    
+    def test_list_includes_bill_status(self):
+        """Test that the annotated bill status matches the flat's bills"""
+        flat = self._create_flats(1)[0]
+        Bill.objects.create(
+            society=self.society,
+            flat=flat,
+            billing_month=date.today().replace(day=1) - timedelta(days=60),
+            due_date=date.today() - timedelta(days=5),
+            maintenance_charge=Decimal('1000.00'),
+            total_amount=Decimal('1000.00'),
+        )
+        
+        latest_bill = Bill.objects.filter(flat=flat).order_by('-billing_month').first()
+        
+        response = self.client.get('/api/society/flats/')
+        
+        flat_data = response.data['results'][0]
+        self.assertEqual(flat_data['maintenance_status'], 'overdue')
+        self.assertEqual(flat_data['latest_bill_status'], latest_bill.status)
@@ -159,14 +159,22 @@ class VisitorPermissions(permissions.BasePermission):
         if view.action in ['update', 'partial_update', 'destroy']:
             return role in ['ADMIN', 'COMMITTEE', 'SECURITY']
         
-        # Check-in/Check-out - security and admins
-        if view.action in ['check_in', 'check_out']:
+        # Check-in/Check-out (also with a gate pass) - security and admins
+        if view.action in ['check_in', 'check_out', 'gate_check_in']:
             return role in ['ADMIN', 'SECURITY']
         
+        # Gate passes - residents (own flat, checked in the view), admins, committee, security
+        if view.action == 'gate_pass':
+            return role in ['ADMIN', 'COMMITTEE', 'RESIDENT', 'SECURITY']
+        
         # Approve/Reject - admins, committee, security
         if view.action in ['approve', 'reject']:
             return role in ['ADMIN', 'COMMITTEE', 'SECURITY']
         
+        # Live stream tickets - all authenticated users (the stream checks what they may follow)
+        if view.action == 'stream_ticket':
+            return True
+        
         return False
 
 
@@ -182,7 +190,7 @@ class ComplaintPermissions(permissions.BasePermission):
         role = request.user.role
         
         # Read operations - all authenticated users (filtered by queryset)
-        if view.action in ['list', 'retrieve', 'stats']:
+        if view.action in ['list', 'retrieve', 'stats', 'updates']:
             return True
         
         # Create - all authenticated users (residents create their own)
@@ -197,8 +205,11 @@ class ComplaintPermissions(permissions.BasePermission):
         if view.action == 'add_update':
             return role in ['ADMIN', 'COMMITTEE', 'RESIDENT']
         
-        # Assign/Resolve/Close - admins and committee
-        if view.action in ['assign', 'resolve', 'close']:
+        # Assign/Resolve/Close (single or bulk), duplicate clusters and SLA metrics - admins and committee
+        if view.action in [
+            'assign', 'resolve', 'close', 'bulk', 'sla',
+            'similar', 'attach', 'detach', 'resolve_cluster', 'close_cluster',
+        ]:
             return role in ['ADMIN', 'COMMITTEE']
         
         return False
@@ -214,7 +225,7 @@ class ComplaintPermissions(permissions.BasePermission):
         # Residents can only access their own complaints
         if role == 'RESIDENT':
             # For read operations (retrieve), ensure they can only see their own
-            if view.action == 'retrieve':
+            if view.action in ['retrieve', 'updates']:
                 return obj.created_by == request.user
             # For modify operations, ensure they can only modify their own
             if view.action in ['update', 'partial_update', 'destroy', 'add_update']:
@@ -235,7 +246,7 @@ class BillPermissions(permissions.BasePermission):
         role = request.user.role
         
         # Read operations - all authenticated users (filtered by queryset)
-        if view.action in ['list', 'retrieve', 'my_bills', 'stats']:
+        if view.action in ['list', 'retrieve', 'my_bills', 'stats', 'balances', 'statement', 'monthly_statement']:
             return True
         
         # Create - only admins and committee
@@ -254,6 +265,14 @@ class BillPermissions(permissions.BasePermission):
         if view.action == 'mark_paid':
             return role == 'ADMIN'
         
+        # Monthly bill run and repricing - only admins
+        if view.action in ['generate', 'reprice']:
+            return role == 'ADMIN'
+        
+        # Aging report and export - only admins and committee
+        if view.action in ['aging', 'export']:
+            return role in ['ADMIN', 'COMMITTEE']
+        
         return False
     
     def has_object_permission(self, request, view, obj):
@@ -275,12 +294,16 @@ class BillPermissions(permissions.BasePermission):
 
 
 class PaymentPermissions(permissions.BasePermission):
-    """Permissions for Payment read operations."""
+    """Permissions for Payment read operations and statement import."""
     
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
         
+        # Statement import and export - only admins and committee
+        if view.action in ['import_statement', 'export']:
+            return request.user.role in ['ADMIN', 'COMMITTEE']
+        
         # Read-only - all authenticated users (filtered by queryset)
         return True
 
@@ -0,0 +1,201 @@
+"""
+Live visitor feed (server-sent events).
+
+Visitor state transitions are published, once their transaction commits, to
+the society's channel and the flat's channel of the LIVE_EVENTS_BROKER.
+``GET /api/visitors/stream/`` (``?flat=<id>`` for one flat) opens an SSE
+stream: first a ``snapshot`` event with the active and pending visitors,
+then an event per transition (created, approved, rejected, checked_in,
+checked_out, deleted), with a keep-alive comment when idle. Guard and resident
+screens keep their list up to date from the stream instead of polling
+``active``/``pending``.
+
+Streams need the ASGI server (config.asgi, see PRODUCTION_DEPLOYMENT.md):
+under WSGI the view answers 501 instead of holding a worker forever. They
+also need a broker shared by all workers (RedisBroker), unless the server
+runs a single process.
+
+EventSource can't send an Authorization header, and access tokens in URLs
+end up in proxy and access logs, so browsers open the stream with
+``?ticket=``: a signed ticket from ``POST /api/visitors/stream_ticket/``
+that expires after TICKET_MAX_AGE seconds and opens nothing but the stream.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from society.broker import get_broker
+from society.models import Flat
+from .models import Visitor
+
+
+KEEPALIVE_SECONDS = 15
+
+TICKET_SALT = 'visitors.stream-ticket'
+
+# A ticket only has to outlive the round trip from fetching it to opening the stream
+TICKET_MAX_AGE = 60
+
+# Event name for a visitor's status after a change
+STATUS_EVENTS = {
+    Visitor.Status.PENDING: 'updated',
+    Visitor.Status.APPROVED: 'approved',
+    Visitor.Status.REJECTED: 'rejected',
+    Visitor.Status.IN_PREMISES: 'checked_in',
+    Visitor.Status.EXITED: 'checked_out',
+}
+
+VISITOR_FIELDS = ['id', 'name', 'flat_id', 'purpose', 'status', 'pre_approved', 'entry_time', 'exit_time']
+
+
+def society_channel(society_id):
+    return f'visitors:society:{society_id}'
+
+
+def flat_channel(flat_id):
+    return f'visitors:flat:{flat_id}'
+
+
+def visitor_data(values):
+    """Compact JSON-ready visitor dict from VISITOR_FIELDS values"""
+    data = {field: values.get(field) for field in VISITOR_FIELDS}
+    data['flat'] = data.pop('flat_id')
+    for field in ('entry_time', 'exit_time'):
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return data
+
+
+def publish_visitor(society_id, values, event=None):
+    """Publish a visitor change once the current transaction commits"""
+    message = {
+        'event': event or STATUS_EVENTS.get(values['status'], 'updated'),
+        'visitor': visitor_data(values),
+    }
+
+    def send():
+        broker = get_broker()
+        broker.publish(society_channel(society_id), message)
+        broker.publish(flat_channel(values['flat_id']), message)
+
+    transaction.on_commit(send)
+
+
+def _sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def issue_stream_ticket(user):
+    """Signed ticket that opens the visitor stream as `user` for TICKET_MAX_AGE seconds"""
+    return signing.dumps({'u': user.pk}, salt=TICKET_SALT)
+
+
+def _authenticate(request):
+    """The request's user from a ?ticket= or a JWT in the Authorization header, or None"""
+    ticket = request.GET.get('ticket')
+    if ticket:
+        try:
+            payload = signing.loads(ticket, salt=TICKET_SALT, max_age=TICKET_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        return get_user_model().objects.filter(pk=payload['u'], is_active=True).first()
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    return result[0] if result else None
+
+
+def _snapshot(society_id, flat_id):
+    visitors = Visitor.objects.filter(
+        society_id=society_id,
+        status__in=[Visitor.Status.IN_PREMISES, Visitor.Status.PENDING],
+    )
+    if flat_id:
+        visitors = visitors.filter(flat_id=flat_id)
+    active, pending = [], []
+    for values in visitors.values(*VISITOR_FIELDS):
+        (active if values['status'] == Visitor.Status.IN_PREMISES else pending).append(visitor_data(values))
+    return {'active': active, 'pending': pending}
+
+
+def _stream_scope(request):
+    """
+    Authenticate and authorize a stream request. Returns (channel, society id,
+    flat id) or an error JsonResponse.
+    """
+    user = _authenticate(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if not user.society_id:
+        return JsonResponse({'error': 'User is not associated with a society'}, status=400)
+
+    flat_id = request.GET.get('flat')
+    if flat_id:
+        if not flat_id.isdigit():
+            return JsonResponse({'error': 'Flat not found'}, status=404)
+        flat = Flat.objects.filter(pk=flat_id, society_id=user.society_id).values('id', 'current_resident_id').first()
+        if flat is None:
+            return JsonResponse({'error': 'Flat not found'}, status=404)
+        if user.role == 'RESIDENT' and flat['current_resident_id'] != user.id:
+            return JsonResponse({'error': 'You can only follow your own flat'}, status=403)
+        return flat_channel(flat['id']), user.society_id, flat['id']
+
+    if user.role == 'RESIDENT':
+        return JsonResponse({'error': 'Residents must pass ?flat='}, status=403)
+    return society_channel(user.society_id), user.society_id, None
+
+
+async def visitor_stream(request):
+    """Server-sent events stream of visitor changes for a society or flat"""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the endless response would tie up a worker and never flush
+        return JsonResponse({'error': 'Live streams need the ASGI server (config.asgi)'}, status=501)
+
+    scope = await sync_to_async(_stream_scope)(request)
+    if isinstance(scope, JsonResponse):
+        return scope
+    channel, society_id, flat_id = scope
+
+    broker = get_broker()
+    if not broker.shared and not settings.LIVE_EVENTS_SINGLE_PROCESS:
+        # Changes saved by other workers would never reach this stream
+        return JsonResponse(
+            {'error': 'Live streams need a LIVE_EVENTS_BROKER shared by all workers (set REDIS_URL)'},
+            status=503
+        )
+
+    # Subscribe before the snapshot, so no change falls between the two
+    subscription = await broker.subscribe([channel])
+    try:
+        snapshot = await sync_to_async(_snapshot)(society_id, flat_id)
+    except Exception:
+        await subscription.close()
+        raise
+
+    async def events():
+        try:
+            yield _sse('snapshot', snapshot)
+            while True:
+                message = await subscription.get(timeout=KEEPALIVE_SECONDS)
+                if message is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield _sse(message['event'], message.get('visitor'))
+        finally:
+            await subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
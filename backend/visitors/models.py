@@ -27,6 +27,8 @@ class Visitor(models.Model):
     phone = models.CharField(max_length=15)
     purpose = models.CharField(max_length=20, choices=Purpose.choices, default=Purpose.PERSONAL)
     photo = models.ImageField(upload_to='visitors/', blank=True, null=True)
+    # Set once the photo's thumbnails are written (see society.images)
+    photo_thumbnails_ready = models.BooleanField(default=False, editable=False)
     vehicle_number = models.CharField(max_length=20, blank=True)
     
     # Visit details
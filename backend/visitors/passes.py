@@ -0,0 +1,115 @@
+"""
+Signed visitor gate passes.
+
+A pre-approved visitor gets a pass token (shown as a QR code) carrying the
+visitor, society and flat, the visitor's name and flat number for the
+guard's screen, and the validity window, signed with SECRET_KEY. The gate
+verifies the signature and window without touching the database, then
+checks the visitor in with a single UPDATE by primary key whose WHERE
+clause also enforces the pass's current state: a visitor who was rejected
+after the pass was issued, or who is already inside, doesn't match.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.utils import timezone
+
+from .live import publish_visitor
+from .models import Visitor
+
+
+SALT = 'visitors.gate-pass'
+
+DEFAULT_VALIDITY = timedelta(hours=24)
+MAX_VALIDITY = timedelta(days=7)
+
+# Tolerated clock difference between the server that issued a pass and the gate
+CLOCK_LEEWAY = timedelta(minutes=5)
+
+# A pass can be used again within its window once the visitor has exited
+CHECK_IN_STATUSES = [Visitor.Status.APPROVED, Visitor.Status.EXITED]
+
+
+class InvalidPass(Exception):
+    """The pass is forged, malformed, expired or not yet valid"""
+
+
+def issue_pass(visitor, valid_from=None, valid_until=None):
+    """
+    Signed pass token for a visitor, valid from `valid_from` (default now)
+    until `valid_until` (default DEFAULT_VALIDITY later, at most
+    MAX_VALIDITY). Returns (token, valid_from, valid_until).
+    """
+    valid_from = valid_from or timezone.now()
+    valid_until = valid_until or valid_from + DEFAULT_VALIDITY
+    if valid_until <= valid_from:
+        raise ValueError('valid_until must be after valid_from')
+    if valid_until - valid_from > MAX_VALIDITY:
+        raise ValueError(f'A pass can be valid for at most {MAX_VALIDITY.days} days')
+
+    payload = {
+        'v': visitor.pk,
+        's': visitor.society_id,
+        'f': visitor.flat_id,
+        'n': visitor.name,
+        'fn': visitor.flat.flat_number,
+        'p': visitor.purpose,
+        'from': int(valid_from.timestamp()),
+        'until': int(valid_until.timestamp()),
+    }
+    return signing.dumps(payload, salt=SALT, compress=True), valid_from, valid_until
+
+
+def verify_pass(token, now=None):
+    """Check a pass token's signature and validity window; returns its payload"""
+    try:
+        payload = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        raise InvalidPass('Invalid pass')
+
+    now = now or timezone.now()
+    valid_from = datetime.fromtimestamp(payload['from'], tz=dt_timezone.utc)
+    valid_until = datetime.fromtimestamp(payload['until'], tz=dt_timezone.utc)
+    if now < valid_from - CLOCK_LEEWAY:
+        raise InvalidPass('Pass is not valid yet')
+    if now > valid_until + CLOCK_LEEWAY:
+        raise InvalidPass('Pass has expired')
+    return payload
+
+
+def check_in_with_pass(payload, user, society_id=None, now=None):
+    """
+    Check in the visitor of a verified pass with one UPDATE. Returns False
+    if the visitor can't be checked in (rejected, already inside, deleted,
+    or of another society than `society_id`).
+    """
+    if society_id and payload['s'] != society_id:
+        return False
+
+    now = now or timezone.now()
+    checked_in = Visitor.objects.filter(
+        pk=payload['v'],
+        society_id=payload['s'],
+        status__in=CHECK_IN_STATUSES,
+    ).update(
+        status=Visitor.Status.IN_PREMISES,
+        entry_time=now,
+        exit_time=None,
+        checked_in_by=user,
+        updated_at=now,
+    )
+    if not checked_in:
+        return False
+
+    # The UPDATE bypasses the post_save signal that feeds the live stream
+    publish_visitor(payload['s'], {
+        'id': payload['v'],
+        'name': payload['n'],
+        'flat_id': payload['f'],
+        'purpose': payload.get('p'),
+        'status': Visitor.Status.IN_PREMISES,
+        'pre_approved': True,
+        'entry_time': now,
+        'exit_time': None,
+    })
+    return True
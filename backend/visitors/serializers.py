@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from .models import Visitor
-from society.serializers import FlatSerializer
+from society.serializers import FlatSerializer, ThumbnailsField
 
 
 class VisitorSerializer(serializers.ModelSerializer):
     """Serializer for Visitor model"""
     flat_number = serializers.SerializerMethodField()
+    photo_thumbnails = ThumbnailsField(source='photo')
     
     class Meta:
         model = Visitor
-        fields = '__all__'
+        exclude = ('photo_thumbnails_ready',)
         read_only_fields = ('society', 'checked_in_by', 'checked_out_by', 'approved_by')
     
     def get_flat_number(self, obj):
@@ -24,10 +25,11 @@ class VisitorSerializer(serializers.ModelSerializer):
 class VisitorDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for Visitor"""
     flat = FlatSerializer(read_only=True)
+    photo_thumbnails = ThumbnailsField(source='photo')
     
     class Meta:
         model = Visitor
-        fields = '__all__'
+        exclude = ('photo_thumbnails_ready',)
 
 
 class VisitorCheckInSerializer(serializers.Serializer):
@@ -39,3 +41,14 @@ class VisitorCheckOutSerializer(serializers.Serializer):
     """Serializer for visitor check-out"""
     exit_time = serializers.DateTimeField(required=False)
 
+
+
+class VisitorGatePassSerializer(serializers.Serializer):
+    """Serializer for issuing a signed gate pass"""
+    valid_from = serializers.DateTimeField(required=False)
+    valid_until = serializers.DateTimeField(required=False)
+
+
+class VisitorGateCheckInSerializer(serializers.Serializer):
+    """Serializer for checking in with a gate pass token"""
+    token = serializers.CharField()
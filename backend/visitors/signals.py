@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from society.images import process_uploads
+from .live import VISITOR_FIELDS, publish_visitor
+from .models import Visitor
+
+
+# Strip EXIF and generate thumbnails for uploaded photos
+process_uploads(Visitor, ['photo'])
+
+
+def _values(visitor):
+    return {field: getattr(visitor, field) for field in VISITOR_FIELDS}
+
+
+@receiver(post_save, sender=Visitor)
+def publish_visitor_saved(sender, instance, created, raw=False, **kwargs):
+    """Push visitor state changes to the live visitor streams"""
+    if not raw:
+        publish_visitor(instance.society_id, _values(instance), 'created' if created else None)
+
+
+@receiver(post_delete, sender=Visitor)
+def publish_visitor_deleted(sender, instance, **kwargs):
+    """Tell the live visitor streams a visitor was removed"""
+    publish_visitor(instance.society_id, _values(instance), 'deleted')
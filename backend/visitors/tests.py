@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from society.models import Society, Flat
+from .models import Visitor
+
+User = get_user_model()
+
+
+class RecordingBroker:
+    """LIVE_EVENTS_BROKER that records what is published"""
+    published = []
+    
+    def publish(self, channel, event):
+        self.published.append((channel, event))
+
+
+def reset_broker():
+    import society.broker
+    society.broker._broker = None
+    RecordingBroker.published = []
+
+
+class VisitorTestCase(TestCase):
+    """Shared fixtures for visitor tests"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.society = Society.objects.create(
+            name='Test Society',
+            address='123 Test St',
+            city='Test City',
+            state='Test State',
+            pincode='123456',
+            total_flats=100,
+            total_floors=10
+        )
+        self.resident = User.objects.create_user(
+            username='resident', email='resident@test.com', password='testpass123', role='RESIDENT', society=self.society
+        )
+        self.guard = User.objects.create_user(
+            username='guard', email='guard@test.com', password='testpass123', role='SECURITY', society=self.society
+        )
+        self.flat = Flat.objects.create(
+            society=self.society,
+            flat_number='A-101',
+            floor=1,
+            bhk='2BHK',
+            current_resident=self.resident
+        )
+        self.visitor = Visitor.objects.create(
+            society=self.society, flat=self.flat, name='Ramesh', phone='9999999999'
+        )
+        self.addCleanup(reset_broker)
+
+
+class GatePassTest(VisitorTestCase):
+    """Test signed gate passes and check-in with them"""
+    
+    def _issue(self, **data):
+        self.client.force_authenticate(user=self.resident)
+        response = self.client.post(f'/api/visitors/{self.visitor.id}/gate_pass/', data, format='json')
+        self.client.force_authenticate(user=self.guard)
+        return response
+    
+    def test_check_in_with_pass_is_one_write(self):
+        """Test that a valid pass checks the visitor in with a single UPDATE"""
+        response = self._issue()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.visitor.refresh_from_db()
+        self.assertEqual(self.visitor.status, Visitor.Status.APPROVED)
+        self.assertTrue(self.visitor.pre_approved)
+        
+        with CaptureQueriesContext(connection) as context:
+            checked_in = self.client.post('/api/visitors/gate_check_in/', {'token': response.data['token']})
+        self.assertEqual(checked_in.status_code, status.HTTP_200_OK)
+        self.assertEqual((checked_in.data['name'], checked_in.data['flat_number']), ('Ramesh', 'A-101'))
+        visitor_queries = [q['sql'] for q in context.captured_queries if 'visitors_visitor' in q['sql']]
+        self.assertEqual(len(visitor_queries), 1)
+        self.assertTrue(visitor_queries[0].startswith('UPDATE'))
+        
+        self.visitor.refresh_from_db()
+        self.assertEqual(self.visitor.status, Visitor.Status.IN_PREMISES)
+        self.assertEqual(self.visitor.checked_in_by, self.guard)
+        
+        # Already inside
+        again = self.client.post('/api/visitors/gate_check_in/', {'token': response.data['token']})
+        self.assertEqual(again.status_code, status.HTTP_409_CONFLICT)
+    
+    def test_forged_expired_and_revoked_passes_are_refused(self):
+        """Test that tampered, expired and revoked passes don't check anyone in"""
+        token = self._issue().data['token']
+        response = self.client.post('/api/visitors/gate_check_in/', {'token': token[:-2] + 'xx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        past = timezone.now() - timedelta(days=3)
+        expired = self._issue(valid_from=past.isoformat(), valid_until=(past + timedelta(hours=1)).isoformat())
+        response = self.client.post('/api/visitors/gate_check_in/', {'token': expired.data['token']})
+        self.assertEqual(response.data, {'error': 'Pass has expired'})
+        
+        Visitor.objects.filter(pk=self.visitor.pk).update(status=Visitor.Status.REJECTED)
+        response = self.client.post('/api/visitors/gate_check_in/', {'token': token})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+    
+    def test_only_the_flats_resident_can_issue(self):
+        """Test that residents can't issue passes for other flats' visitors"""
+        neighbour = User.objects.create_user(
+            username='neighbour', email='neighbour@test.com', password='testpass123', role='RESIDENT', society=self.society
+        )
+        self.client.force_authenticate(user=neighbour)
+        response = self.client.post(f'/api/visitors/{self.visitor.id}/gate_pass/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        
+        response = self._issue(valid_until=(timezone.now() + timedelta(days=30)).isoformat())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LiveVisitorFeedTest(VisitorTestCase):
+    """Test the live visitor feed"""
+    
+    @override_settings(LIVE_EVENTS_BROKER='visitors.tests.RecordingBroker')
+    def test_transitions_are_published_on_commit(self):
+        """Test that saves and gate check-ins publish to the society and flat channels"""
+        reset_broker()
+        with self.captureOnCommitCallbacks(execute=True):
+            visitor = Visitor.objects.create(society=self.society, flat=self.flat, name='Suresh', phone='8888888888')
+        self.assertEqual(
+            [(channel, event['event']) for channel, event in RecordingBroker.published],
+            [(f'visitors:society:{self.society.id}', 'created'), (f'visitors:flat:{self.flat.id}', 'created')]
+        )
+        self.assertEqual(RecordingBroker.published[0][1]['visitor']['name'], 'Suresh')
+        
+        self.client.force_authenticate(user=self.resident)
+        token = self.client.post(f'/api/visitors/{visitor.id}/gate_pass/').data['token']
+        self.client.force_authenticate(user=self.guard)
+        RecordingBroker.published = []
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/visitors/gate_check_in/', {'token': token})
+        event = RecordingBroker.published[0][1]
+        self.assertEqual((event['event'], event['visitor']['id']), ('checked_in', visitor.id))
+        self.assertEqual(event['visitor']['status'], 'IN_PREMISES')
+    
+    def test_broker_delivers_across_threads(self):
+        """Test that events published from other threads reach subscribers, and slow ones resync"""
+        from society.broker import RESYNC, InProcessBroker
+        
+        async def scenario():
+            broker = InProcessBroker(max_pending=2)
+            subscription = await broker.subscribe(['a'])
+            publisher = threading.Thread(target=broker.publish, args=('a', {'event': 'one'}))
+            publisher.start()
+            publisher.join()
+            self.assertEqual(await subscription.get(timeout=1), {'event': 'one'})
+            self.assertIsNone(await subscription.get(timeout=0.01))
+            
+            for index in range(3):
+                broker.publish('a', {'event': index})
+            await asyncio.sleep(0)
+            self.assertEqual(await subscription.get(timeout=1), RESYNC)
+            
+            await subscription.close()
+            self.assertEqual(broker._subscriptions, {})
+        
+        asyncio.run(scenario())
+    
+    @override_settings(LIVE_EVENTS_SINGLE_PROCESS=True)
+    async def test_stream_sends_snapshot_then_events(self):
+        """Test that the stream starts with a snapshot and then pushes published events"""
+        from society.broker import get_broker
+        from .live import issue_stream_ticket, society_channel
+        
+        response = await self.async_client.get('/api/visitors/stream/', {'ticket': issue_stream_ticket(self.guard)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        events = response.streaming_content.__aiter__()
+        snapshot = await events.__anext__()
+        self.assertTrue(snapshot.startswith(b'event: snapshot\n'))
+        data = json.loads(snapshot.split(b'data: ', 1)[1])
+        self.assertEqual([visitor['name'] for visitor in data['pending']], ['Ramesh'])
+        
+        get_broker().publish(society_channel(self.society.id), {'event': 'approved', 'visitor': {'id': 1}})
+        self.assertEqual(await events.__anext__(), b'event: approved\ndata: {"id": 1}\n\n')
+        await events.aclose()
+        
+        anonymous = await self.async_client.get('/api/visitors/stream/', {'ticket': 'not-a-ticket'})
+        self.assertEqual(anonymous.status_code, 401)
+    
+    async def test_stream_only_accepts_fresh_stream_tickets(self):
+        """Test that access tokens in the URL and expired tickets don't open the stream"""
+        import time
+        from unittest import mock
+        from asgiref.sync import sync_to_async
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from .live import TICKET_MAX_AGE, issue_stream_ticket
+        
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.guard).access_token))()
+        response = await self.async_client.get('/api/visitors/stream/', {'token': token})
+        self.assertEqual(response.status_code, 401)
+        
+        with mock.patch('django.core.signing.time.time', return_value=time.time() - TICKET_MAX_AGE - 1):
+            ticket = issue_stream_ticket(self.guard)
+        response = await self.async_client.get('/api/visitors/stream/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+    
+    def test_stream_ticket_endpoint(self):
+        """Test that any signed-in user can get a ticket for their own stream"""
+        from django.core import signing
+        from .live import TICKET_SALT
+        
+        self.client.force_authenticate(user=self.resident)
+        response = self.client.post('/api/visitors/stream_ticket/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(signing.loads(response.data['ticket'], salt=TICKET_SALT), {'u': self.resident.id})
+    
+    def test_stream_refuses_wsgi(self):
+        """Test that the stream isn't served by a WSGI worker it would tie up"""
+        self.client.force_authenticate(user=self.guard)
+        response = self.client.get('/api/visitors/stream/')
+        self.assertEqual(response.status_code, 501)
+    
+    @override_settings(LIVE_EVENTS_SINGLE_PROCESS=False)
+    async def test_stream_refuses_in_process_broker_with_many_workers(self):
+        """Test that streams need a shared broker unless the server runs one process"""
+        from .live import issue_stream_ticket
+        
+        reset_broker()
+        response = await self.async_client.get('/api/visitors/stream/', {'ticket': issue_stream_ticket(self.guard)})
+        self.assertEqual(response.status_code, 503)
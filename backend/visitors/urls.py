@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import VisitorViewSet
+from .live import visitor_stream
 
 router = DefaultRouter()
 router.register(r'', VisitorViewSet)
 
 urlpatterns = [
+    path('stream/', visitor_stream, name='visitor-stream'),
     path('', include(router.urls)),
 ]
 
@@ -4,10 +4,13 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from users.permissions import VisitorPermissions
+from .live import TICKET_MAX_AGE, issue_stream_ticket
 from .models import Visitor
+from .passes import InvalidPass, check_in_with_pass, issue_pass, verify_pass
 from .serializers import (
     VisitorSerializer, VisitorDetailSerializer, 
-    VisitorCheckInSerializer, VisitorCheckOutSerializer
+    VisitorCheckInSerializer, VisitorCheckOutSerializer,
+    VisitorGatePassSerializer, VisitorGateCheckInSerializer
 )
 
 
@@ -67,6 +70,83 @@ class VisitorViewSet(viewsets.ModelViewSet):
         
         return Response(VisitorDetailSerializer(visitor).data)
     
+    @action(detail=True, methods=['post'])
+    def gate_pass(self, request, pk=None):
+        """
+        Pre-approve a visitor and issue a signed gate pass (encode the token
+        as a QR code). Residents can only issue passes for their own flat.
+        """
+        visitor = self.get_object()
+        if request.user.role == 'RESIDENT' and visitor.flat.current_resident_id != request.user.id:
+            return Response(
+                {'error': 'You can only issue passes for visitors to your flat'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if visitor.status in [Visitor.Status.REJECTED, Visitor.Status.IN_PREMISES]:
+            return Response(
+                {'error': f'Cannot issue a pass for a visitor who is {visitor.get_status_display().lower()}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = VisitorGatePassSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            token, valid_from, valid_until = issue_pass(
+                visitor,
+                serializer.validated_data.get('valid_from'),
+                serializer.validated_data.get('valid_until'),
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        visitor.status = Visitor.Status.APPROVED
+        visitor.pre_approved = True
+        visitor.approved_by = request.user
+        visitor.save()
+        
+        return Response({
+            'visitor': visitor.id,
+            'token': token,
+            'valid_from': valid_from,
+            'valid_until': valid_until,
+        })
+    
+    @action(detail=False, methods=['post'])
+    def gate_check_in(self, request):
+        """
+        Check in a visitor with a gate pass token. The pass is verified
+        cryptographically; the check-in is a single UPDATE.
+        """
+        serializer = VisitorGateCheckInSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            payload = verify_pass(serializer.validated_data['token'])
+        except InvalidPass as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not check_in_with_pass(payload, request.user, request.user.society_id):
+            return Response(
+                {'error': 'Visitor is not approved, already inside, or not of this society'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response({
+            'visitor': payload['v'],
+            'name': payload['n'],
+            'flat': payload['f'],
+            'flat_number': payload['fn'],
+            'status': Visitor.Status.IN_PREMISES,
+        })
+    
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """
+        Short-lived ticket for opening the live visitor stream: EventSource
+        can't send the Authorization header, and the ticket keeps access
+        tokens out of stream URLs.
+        """
+        return Response({'ticket': issue_stream_ticket(request.user), 'expires_in': TICKET_MAX_AGE})
+    
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a visitor"""
@@ -118,17 +118,29 @@ export const visitorsAPI = {
   reject: (id: number) => api.post(`/visitors/${id}/reject/`),
   getActive: () => api.get('/visitors/active/'),
   getPending: () => api.get('/visitors/pending/'),
+  issueGatePass: (id: number, data?: any) => api.post(`/visitors/${id}/gate_pass/`, data),
+  gateCheckIn: (token: string) => api.post('/visitors/gate_check_in/', { token }),
+  // Server-sent events URL for new EventSource(...); replaces polling active/pending.
+  // EventSource can't send headers, so the URL carries a short-lived stream ticket.
+  streamUrl: async (flat?: number) => {
+    const { data } = await api.post('/visitors/stream_ticket/');
+    const params = new URLSearchParams({ ticket: data.ticket });
+    if (flat) params.set('flat', String(flat));
+    return `${API_URL}/visitors/stream/?${params}`;
+  },
 };
 
 // Complaints API
 export const complaintsAPI = {
   getComplaints: (params?: any) => api.get('/complaints/', { params }),
   getComplaint: (id: number) => api.get(`/complaints/${id}/`),
+  getUpdates: (id: number, params?: any) => api.get(`/complaints/${id}/updates/`, { params }),
   createComplaint: (data: any) => api.post('/complaints/', data),
   addUpdate: (id: number, data: any) => api.post(`/complaints/${id}/add_update/`, data),
   assign: (id: number, data: any) => api.post(`/complaints/${id}/assign/`, data),
   resolve: (id: number, data: any) => api.post(`/complaints/${id}/resolve/`, data),
   close: (id: number) => api.post(`/complaints/${id}/close/`),
+  bulk: (data: any) => api.post('/complaints/bulk/', data),
   getStats: () => api.get('/complaints/stats/'),
 };
 